@@ -0,0 +1,48 @@
+"""denormalized enrollment progress counters
+
+Revision ID: 0005_enrollment_counters
+Revises: 0004_razorpay
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_enrollment_counters"
+down_revision = "0004_razorpay"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    enrollment_cols = {c["name"] for c in inspector.get_columns("enrollments")}
+    with op.batch_alter_table("enrollments") as batch_op:
+        if "completed_lectures" not in enrollment_cols:
+            batch_op.add_column(sa.Column("completed_lectures", sa.Integer(), server_default="0", nullable=False))
+        if "total_lectures" not in enrollment_cols:
+            batch_op.add_column(sa.Column("total_lectures", sa.Integer(), server_default="0", nullable=False))
+
+    op.execute(
+        """
+        UPDATE enrollments SET
+            total_lectures = (SELECT COUNT(*) FROM lectures WHERE lectures.course_id = enrollments.course_id),
+            completed_lectures = (
+                SELECT COUNT(*) FROM lecture_progress
+                JOIN lectures ON lectures.id = lecture_progress.lecture_id
+                WHERE lectures.course_id = enrollments.course_id
+                  AND lecture_progress.student_id = enrollments.student_id
+                  AND lecture_progress.completed = true
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("enrollments") as batch_op:
+        if "total_lectures" in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("enrollments")}:
+            batch_op.drop_column("total_lectures")
+        if "completed_lectures" in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("enrollments")}:
+            batch_op.drop_column("completed_lectures")
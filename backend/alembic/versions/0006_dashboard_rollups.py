@@ -0,0 +1,39 @@
+"""per-organization dashboard rollups
+
+Revision ID: 0006_dashboard_rollups
+Revises: 0005_enrollment_counters
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_dashboard_rollups"
+down_revision = "0005_enrollment_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "dashboard_rollups" not in inspector.get_table_names():
+        op.create_table(
+            "dashboard_rollups",
+            sa.Column(
+                "organization_id",
+                sa.Integer(),
+                sa.ForeignKey("organizations.id", ondelete="CASCADE"),
+                primary_key=True,
+            ),
+            sa.Column("total_students", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("enrolled_students", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("total_progress", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("completed_progress", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("refreshed_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("dashboard_rollups")
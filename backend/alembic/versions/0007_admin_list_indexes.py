@@ -0,0 +1,36 @@
+"""composite indexes for keyset-paginated admin listings
+
+Revision ID: 0007_admin_list_indexes
+Revises: 0006_dashboard_rollups
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_admin_list_indexes"
+down_revision = "0006_dashboard_rollups"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_users_org_role_created", "users", ["organization_id", "role", "created_at", "id"]),
+    ("ix_courses_org_created", "courses", ["organization_id", "created_at", "id"]),
+    ("ix_enrollments_org_enrolled", "enrollments", ["organization_id", "enrolled_at", "id"]),
+    ("ix_enrollments_org_status_enrolled", "enrollments", ["organization_id", "status", "enrolled_at", "id"]),
+    ("ix_certificates_issued", "certificates", ["issued_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name not in {ix["name"] for ix in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _ in reversed(INDEXES):
+        if name in {ix["name"] for ix in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,46 @@
+"""denormalize organization_id onto certificates
+
+Revision ID: 0008_certificate_organization
+Revises: 0007_admin_list_indexes
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_certificate_organization"
+down_revision = "0007_admin_list_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "organization_id" not in {c["name"] for c in inspector.get_columns("certificates")}:
+        with op.batch_alter_table("certificates") as batch_op:
+            batch_op.add_column(sa.Column("organization_id", sa.Integer(), nullable=True))
+            batch_op.create_foreign_key("fk_certificates_org", "organizations", ["organization_id"], ["id"])
+
+    op.execute(
+        """
+        UPDATE certificates SET organization_id = (
+            SELECT courses.organization_id FROM courses WHERE courses.id = certificates.course_id
+        )
+        WHERE organization_id IS NULL
+        """
+    )
+
+    if "ix_certificates_org_issued" not in {ix["name"] for ix in sa.inspect(bind).get_indexes("certificates")}:
+        op.create_index("ix_certificates_org_issued", "certificates", ["organization_id", "issued_at", "id"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "ix_certificates_org_issued" in {ix["name"] for ix in inspector.get_indexes("certificates")}:
+        op.drop_index("ix_certificates_org_issued", table_name="certificates")
+    if "organization_id" in {c["name"] for c in inspector.get_columns("certificates")}:
+        with op.batch_alter_table("certificates") as batch_op:
+            batch_op.drop_constraint("fk_certificates_org", type_="foreignkey")
+            batch_op.drop_column("organization_id")
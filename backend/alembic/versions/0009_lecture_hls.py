@@ -0,0 +1,36 @@
+"""HLS packaging status and renditions on lectures
+
+Revision ID: 0009_lecture_hls
+Revises: 0008_certificate_organization
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_lecture_hls"
+down_revision = "0008_certificate_organization"
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ("hls_status", sa.String(20)),
+    ("hls_key", sa.String(255)),
+    ("hls_renditions", sa.String(120)),
+]
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("lectures")}
+    with op.batch_alter_table("lectures") as batch_op:
+        for name, type_ in COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("lectures")}
+    with op.batch_alter_table("lectures") as batch_op:
+        for name, _ in reversed(COLUMNS):
+            if name in existing:
+                batch_op.drop_column(name)
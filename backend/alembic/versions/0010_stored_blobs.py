@@ -0,0 +1,33 @@
+"""refcounted content-addressed blobs
+
+Revision ID: 0010_stored_blobs
+Revises: 0009_lecture_hls
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_stored_blobs"
+down_revision = "0009_lecture_hls"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "stored_blobs" not in inspector.get_table_names():
+        op.create_table(
+            "stored_blobs",
+            sa.Column("key", sa.String(255), primary_key=True),
+            sa.Column("sha256", sa.String(64), nullable=False),
+            sa.Column("size", sa.BigInteger(), nullable=False),
+            sa.Column("refcount", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_stored_blobs_sha256", "stored_blobs", ["sha256"])
+
+
+def downgrade() -> None:
+    op.drop_table("stored_blobs")
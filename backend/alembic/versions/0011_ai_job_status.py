@@ -0,0 +1,44 @@
+"""AI transform job status and timings
+
+Revision ID: 0011_ai_job_status
+Revises: 0010_stored_blobs
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_ai_job_status"
+down_revision = "0010_stored_blobs"
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ("status", sa.String(20)),
+    ("started_at", sa.DateTime(timezone=True)),
+    ("finished_at", sa.DateTime(timezone=True)),
+    ("error", sa.Text()),
+]
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("ai_transform_jobs")}
+    with op.batch_alter_table("ai_transform_jobs") as batch_op:
+        for name, type_ in COLUMNS:
+            if name in existing:
+                continue
+            if name == "status":
+                # Jobs from before the queue ran inline and always produced their output.
+                batch_op.add_column(sa.Column(name, type_, nullable=False, server_default="succeeded"))
+            else:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+    with op.batch_alter_table("ai_transform_jobs") as batch_op:
+        batch_op.alter_column("status", server_default="queued")
+
+
+def downgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("ai_transform_jobs")}
+    with op.batch_alter_table("ai_transform_jobs") as batch_op:
+        for name, _ in reversed(COLUMNS):
+            if name in existing:
+                batch_op.drop_column(name)
@@ -0,0 +1,35 @@
+"""content-hash cache of AI transform outputs
+
+Revision ID: 0012_ai_result_cache
+Revises: 0011_ai_job_status
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_ai_result_cache"
+down_revision = "0011_ai_job_status"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "ai_result_cache" not in inspector.get_table_names():
+        op.create_table(
+            "ai_result_cache",
+            sa.Column("key", sa.String(255), primary_key=True),
+            sa.Column("input_sha256", sa.String(64), nullable=False),
+            sa.Column("preset", sa.String(60), nullable=False),
+            sa.Column("pipeline_version", sa.Integer(), nullable=False),
+            sa.Column("size", sa.BigInteger(), nullable=False),
+            sa.Column("hits", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.Column("last_used_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_ai_result_cache_last_used", "ai_result_cache", ["last_used_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("ai_result_cache")
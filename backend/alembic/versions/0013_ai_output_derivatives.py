@@ -0,0 +1,32 @@
+"""AI output thumbnail and preview derivatives
+
+Revision ID: 0013_ai_output_derivatives
+Revises: 0012_ai_result_cache
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013_ai_output_derivatives"
+down_revision = "0012_ai_result_cache"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["thumbnail_path", "preview_path"]
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("ai_transform_jobs")}
+    with op.batch_alter_table("ai_transform_jobs") as batch_op:
+        for name in COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, sa.String(255), nullable=True))
+
+
+def downgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("ai_transform_jobs")}
+    with op.batch_alter_table("ai_transform_jobs") as batch_op:
+        for name in reversed(COLUMNS):
+            if name in existing:
+                batch_op.drop_column(name)
@@ -0,0 +1,24 @@
+"""index AI transform jobs by output key
+
+Revision ID: 0014_ai_job_output_index
+Revises: 0013_ai_output_derivatives
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014_ai_job_output_index"
+down_revision = "0013_ai_output_derivatives"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = {i["name"] for i in sa.inspect(op.get_bind()).get_indexes("ai_transform_jobs")}
+    if "ix_ai_transform_jobs_output" not in existing:
+        op.create_index("ix_ai_transform_jobs_output", "ai_transform_jobs", ["output_image_path"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ai_transform_jobs_output", table_name="ai_transform_jobs")
@@ -0,0 +1,37 @@
+"""count the jobs showing each AI output
+
+Revision ID: 0015_ai_result_cache_refs
+Revises: 0014_ai_job_output_index
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0015_ai_result_cache_refs"
+down_revision = "0014_ai_job_output_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("ai_result_cache")}
+    if "refs" not in existing:
+        with op.batch_alter_table("ai_result_cache") as batch_op:
+            batch_op.add_column(sa.Column("refs", sa.Integer(), server_default="0", nullable=False))
+
+    op.execute(
+        """
+        UPDATE ai_result_cache SET refs = (
+            SELECT COUNT(*) FROM ai_transform_jobs
+            WHERE ai_transform_jobs.output_image_path = ai_result_cache.key
+              AND ai_transform_jobs.status = 'succeeded'
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    if "refs" in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("ai_result_cache")}:
+        with op.batch_alter_table("ai_result_cache") as batch_op:
+            batch_op.drop_column("refs")
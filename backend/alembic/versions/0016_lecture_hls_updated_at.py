@@ -0,0 +1,27 @@
+"""when a lecture's HLS status last changed
+
+Revision ID: 0016_lecture_hls_updated_at
+Revises: 0015_ai_result_cache_refs
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0016_lecture_hls_updated_at"
+down_revision = "0015_ai_result_cache_refs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("lectures")}
+    if "hls_updated_at" not in existing:
+        with op.batch_alter_table("lectures") as batch_op:
+            batch_op.add_column(sa.Column("hls_updated_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    if "hls_updated_at" in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("lectures")}:
+        with op.batch_alter_table("lectures") as batch_op:
+            batch_op.drop_column("hls_updated_at")
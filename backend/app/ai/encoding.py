@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+from PIL import Image
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# AI_OUTPUT_FORMAT -> file extension; Pillow picks the encoder from the extension.
+OUTPUT_FORMATS = {"png": ".png", "webp": ".webp", "avif": ".avif"}
+
+# Smaller renditions stored next to every output as ``<stem>_<name><ext>``.
+DERIVATIVES = ("thumbnail", "preview")
+
+# Presets whose output is already posterized: as PNG they are stored with a
+# palette instead of full RGB/gray.
+PALETTE_PRESETS = frozenset({"simplified_shapes_block_in", "value_map"})
+
+# A handful of flat tones compresses smaller losslessly than lossy WebP, and
+# without ringing around the tone edges.
+LOSSLESS_WEBP_PRESETS = frozenset({"value_map"})
+
+
+def _avif_available() -> bool:
+    if ".avif" not in Image.registered_extensions():
+        try:
+            import pillow_avif  # noqa: F401 - registers the AVIF plugin on Pillow < 11.2
+        except ImportError:
+            return False
+    return ".avif" in Image.registered_extensions()
+
+
+def output_extension() -> str:
+    fmt = settings.ai_output_format.lower()
+    if fmt not in OUTPUT_FORMATS:
+        raise RuntimeError(f"Unknown AI_OUTPUT_FORMAT {settings.ai_output_format!r}")
+    if fmt == "avif" and not _avif_available():
+        logger.warning("AI_OUTPUT_FORMAT=avif needs Pillow >= 11.2 or pillow-avif-plugin; writing WebP")
+        fmt = "webp"
+    return OUTPUT_FORMATS[fmt]
+
+
+def derivative_path(path: str, name: str) -> str:
+    """Where derivative ``name`` of the output at ``path`` (a storage key or a file) lives."""
+    stem, dot, ext = path.rpartition(".")
+    return f"{stem}_{name}.{ext}"
+
+
+def derivative_sizes() -> dict[str, int]:
+    return {"thumbnail": settings.ai_thumbnail_px, "preview": settings.ai_preview_px}
+
+
+def _snap_tones(small: Image.Image, full: Image.Image) -> Image.Image:
+    # Resampling a posterized gray image invents in-between tones, which makes
+    # the "smaller" derivative compress worse than the output. Map them back
+    # onto the output's own few levels.
+    colors = full.getcolors(16) if full.mode == "L" else None
+    if not colors:
+        return small
+    levels = sorted(level for _, level in colors)
+    return small.point([min(levels, key=lambda level: abs(level - p)) for p in range(256)])
+
+
+def _save(img: Image.Image, path: str, preset: str) -> None:
+    ext = Path(path).suffix.lower()
+    if ext == ".png":
+        # No ``optimize``: it costs several times the encode for a few percent.
+        if preset in PALETTE_PRESETS and img.mode == "L":
+            img = img.convert("P")
+        elif preset in PALETTE_PRESETS and img.mode == "RGB":
+            img = img.quantize(colors=256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        img.save(path)
+    elif ext == ".webp":
+        if preset in LOSSLESS_WEBP_PRESETS:
+            img.save(path, lossless=True, quality=50)
+        else:
+            img.save(path, quality=settings.ai_output_quality, method=4)
+    elif ext == ".avif":
+        img.save(path, quality=settings.ai_output_quality)
+    else:
+        img.save(path)
+
+
+def save_output(img: Image.Image, output_path: str, preset: str) -> list[str]:
+    """Encode ``img`` at ``output_path`` plus its derivatives; returns every file written.
+
+    The format follows the extension of ``output_path``. Derivatives are
+    LANCZOS downscales capped at ``AI_THUMBNAIL_PX`` / ``AI_PREVIEW_PX`` on the
+    longest side (never upscaled), so the history grid loads a few KB per item.
+    """
+    _save(img, output_path, preset)
+    written = [output_path]
+    for name, px in derivative_sizes().items():
+        small = img.copy()
+        small.thumbnail((px, px), Image.Resampling.LANCZOS)
+        if preset in PALETTE_PRESETS:
+            small = _snap_tones(small, img)
+        path = derivative_path(output_path, name)
+        _save(small, path, preset)
+        written.append(path)
+    return written
@@ -5,3 +5,7 @@ PRESETS = {
     "simplified_shapes_block_in": "Simplified shapes block-in",
     "value_map": "Value map (3-5 tonal values)",
 }
+
+# Bump whenever a preset's output changes (filters, working size, encoding) so
+# cached results from the previous pipeline are no longer served.
+PIPELINE_VERSION = 3
@@ -1,28 +1,49 @@
 from __future__ import annotations
 
+import base64
 from datetime import datetime, timezone
+from email.utils import formatdate
+from pathlib import PurePosixPath
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
-from fastapi.responses import FileResponse
-from sqlalchemy import and_, func, select
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Query, Request, Response, UploadFile
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import Session, aliased
+from starlette.concurrency import run_in_threadpool
 
+from app.core.config import settings
 from app.db.session import get_db
+from app.media.faststart import MP4Error, faststart
+from app.media.stream_auth import revoke_stream_grants
 from app.models.models import Certificate, CertificateSetting, Course, Enrollment, Lecture, LectureProgress, Organization, User
+from app.schemas.common import Page
 from app.schemas.course import CourseCreate, CourseOut, CourseUpdate, LectureCreate, LectureOut, LectureUpdate
 from app.schemas.student import EnrollmentCreate
+from app.services.blob_service import release, retain
 from app.services.certificate_service import get_or_create_settings
-from app.services.course_service import get_dashboard_stats, list_student_progress
-from app.storage.provider import storage_provider
+from app.services.course_service import (
+    init_enrollment_counters,
+    list_student_progress,
+    on_lecture_added,
+    on_lecture_removed,
+)
+from app.services.dashboard_service import get_dashboard_rollup_stats, get_dashboard_stats
+from app.services.hls_service import lecture_hls_prefix, queue_lecture_hls
+from app.storage.provider import StagedUpload, storage_provider
+from app.storage.resumable import UploadState, resumable_uploads
 from app.utils.deps import require_admin
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset, page
+
+TUS_VERSION = "1.0.0"
 
 router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
 
 
 @router.get("/dashboard")
-def dashboard(db: Session = Depends(get_db), user: User = Depends(require_admin)):
+def dashboard(fresh: bool = Query(default=False), db: Session = Depends(get_db), user: User = Depends(require_admin)):
     org_id = None if user.role == "super_admin" else user.organization_id
-    return get_dashboard_stats(db, organization_id=org_id)
+    if fresh:
+        return get_dashboard_stats(db, organization_id=org_id)
+    return get_dashboard_rollup_stats(db, organization_id=org_id)
 
 
 @router.post("/courses", response_model=CourseOut)
@@ -44,12 +65,28 @@ def create_course(payload: CourseCreate, db: Session = Depends(get_db), user: Us
     return course
 
 
-@router.get("/courses", response_model=list[CourseOut])
-def list_courses(db: Session = Depends(get_db), user: User = Depends(require_admin)):
-    stmt = select(Course).order_by(Course.created_at.desc())
+@router.get("/courses", response_model=Page[CourseOut])
+def list_courses(
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    level: str | None = Query(default=None),
+    date_from: datetime | None = Query(default=None),
+    date_to: datetime | None = Query(default=None),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_admin),
+):
+    stmt = select(Course)
     if user.role != "super_admin":
         stmt = stmt.where(Course.organization_id == user.organization_id)
-    return db.scalars(stmt).all()
+    if level:
+        stmt = stmt.where(Course.level == level.lower())
+    if date_from:
+        stmt = stmt.where(Course.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Course.created_at < date_to)
+    rows = db.scalars(keyset(db, stmt, Course.created_at, Course.id, cursor, limit)).all()
+    items, next_cursor = page(rows, limit, lambda c: (c.created_at, c.id))
+    return Page[CourseOut](items=items, next_cursor=next_cursor)
 
 
 @router.put("/courses/{course_id}", response_model=CourseOut)
@@ -69,8 +106,14 @@ def delete_course(course_id: int, db: Session = Depends(get_db), user: User = De
     course = db.get(Course, course_id)
     if not course or (user.role != "super_admin" and course.organization_id != user.organization_id):
         raise HTTPException(status_code=404, detail="Course not found")
+    lectures = db.execute(select(Lecture.id, Lecture.video_key).where(Lecture.course_id == course_id)).all()
+    for _, video_key in lectures:
+        release(db, video_key)
     db.delete(course)
     db.commit()
+    revoke_stream_grants(course_id=course_id)
+    for lecture_id, _ in lectures:
+        storage_provider.delete_prefix(lecture_hls_prefix(lecture_id))
     return {"ok": True}
 
 
@@ -87,6 +130,7 @@ def create_lecture(course_id: int, payload: LectureCreate, db: Session = Depends
         order_index=payload.order_index,
     )
     db.add(lecture)
+    on_lecture_added(db, course_id)
     db.commit()
     db.refresh(lecture)
     return lecture
@@ -123,56 +167,227 @@ def delete_lecture(course_id: int, lecture_id: int, db: Session = Depends(get_db
     course = db.get(Course, lecture.course_id)
     if course and user.role != "super_admin" and course.organization_id != user.organization_id:
         raise HTTPException(status_code=404, detail="Lecture not found")
+    on_lecture_removed(db, lecture)
+    release(db, lecture.video_key)
     db.delete(lecture)
     db.commit()
+    revoke_stream_grants(lecture_id=lecture_id)
+    storage_provider.delete_prefix(lecture_hls_prefix(lecture_id))
     return {"ok": True}
 
 
-@router.post("/lectures/{lecture_id}/upload")
-async def upload_lecture_video(lecture_id: int, video: UploadFile = File(...), db: Session = Depends(get_db), user: User = Depends(require_admin)):
+def _lecture_for_admin(db: Session, lecture_id: int, user: User) -> Lecture:
     lecture = db.get(Lecture, lecture_id)
     if not lecture:
         raise HTTPException(status_code=404, detail="Lecture not found")
     course = db.get(Course, lecture.course_id)
     if course and user.role != "super_admin" and course.organization_id != user.organization_id:
         raise HTTPException(status_code=404, detail="Lecture not found")
-    key = await storage_provider.save_upload("videos", video)
-    lecture.video_key = key
+    return lecture
+
+
+async def _attach_video(db: Session, lecture: Lecture, staged: StagedUpload) -> dict:
+    """Store a staged video and point ``lecture.video_key`` at it in one commit."""
+    try:
+        # Put moov first so playback can start before the whole file arrives.
+        layout = await run_in_threadpool(faststart, staged.path)
+    except MP4Error:
+        layout = None
+    except BaseException:
+        storage_provider.discard(staged)
+        raise
+    stored = await storage_provider.commit(staged, modified=bool(layout and layout.relocated))
+    if layout and layout.duration_sec:
+        lecture.duration_sec = layout.duration_sec
+    retain(db, stored)
+    release(db, lecture.video_key)
+    # The old tree segments the old video; packaging starts over either way.
+    stale_hls_key = lecture.hls_key
+    lecture.video_key = stored.key
+    lecture.hls_key = lecture.hls_renditions = None
+    lecture.hls_status = "pending" if settings.hls_enabled else None
+    lecture.hls_updated_at = datetime.now(timezone.utc)
     db.commit()
-    return {"video_key": key}
+    revoke_stream_grants(lecture_id=lecture.id)
+    if stale_hls_key:
+        storage_provider.delete_prefix(stale_hls_key)
+    if settings.hls_enabled and not queue_lecture_hls(lecture.id):
+        # Queue full: the lecture keeps playing as progressive MP4.
+        lecture.hls_status = "failed"
+        lecture.hls_updated_at = datetime.now(timezone.utc)
+        db.commit()
+    return {
+        "video_key": stored.key,
+        "size": stored.size,
+        "sha256": stored.sha256,
+        "duration_sec": lecture.duration_sec,
+        "faststart": bool(layout and layout.relocated),
+    }
+
+
+@router.post("/lectures/{lecture_id}/upload")
+async def upload_lecture_video(
+    lecture_id: int,
+    video: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_admin),
+):
+    lecture = _lecture_for_admin(db, lecture_id, user)
+    staged = await storage_provider.stage_upload(video)
+    return await _attach_video(db, lecture, staged)
+
+
+def _upload_headers(state: UploadState) -> dict[str, str]:
+    return {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(state.offset),
+        "Upload-Length": str(state.length),
+        "Upload-Expires": formatdate(state.expires_at, usegmt=True),
+        "Cache-Control": "no-store",
+    }
+
+
+def _upload_for_admin(upload_id: str, user: User) -> UploadState:
+    state = resumable_uploads.state(upload_id)
+    if user.role != "super_admin" and state.organization_id != user.organization_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return state
+
+
+def _metadata_filename(upload_metadata: str | None) -> str:
+    # tus "Upload-Metadata: key base64value,key2 base64value2"
+    for pair in (upload_metadata or "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        if key == "filename" and value:
+            try:
+                return PurePosixPath(base64.b64decode(value, validate=True).decode()).name or "video.mp4"
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid Upload-Metadata")
+    return "video.mp4"
+
+
+@router.post("/lectures/{lecture_id}/uploads", status_code=201)
+def create_resumable_upload(
+    lecture_id: int,
+    response: Response,
+    upload_length: int = Header(...),
+    upload_metadata: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_admin),
+):
+    """Start a resumable upload; send the bytes with PATCH, then POST ``/finalize``."""
+    lecture = _lecture_for_admin(db, lecture_id, user)
+    course = db.get(Course, lecture.course_id)
+    state = resumable_uploads.create(
+        lecture_id=lecture.id,
+        organization_id=course.organization_id if course else None,
+        length=upload_length,
+        filename=_metadata_filename(upload_metadata),
+    )
+    response.headers.update(_upload_headers(state))
+    response.headers["Location"] = f"/admin/uploads/{state.upload_id}"
+    return {"upload_id": state.upload_id, "offset": state.offset, "length": state.length, "expires_at": state.expires_at}
+
+
+@router.head("/uploads/{upload_id}")
+def resumable_upload_status(upload_id: str, user: User = Depends(require_admin)):
+    return Response(status_code=200, headers=_upload_headers(_upload_for_admin(upload_id, user)))
+
+
+@router.patch("/uploads/{upload_id}")
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    content_type: str | None = Header(default=None),
+    user: User = Depends(require_admin),
+):
+    if content_type != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    _upload_for_admin(upload_id, user)
+    state = await resumable_uploads.append(upload_id, upload_offset, request.stream())
+    return Response(status_code=204, headers=_upload_headers(state))
+
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+def cancel_resumable_upload(upload_id: str, user: User = Depends(require_admin)):
+    _upload_for_admin(upload_id, user)
+    resumable_uploads.delete(upload_id)
+    return Response(status_code=204)
+
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_resumable_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_admin),
+):
+    state = _upload_for_admin(upload_id, user)
+    lecture = _lecture_for_admin(db, state.lecture_id, user)
+    _, staged = await resumable_uploads.take(upload_id)
+    return await _attach_video(db, lecture, staged)
 
 
 @router.get("/students")
-def list_students(db: Session = Depends(get_db), user: User = Depends(require_admin)):
-    stmt = select(User).where(User.role == "student").order_by(User.created_at.desc())
+def list_students(
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    grade: str | None = Query(default=None),
+    course_id: int | None = Query(default=None),
+    date_from: datetime | None = Query(default=None),
+    date_to: datetime | None = Query(default=None),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_admin),
+):
+    stmt = select(User).where(User.role == "student")
     if user.role != "super_admin":
         stmt = stmt.where(User.organization_id == user.organization_id)
-    students = db.scalars(stmt).all()
-    result = []
-    for s in students:
-        enrollment_stmt = select(func.count(Enrollment.id)).where(Enrollment.student_id == s.id)
-        active_stmt = select(func.count(Enrollment.id)).where(
-            and_(Enrollment.student_id == s.id, Enrollment.status.in_(["active", "completed"]))
+    if grade:
+        stmt = stmt.where(User.grade_or_standard == grade)
+    if course_id is not None:
+        stmt = stmt.where(
+            select(Enrollment.id).where(and_(Enrollment.student_id == User.id, Enrollment.course_id == course_id)).exists()
         )
-        if user.role != "super_admin":
-            enrollment_stmt = enrollment_stmt.where(Enrollment.organization_id == user.organization_id)
-            active_stmt = active_stmt.where(Enrollment.organization_id == user.organization_id)
-        enrollment_count = db.scalar(enrollment_stmt) or 0
-        active_enrollment = db.scalar(active_stmt) or 0
-        result.append(
-            {
-                "id": s.id,
-                "full_name": s.full_name,
-                "email": s.email,
-                "phone": s.phone,
-                "grade_or_standard": s.grade_or_standard,
-                "created_at": s.created_at,
-                "last_active_at": s.last_active_at,
-                "enrollments": enrollment_count,
-                "active_enrollments": active_enrollment,
-            }
+    if date_from:
+        stmt = stmt.where(User.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(User.created_at < date_to)
+    # One round trip: the keyset page of students LEFT JOINed to enrollment counts grouped for that page only.
+    page_sq = keyset(db, stmt, User.created_at, User.id, cursor, limit).subquery()
+    student = aliased(User, page_sq)
+    counts_stmt = (
+        select(
+            Enrollment.student_id,
+            func.count(Enrollment.id).label("enrollments"),
+            func.sum(case((Enrollment.status.in_(["active", "completed"]), 1), else_=0)).label("active_enrollments"),
         )
-    return result
+        .where(Enrollment.student_id.in_(select(page_sq.c.id)))
+        .group_by(Enrollment.student_id)
+    )
+    if user.role != "super_admin":
+        counts_stmt = counts_stmt.where(Enrollment.organization_id == user.organization_id)
+    counts = counts_stmt.subquery()
+    rows = db.execute(
+        select(student, func.coalesce(counts.c.enrollments, 0), func.coalesce(counts.c.active_enrollments, 0))
+        .outerjoin(counts, counts.c.student_id == student.id)
+        .order_by(student.created_at.desc(), student.id.desc())
+    ).all()
+    rows, next_cursor = page(rows, limit, lambda row: (row[0].created_at, row[0].id))
+    result = [
+        {
+            "id": s.id,
+            "full_name": s.full_name,
+            "email": s.email,
+            "phone": s.phone,
+            "grade_or_standard": s.grade_or_standard,
+            "created_at": s.created_at,
+            "last_active_at": s.last_active_at,
+            "enrollments": enrollment_count,
+            "active_enrollments": active_enrollment,
+        }
+        for s, enrollment_count, active_enrollment in rows
+    ]
+    return {"items": result, "next_cursor": next_cursor}
 
 
 @router.get("/students/{student_id}/progress")
@@ -212,6 +427,7 @@ def create_or_activate_enrollment(payload: EnrollmentCreate, db: Session = Depen
         status="active",
         organization_id=course.organization_id,
     )
+    init_enrollment_counters(db, enrollment)
     db.add(enrollment)
     db.commit()
     db.refresh(enrollment)
@@ -219,19 +435,37 @@ def create_or_activate_enrollment(payload: EnrollmentCreate, db: Session = Depen
 
 
 @router.get("/enrollments")
-def list_enrollments(status: str | None = Query(default=None), db: Session = Depends(get_db), user: User = Depends(require_admin)):
+def list_enrollments(
+    status: str | None = Query(default=None),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    course_id: int | None = Query(default=None),
+    grade: str | None = Query(default=None),
+    date_from: datetime | None = Query(default=None),
+    date_to: datetime | None = Query(default=None),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_admin),
+):
     stmt = (
         select(Enrollment, User, Course)
         .join(User, User.id == Enrollment.student_id)
         .join(Course, Course.id == Enrollment.course_id)
-        .order_by(Enrollment.enrolled_at.desc())
     )
     if user.role != "super_admin":
         stmt = stmt.where(Enrollment.organization_id == user.organization_id)
     if status:
         stmt = stmt.where(Enrollment.status == status)
-    rows = db.execute(stmt).all()
-    return [
+    if course_id is not None:
+        stmt = stmt.where(Enrollment.course_id == course_id)
+    if grade:
+        stmt = stmt.where(User.grade_or_standard == grade)
+    if date_from:
+        stmt = stmt.where(Enrollment.enrolled_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Enrollment.enrolled_at < date_to)
+    rows = db.execute(keyset(db, stmt, Enrollment.enrolled_at, Enrollment.id, cursor, limit)).all()
+    rows, next_cursor = page(rows, limit, lambda row: (row[0].enrolled_at, row[0].id))
+    items = [
         {
             "id": enrollment.id,
             "status": enrollment.status,
@@ -245,6 +479,7 @@ def list_enrollments(status: str | None = Query(default=None), db: Session = Dep
         }
         for enrollment, user, course in rows
     ]
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.delete("/enrollments/{enrollment_id}")
@@ -252,32 +487,53 @@ def delete_enrollment(enrollment_id: int, db: Session = Depends(get_db), user: U
     enrollment = db.get(Enrollment, enrollment_id)
     if not enrollment or (user.role != "super_admin" and enrollment.organization_id != user.organization_id):
         raise HTTPException(status_code=404, detail="Enrollment not found")
+    student_id, course_id = enrollment.student_id, enrollment.course_id
     db.delete(enrollment)
     db.commit()
+    revoke_stream_grants(student_id=student_id, course_id=course_id)
     return {"ok": True}
 
 
 @router.get("/certificates")
-def list_certificates(db: Session = Depends(get_db), user: User = Depends(require_admin)):
-    stmt = select(Certificate).order_by(Certificate.issued_at.desc())
-    certs = db.scalars(stmt).all()
-    out = []
-    for c in certs:
-        student = db.get(User, c.student_id)
-        course = db.get(Course, c.course_id)
-        if user.role != "super_admin" and course and course.organization_id != user.organization_id:
-            continue
-        out.append(
-            {
-                "id": c.id,
-                "certificate_no": c.certificate_no,
-                "issued_at": c.issued_at,
-                "student_name": student.full_name if student else None,
-                "course_title": course.title if course else None,
-                "pdf_path": c.pdf_path,
-            }
-        )
-    return out
+def list_certificates(
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    course_id: int | None = Query(default=None),
+    grade: str | None = Query(default=None),
+    date_from: datetime | None = Query(default=None),
+    date_to: datetime | None = Query(default=None),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_admin),
+):
+    stmt = (
+        select(Certificate, User.full_name, Course.title)
+        .join(Course, Course.id == Certificate.course_id)
+        .outerjoin(User, User.id == Certificate.student_id)
+    )
+    if user.role != "super_admin":
+        stmt = stmt.where(Certificate.organization_id == user.organization_id)
+    if course_id is not None:
+        stmt = stmt.where(Certificate.course_id == course_id)
+    if grade:
+        stmt = stmt.where(User.grade_or_standard == grade)
+    if date_from:
+        stmt = stmt.where(Certificate.issued_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Certificate.issued_at < date_to)
+    rows = db.execute(keyset(db, stmt, Certificate.issued_at, Certificate.id, cursor, limit)).all()
+    rows, next_cursor = page(rows, limit, lambda row: (row[0].issued_at, row[0].id))
+    items = [
+        {
+            "id": c.id,
+            "certificate_no": c.certificate_no,
+            "issued_at": c.issued_at,
+            "student_name": student_name,
+            "course_title": course_title,
+            "pdf_path": c.pdf_path,
+        }
+        for c, student_name, course_title in rows
+    ]
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.get("/certificates/{certificate_id}/download")
@@ -285,10 +541,15 @@ def download_certificate(certificate_id: int, db: Session = Depends(get_db)):
     cert = db.get(Certificate, certificate_id)
     if not cert:
         raise HTTPException(status_code=404, detail="Certificate not found")
-    path = storage_provider.resolve(cert.pdf_path)
-    if not path.exists():
+    try:
+        return storage_provider.file_response(
+            cert.pdf_path,
+            media_type="application/pdf",
+            filename=PurePosixPath(cert.pdf_path).name,
+            headers={"Cache-Control": "private, no-cache"},
+        )
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="PDF missing")
-    return FileResponse(path, filename=path.name, media_type="application/pdf")
 
 
 @router.post("/settings/certificate-signature")
@@ -298,8 +559,10 @@ async def upload_signature(
     conf = get_or_create_settings(db)
     conf.teacher_name = teacher_name
     if signature:
-        key = await storage_provider.save_upload("signatures", signature)
-        conf.signature_path = key
+        stored = await storage_provider.save_upload(signature)
+        retain(db, stored)
+        release(db, conf.signature_path)
+        conf.signature_path = stored.key
     db.commit()
     return {"teacher_name": conf.teacher_name, "signature_path": conf.signature_path}
 
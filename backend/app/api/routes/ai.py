@@ -1,18 +1,32 @@
 from __future__ import annotations
 
-from pathlib import Path
+from contextlib import ExitStack
+from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Response, UploadFile
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.ai import presets
+from app.ai.encoding import derivative_path, output_extension
+from app.core.workers import PoolBusy
 from app.db.session import get_db
 from app.models.models import AITransformJob, Organization, User, UserCredit, CreditLedger
 from app.schemas.ai import AIHistoryOut
-from app.services.ai_service import transform_image
-from app.storage.provider import storage_provider
+from app.services.ai_result_cache import evict, lookup, output_keys, release as release_output, result_key
+from app.services.ai_service import (
+    GRAY_PRESETS,
+    JobOutcome,
+    ai_pool,
+    finish_batch,
+    finish_transform_job,
+    prepare_batch,
+    run_transform,
+)
+from app.services.blob_service import release, retain
+from app.storage.provider import StoredUpload, storage_provider
 from app.utils.deps import require_student
 
 router = APIRouter(prefix="/ai", tags=["ai"], dependencies=[Depends(require_student)])
@@ -30,58 +44,247 @@ class PlanRequest(BaseModel):
     details: str
 
 
-@router.post("/transform")
+@router.post("/transform", status_code=202)
 async def transform(
+    background_tasks: BackgroundTasks,
+    response: Response,
     image: UploadFile = File(...),
     preset: str = Form(...),
     prompt: str | None = Form(default=None),
     student=Depends(require_student),
     db: Session = Depends(get_db),
 ):
+    """Queue a drawing transform and return its job id; poll ``/ai/transform/{id}``.
+
+    A result already cached for the same image bytes and preset is returned
+    at once with ``200`` instead.
+    """
+    _check_drawing_allowed(db, student, credits=1)
+    if preset not in presets.PRESETS:
+        raise HTTPException(status_code=400, detail="Invalid preset")
+
+    upload = await storage_provider.save_upload(image)
+    cached_key = lookup(db, upload.sha256, preset)
+    if cached_key:
+        # Same image and preset already rendered by the current pipeline: charge
+        # and record the job as usual, but skip the worker entirely.
+        _reserve_credit(db, student.id, 1)
+        now = datetime.now(timezone.utc)
+        job = _record_job(db, student.id, upload, preset, prompt, cached_key, status="succeeded")
+        job.started_at = job.finished_at = now
+        db.commit()
+        db.refresh(job)
+        response.status_code = 200
+        return {**_job_out(job), "status_url": f"/ai/transform/{job.id}", "cached": True}
+
+    output_key = result_key(upload.sha256, preset)
+    output_path = storage_provider.scratch_path(output_extension())
+    with ExitStack() as stack:
+        input_path = await run_in_threadpool(stack.enter_context, storage_provider.local_copy(upload.key))
+        _reserve_credit(db, student.id, 1)
+        try:
+            pending = ai_pool.submit(run_transform, str(input_path), str(output_path), preset)
+        except PoolBusy:
+            db.rollback()
+            raise
+        job = _record_job(db, student.id, upload, preset, prompt, output_key, status="queued")
+        db.commit()
+        db.refresh(job)
+        background_tasks.add_task(
+            finish_transform_job, job.id, upload.sha256, pending, output_path, output_key, stack.pop_all()
+        )
+
+    return {"id": job.id, "status": job.status, "status_url": f"/ai/transform/{job.id}", "cached": False}
+
+
+@router.post("/transform/batch", status_code=202)
+async def transform_batch(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    image: UploadFile = File(...),
+    preset: list[str] = Form(...),
+    prompt: str | None = Form(default=None),
+    student=Depends(require_student),
+    db: Session = Depends(get_db),
+):
+    """Queue one image under several presets (repeat the ``preset`` field).
+
+    The upload is decoded once at the working size; the presets then render in
+    parallel on the AI pool from that shared decode. Every preset costs one
+    credit, charged together in a single ledger entry. Returns one job per
+    preset, ``200`` when all of them were already cached.
+    """
+    chosen = list(dict.fromkeys(preset))
+    if any(p not in presets.PRESETS for p in chosen):
+        raise HTTPException(status_code=400, detail="Invalid preset")
+    _check_drawing_allowed(db, student, credits=len(chosen))
+
+    upload = await storage_provider.save_upload(image)
+    cached = {p: lookup(db, upload.sha256, p) for p in chosen}
+    todo = [p for p in chosen if not cached[p]]
+    now = datetime.now(timezone.utc)
+    with ExitStack() as stack:
+        _reserve_credit(db, student.id, len(chosen))
+        if todo:
+            input_path = await run_in_threadpool(stack.enter_context, storage_provider.local_copy(upload.key))
+            # One slot to decode plus one per preset, claimed together so an
+            # accepted batch never stalls half way on a saturated pool.
+            try:
+                ai_pool.reserve(len(todo) + 1)
+            except PoolBusy:
+                db.rollback()
+                raise
+            work_dir = storage_provider.scratch_path()
+            work_dir.mkdir()
+            with_gray = any(p in GRAY_PRESETS for p in todo)
+            try:
+                prepared = ai_pool.submit(prepare_batch, str(input_path), str(work_dir), with_gray, reserved=True)
+            except BaseException:
+                ai_pool.release(len(todo))
+                work_dir.rmdir()
+                db.rollback()
+                raise
+        jobs = {
+            p: _record_job(
+                db,
+                student.id,
+                upload,
+                p,
+                prompt,
+                cached[p] or result_key(upload.sha256, p),
+                status="succeeded" if cached[p] else "queued",
+            )
+            for p in chosen
+        }
+        for p in chosen:
+            if cached[p]:
+                jobs[p].started_at = jobs[p].finished_at = now
+        db.commit()
+        if todo:
+            outcomes = {
+                p: JobOutcome(jobs[p].id, storage_provider.scratch_path(output_extension()), jobs[p].output_image_path) for p in todo
+            }
+            background_tasks.add_task(finish_batch, upload.sha256, prepared, work_dir, outcomes, stack.pop_all())
+
+    if not todo:
+        response.status_code = 200
+    return {
+        "jobs": [
+            {**_job_out(jobs[p]), "status_url": f"/ai/transform/{jobs[p].id}", "cached": bool(cached[p])}
+            for p in chosen
+        ],
+        "credits_charged": len(chosen),
+    }
+
+
+def _check_drawing_allowed(db: Session, student, credits: int) -> None:
     org = db.get(Organization, student.organization_id) if student.organization_id else None
     if not org or not org.ai_drawing_enabled:
         raise HTTPException(status_code=403, detail="AI drawing not enabled for this organization")
 
     credit = db.scalar(select(UserCredit).where(UserCredit.user_id == student.id))
-    if not credit or credit.balance <= 0:
+    if not credit or credit.balance < credits:
         raise HTTPException(status_code=402, detail="No drawing credits")
 
-    if preset not in presets.PRESETS:
-        raise HTTPException(status_code=400, detail="Invalid preset")
-
-    input_key = await storage_provider.save_upload("ai/input", image)
-    input_path = storage_provider.resolve(input_key)
 
-    output_dir = Path(storage_provider.root) / "ai" / "output"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_name = f"{input_path.stem}_{preset}.png"
-    output_path = output_dir / output_name
+def _reserve_credit(db: Session, student_id: int, credits: int) -> None:
+    # Atomic, so concurrent submits cannot overdraw the balance.
+    reserved = db.execute(
+        update(UserCredit)
+        .where(UserCredit.user_id == student_id, UserCredit.balance >= credits)
+        .values(balance=UserCredit.balance - credits)
+    ).rowcount
+    if not reserved:
+        db.rollback()
+        raise HTTPException(status_code=402, detail="No drawing credits")
+    db.add(CreditLedger(user_id=student_id, amount=-credits, reason="ai_drawing"))
 
-    transform_image(str(input_path), str(output_path), preset)
-    output_key = str(output_path.relative_to(storage_provider.root))
 
+def _record_job(
+    db: Session, student_id: int, upload: StoredUpload, preset: str, prompt: str | None, output_key: str, status: str
+) -> AITransformJob:
     job = AITransformJob(
-        student_id=student.id,
-        input_image_path=input_key,
+        student_id=student_id,
+        input_image_path=upload.key,
         preset=preset,
         user_prompt=prompt,
         output_image_path=output_key,
+        thumbnail_path=derivative_path(output_key, "thumbnail"),
+        preview_path=derivative_path(output_key, "preview"),
+        status=status,
     )
     db.add(job)
-    credit.balance -= 1
-    db.add(CreditLedger(user_id=student.id, amount=-1, reason="ai_drawing"))
-    db.commit()
-    db.refresh(job)
+    retain(db, upload)
+    return job
 
+
+def _job_out(job: AITransformJob) -> dict:
+    out = AIHistoryOut.model_validate(job)
     return {
         "id": job.id,
-        "preset": preset,
-        "output_image_path": output_key,
-        "output_url": f"/media/file/{output_key}",
-        "note": "MVP placeholder image transform pipeline; swappable with OpenAI image API adapter.",
+        "preset": job.preset,
+        "status": job.status,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "output_image_path": job.output_image_path if job.status == "succeeded" else None,
+        "output_url": out.output_url,
+        "thumbnail_url": out.thumbnail_url,
+        "preview_url": out.preview_url,
     }
 
 
+def _own_job(db: Session, job_id: int, student) -> AITransformJob:
+    job = db.get(AITransformJob, job_id)
+    if not job or job.student_id != student.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/transform/{job_id}")
+def transform_status(job_id: int, student=Depends(require_student), db: Session = Depends(get_db)):
+    return _job_out(_own_job(db, job_id, student))
+
+
+@router.get("/transform/{job_id}/result")
+def transform_result(job_id: int, student=Depends(require_student), db: Session = Depends(get_db)):
+    job = _own_job(db, job_id, student)
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    try:
+        return storage_provider.file_response(
+            job.output_image_path,
+            headers={"Cache-Control": "private, no-cache"},
+            content_disposition_type="inline",
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Output missing")
+
+
+@router.delete("/transform/{job_id}")
+def delete_transform(job_id: int, student=Depends(require_student), db: Session = Depends(get_db)):
+    """Remove a finished job from the history.
+
+    An output no other job shows is kept only as a result-cache entry, so
+    it counts against ``AI_RESULT_CACHE_MAX_MB`` from here on.
+    """
+    job = _own_job(db, job_id, student)
+    if job.status == "queued":
+        raise HTTPException(status_code=409, detail="Job is queued")
+    output_key = job.output_image_path if job.status == "succeeded" else None
+    release(db, job.input_image_path)
+    db.delete(job)
+    db.flush()
+    orphaned = output_key is not None and release_output(db, output_key)
+    db.commit()
+    if orphaned:
+        for key in output_keys(output_key):
+            storage_provider.delete(key)
+    evict(db)
+    return {"ok": True}
+
+
 @router.get("/history", response_model=list[AIHistoryOut])
 def history(student=Depends(require_student), db: Session = Depends(get_db)):
     return db.scalars(select(AITransformJob).where(AITransformJob.student_id == student.id).order_by(AITransformJob.created_at.desc())).all()
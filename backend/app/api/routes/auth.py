@@ -26,7 +26,7 @@ from app.services.auth_service import (
     signup_student,
     verify_reset_token,
 )
-from app.core.security import hash_password
+from app.core.security import hash_password_pooled
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -96,7 +96,7 @@ def reset_password(payload: ResetPasswordRequest, db: Session = Depends(get_db))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.password_hash = hash_password(payload.new_password)
+    user.password_hash = hash_password_pooled(payload.new_password)
     user.last_active_at = datetime.now(timezone.utc)
     db.commit()
     return {"ok": True}
@@ -1,22 +1,41 @@
-from pathlib import Path
+import time
+from dataclasses import replace
+from pathlib import Path, PurePosixPath
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy import and_, select
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
+from app.media.hls import HLS_MEDIA_TYPES
 from app.media.signed_video import safe_verify
+from app.media.stream_auth import StreamGrant, stream_grants
+from app.media.streaming import VideoFileResponse
 from app.models.models import Enrollment, Lecture
-from app.storage.provider import storage_provider
+from app.storage.provider import BLOB_PREFIX, INCOMING, is_blob_key, storage_provider
+from app.storage.resumable import RESUMABLE_PREFIX
 
 router = APIRouter(prefix="/media", tags=["media"])
 
+# Partial and staged uploads are never served.
+PRIVATE_PREFIXES = (f"{BLOB_PREFIX}/{INCOMING}/", f"{RESUMABLE_PREFIX}/")
 
-@router.get("/stream/{lecture_id}")
-def stream_lecture(lecture_id: int, token: str = Query(...), db: Session = Depends(get_db)):
-    data = safe_verify(token)
-    if not data or int(data["lecture_id"]) != lecture_id:
+
+def _safe_key(path: str) -> str:
+    """Normalize a storage key taken from the URL; absolute keys and ``..`` are refused.
+
+    Checks such as ``PRIVATE_PREFIXES`` must run on the result, so
+    ``blobs//incoming/x`` cannot slip past them.
+    """
+    parts = PurePosixPath(path).parts
+    if not parts or path.startswith("/") or ".." in parts:
+        raise HTTPException(status_code=400, detail="Invalid path")
+    return "/".join(part for part in parts if part != ".")
+
+
+def _authorize_stream(db: Session, token: str, lecture_id: int) -> StreamGrant:
+    data = safe_verify(token, lecture_id)
+    if not data:
         raise HTTPException(status_code=403, detail="Invalid token")
 
     lecture = db.get(Lecture, lecture_id)
@@ -35,18 +54,90 @@ def stream_lecture(lecture_id: int, token: str = Query(...), db: Session = Depen
     if not enrollment:
         raise HTTPException(status_code=403, detail="Enrollment required")
 
-    path = storage_provider.resolve(lecture.video_key)
-    if not path.exists():
+    grant = StreamGrant(
+        student_id=enrollment.student_id,
+        course_id=lecture.course_id,
+        lecture_id=lecture_id,
+        video_key=lecture.video_key,
+        expires_at=data["exp"],
+        hls_key=lecture.hls_key if lecture.hls_status == "ready" and lecture.hls_key else None,
+    )
+    stream_grants.set((token, lecture_id), grant, expires_at=data["exp"])
+    return grant
+
+
+def _cache_headers(grant: StreamGrant) -> dict[str, str]:
+    # The URL is only valid until the token's bucketed expiry, so that is as
+    # long as any shared cache in front of us may keep the bytes.
+    return {"Cache-Control": f"public, max-age={max(grant.expires_at - int(time.time()), 0)}"}
+
+
+def _stream(db: Session, token: str, lecture_id: int) -> VideoFileResponse:
+    key = (token, lecture_id)
+    grant = stream_grants.get(key) or _authorize_stream(db, token, lecture_id)
+    try:
+        if grant.video_stat is None and storage_provider.backend.path(grant.video_key) is None:
+            # Remember a remote object's size so later ranges skip the HEAD request.
+            grant = replace(grant, video_stat=storage_provider.stat(grant.video_key))
+            stream_grants.set(key, grant, expires_at=grant.expires_at)
+        return storage_provider.file_response(
+            grant.video_key,
+            media_type="video/mp4",
+            filename=PurePosixPath(grant.video_key).name,
+            headers=_cache_headers(grant),
+            content_disposition_type="inline",
+            object_stat=grant.video_stat,
+        )
+    except FileNotFoundError:
+        stream_grants.pop(key)
         raise HTTPException(status_code=404, detail="Missing file")
 
-    return FileResponse(path, media_type="video/mp4", filename=path.name)
 
+@router.api_route("/stream/{lecture_id}", methods=["GET", "HEAD"])
+def stream_lecture(lecture_id: int, token: str = Query(...), db: Session = Depends(get_db)):
+    return _stream(db, token, lecture_id)
+
+
+@router.api_route("/stream/{lecture_id}/{token}", methods=["GET", "HEAD"])
+def stream_lecture_path_signed(lecture_id: int, token: str, db: Session = Depends(get_db)):
+    return _stream(db, token, lecture_id)
+
+
+@router.api_route("/hls/{lecture_id}/{token}/{path:path}", methods=["GET", "HEAD"])
+def hls_asset(lecture_id: int, token: str, path: str, request: Request, db: Session = Depends(get_db)):
+    grant = stream_grants.get((token, lecture_id)) or _authorize_stream(db, token, lecture_id)
+    media_type = HLS_MEDIA_TYPES.get(Path(path).suffix)
+    if grant.hls_key is None or media_type is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    path = _safe_key(path)
+    try:
+        return storage_provider.file_response(
+            f"{grant.hls_key}/{path}",
+            media_type=media_type,
+            headers=_cache_headers(grant),
+            content_disposition_type="inline",
+            accept_encoding=request.headers.get("accept-encoding"),
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
 
-@router.get("/file/{path:path}")
-def serve_file(path: str):
-    full = storage_provider.resolve(path)
-    if not full.exists() or not full.is_file():
+
+@router.api_route("/file/{path:path}", methods=["GET", "HEAD"])
+def serve_file(path: str, request: Request, db: Session = Depends(get_db)):
+    path = _safe_key(path)
+    if path.startswith(PRIVATE_PREFIXES):
+        raise HTTPException(status_code=404, detail="File not found")
+    # Lecture videos only go out through /media/stream, behind the token and
+    # enrollment checks: served here as immutable blobs, any shared cache
+    # could keep them for a year.
+    if is_blob_key(path) and db.scalar(select(Lecture.id).where(Lecture.video_key == path).limit(1)) is not None:
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        # Blobs come back immutable; anything else may change, so revalidate.
+        return storage_provider.file_response(
+            path,
+            headers=None if is_blob_key(path) else {"Cache-Control": "no-cache"},
+            accept_encoding=request.headers.get("accept-encoding"),
+        )
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
-    if ".." in Path(path).parts:
-        raise HTTPException(status_code=400, detail="Invalid path")
-    return FileResponse(full)
@@ -10,7 +10,7 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.models.models import Enrollment, Payment, User
 from app.services.razorpay_service import verify_payment_signature, verify_webhook_signature
-from app.utils.deps import require_student
+from app.utils.deps import forget_principal, require_student
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
@@ -40,6 +40,8 @@ def _mark_paid(db: Session, payment: Payment, payment_id: str | None = None, sig
             user.is_active = True
 
     db.commit()
+    if payment.purpose == "admin_subscription" and payment.user_id:
+        forget_principal(payment.user_id)
 
 
 @router.post("/verify")
@@ -1,19 +1,26 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
+from pathlib import PurePosixPath
 
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
 from sqlalchemy import and_, select
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.db.session import get_db
-from app.media.signed_video import generate_video_token
+from app.media.signed_video import signed_hls_url, signed_stream_url
 from app.models.models import Certificate, Course, Enrollment, Lecture, LectureProgress, Payment
 from app.schemas.student import CompleteResponse, PlayResponse, ProgressUpdate
 from app.services.certificate_service import generate_certificate
-from app.services.course_service import build_student_course_progress, course_completion_check, mark_complete, mark_progress
+from app.services.course_service import (
+    build_student_course_progress,
+    course_completion_check,
+    init_enrollment_counters,
+    mark_complete,
+    mark_progress,
+)
+from app.services.progress_buffer import progress_buffer
 from app.services.razorpay_service import create_order
 from app.storage.provider import storage_provider
 from app.utils.deps import require_student
@@ -74,6 +81,7 @@ def enroll(course_id: int, student=Depends(require_student), db: Session = Depen
         status=status,
         organization_id=course.organization_id,
     )
+    init_enrollment_counters(db, enrollment)
     db.add(enrollment)
     db.commit()
     db.refresh(enrollment)
@@ -149,15 +157,17 @@ def play_lecture(lecture_id: int, student=Depends(require_student), db: Session
     if not lecture.video_key:
         raise HTTPException(status_code=400, detail="Video not uploaded")
 
-    token = generate_video_token(lecture.id, student.id, expires_in=900)
-    signed_url = f"{settings.public_base_url}/media/stream/{lecture.id}?token={token}"
+    if lecture.hls_status == "ready":
+        signed_url, exp = signed_hls_url(lecture.id, student.id, expires_in=900)
+    else:
+        signed_url, exp = signed_stream_url(lecture.id, student.id, expires_in=900)
     course = db.get(Course, lecture.course_id)
     watermark = f"{student.email} | {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}"
     return PlayResponse(
         signed_url=signed_url,
         watermark_text=watermark,
         watermark_course=course.title if course else "Course",
-        expires_in=900,
+        expires_in=exp - int(datetime.now(timezone.utc).timestamp()),
     )
 
 
@@ -169,8 +179,15 @@ def update_progress(lecture_id: int, payload: ProgressUpdate, student=Depends(re
     if not _has_active_enrollment(db, student.id, lecture.course_id):
         raise HTTPException(status_code=403, detail="Not enrolled")
 
+    watched_seconds = payload.watched_seconds
+    if settings.progress_write_behind:
+        watched_seconds = max(watched_seconds, progress_buffer.take(student.id, lecture_id))
+        if lecture.duration_sec <= 0 or watched_seconds < lecture.duration_sec:
+            progress_buffer.record(student.id, lecture_id, watched_seconds)
+            return {"id": None, "completed": False, "watched_seconds": watched_seconds, "buffered": True}
+
     try:
-        progress = mark_progress(db, student.id, lecture_id, payload.watched_seconds)
+        progress = mark_progress(db, student.id, lecture_id, watched_seconds)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
@@ -197,7 +214,7 @@ def complete_lecture(lecture_id: int, student=Depends(require_student), db: Sess
 
 @router.get("/progress")
 def progress(student=Depends(require_student), db: Session = Depends(get_db)):
-    return build_student_course_progress(db, student.id)
+    return build_student_course_progress(db, student.id, student.organization_id)
 
 
 @router.get("/certificates")
@@ -211,7 +228,12 @@ def download_certificate(certificate_id: int, student=Depends(require_student),
     cert = db.get(Certificate, certificate_id)
     if not cert or cert.student_id != student.id:
         raise HTTPException(status_code=404, detail="Certificate not found")
-    path = storage_provider.resolve(cert.pdf_path)
-    if not path.exists():
+    try:
+        return storage_provider.file_response(
+            cert.pdf_path,
+            media_type="application/pdf",
+            filename=PurePosixPath(cert.pdf_path).name,
+            headers={"Cache-Control": "private, no-cache"},
+        )
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="PDF missing")
-    return FileResponse(path, filename=path.name, media_type="application/pdf")
@@ -7,7 +7,7 @@ from pydantic import BaseModel, EmailStr
 from sqlalchemy import and_, func, select
 from sqlalchemy.orm import Session
 
-from app.core.security import hash_password
+from app.core.security import hash_password_pooled
 from app.db.session import get_db
 from app.core.config import settings
 from app.models.models import CreditLedger, Organization, OrganizationSubscription, Payment, User, UserCredit
@@ -152,7 +152,7 @@ def create_org_admin(org_id: int, payload: AdminCreate, db: Session = Depends(ge
         email=payload.email,
         phone=payload.phone,
         grade_or_standard=payload.grade_or_standard,
-        password_hash=hash_password(payload.password),
+        password_hash=hash_password_pooled(payload.password),
         is_active=False,
     )
     db.add(admin)
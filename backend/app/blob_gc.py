@@ -0,0 +1,16 @@
+from app.db.session import SessionLocal
+from app.services.blob_service import collect_garbage, recount_blob_refs
+
+
+def run_blob_gc() -> None:
+    db = SessionLocal()
+    try:
+        repaired = recount_blob_refs(db)
+        blobs, orphans = collect_garbage(db)
+        print(f"Repaired {repaired} blob refcount(s); deleted {blobs} unreferenced blob(s) and {orphans} orphaned file(s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_blob_gc()
@@ -9,9 +9,56 @@ class Settings(BaseSettings):
     secret_key: str = "change-me"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    stateless_auth: bool = False
+    principal_cache_ttl_sec: int = 30
+    principal_cache_size: int = 10000
+    activity_flush_interval_sec: int = 60
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 32
+    ai_transform_workers: int = 2
+    ai_transform_max_pending: int = 16
+    ai_max_working_px: int = 2048
+    ai_result_cache_max_mb: int = 1024
+    ai_job_timeout_sec: int = 1800
+    ai_job_sweep_sec: int = 300
+    ai_output_format: str = "webp"
+    ai_output_quality: int = 80
+    ai_thumbnail_px: int = 256
+    ai_preview_px: int = 1024
+    progress_write_behind: bool = False
+    progress_flush_interval_sec: int = 15
+    dashboard_refresh_interval_sec: int = 300
     video_signing_secret: str = "video-secret"
+    video_token_bucket_sec: int = 300
+    video_path_signing: bool = False
+    stream_auth_cache_ttl_sec: int = 900
+    stream_auth_cache_size: int = 10000
+    hls_enabled: bool = False
+    ffmpeg_binary: str = "ffmpeg"
+    hls_renditions: str = "360:800,720:2800"
+    hls_segment_sec: int = 6
+    hls_max_concurrent: int = 1
+    hls_max_pending: int = 32
+    hls_timeout_sec: int = 3600
+    hls_sweep_sec: int = 300
     database_url: str = "sqlite:///./udaan.db"
     local_storage_path: str = "./storage"
+    max_upload_bytes: int = 2 * 1024**3
+    blob_gc_grace_sec: int = 86400
+    resumable_upload_ttl_sec: int = 86400
+    resumable_upload_sweep_sec: int = 3600
+    storage_backend: str = "local"
+    s3_bucket: str = ""
+    s3_prefix: str = ""
+    s3_endpoint_url: str = ""
+    s3_region: str = ""
+    s3_access_key_id: str = ""
+    s3_secret_access_key: str = ""
+    s3_max_pool_connections: int = 32
+    s3_multipart_threshold_mb: int = 64
+    s3_multipart_chunk_mb: int = 16
+    s3_upload_concurrency: int = 8
     public_base_url: str = "http://localhost:8000"
 
     admin_email: str = ""
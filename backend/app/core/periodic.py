@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodic(fn: Callable[[], object], interval_sec: float) -> None:
+    """Call the blocking ``fn`` in the threadpool every ``interval_sec`` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            await run_in_threadpool(fn)
+        except Exception:  # noqa: BLE001
+            logger.exception("Periodic task %s failed", getattr(fn, "__qualname__", fn))
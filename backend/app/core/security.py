@@ -7,8 +7,12 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.workers import BoundedProcessPool
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+password_pool = BoundedProcessPool(
+    max_workers=settings.password_hash_workers, max_pending=settings.password_hash_max_pending
+)
 ALGORITHM = "HS256"
 
 
@@ -20,6 +24,20 @@ def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(password, password_hash)
 
 
+def verify_and_update_password(password: str, password_hash: str) -> tuple[bool, str | None]:
+    """Verify a password and return a fresh hash when the stored one uses an outdated bcrypt cost."""
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+def hash_password_pooled(password: str) -> str:
+    """``hash_password`` on ``password_pool``; raises ``PoolBusy`` when it is saturated."""
+    return password_pool.call(hash_password, password)
+
+
+def verify_password_pooled(password: str, password_hash: str) -> tuple[bool, str | None]:
+    return password_pool.call(verify_and_update_password, password, password_hash)
+
+
 def create_access_token(subject: str, role: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
     payload = {"sub": subject, "role": role, "type": "access", "exp": expire}
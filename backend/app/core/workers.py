@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+
+class PoolBusy(RuntimeError):
+    """Raised when a pool already has ``max_pending`` jobs queued or running."""
+
+
+class BoundedProcessPool:
+    """A lazily started ``ProcessPoolExecutor`` with a cap on outstanding jobs.
+
+    CPU-bound work (bcrypt, image processing) is pushed out of the API process
+    so it cannot starve the event loop or the threadpool. Once ``max_pending``
+    jobs are in flight further submissions fail fast with ``PoolBusy`` instead of
+    queueing without bound; routes turn that into a 503.
+    """
+
+    executor_class: type[Executor] = ProcessPoolExecutor
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self.executor_class(max_workers=self.max_workers)
+            return self._executor
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PoolBusy("Worker pool is saturated")
+            self._pending += 1
+
+    def _release(self, *_: Any) -> None:
+        self.release()
+
+    def reserve(self, n: int) -> None:
+        """Claim ``n`` slots up front for a job that submits its stages later.
+
+        All or nothing: raises ``PoolBusy`` unless every slot is free. Each
+        later ``submit(..., reserved=True)`` uses one; hand back any the job
+        did not use with ``release``.
+        """
+        with self._lock:
+            if self._pending + n > self.max_pending:
+                raise PoolBusy("Worker pool is saturated")
+            self._pending += n
+
+    def release(self, n: int = 1) -> None:
+        with self._lock:
+            self._pending -= n
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._reserve()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), partial(fn, *args))
+        finally:
+            self._release()
+
+    def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Blocking ``run`` for sync routes, which already sit on a threadpool thread."""
+        self._reserve()
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._release()
+
+    def start(self, fn: Callable[..., Any], *args: Any, reserved: bool = False) -> Future:
+        """``submit`` for callers that are not awaiting: returns the executor's own future."""
+        if not reserved:
+            self._reserve()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def submit(self, fn: Callable[..., Any], *args: Any, reserved: bool = False) -> asyncio.Future:
+        """Start ``fn`` and return at once; the slot is held until the job finishes.
+
+        Raises ``PoolBusy`` synchronously, so callers can refuse work before
+        recording anything about it. With ``reserved`` the job runs on a slot
+        claimed earlier through ``reserve``.
+        """
+        return asyncio.wrap_future(self.start(fn, *args, reserved=reserved))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BoundedThreadPool(BoundedProcessPool):
+    """The same bounded queue on dedicated threads, for jobs that mostly wait on a subprocess.
+
+    Keeps long jobs such as ffmpeg packaging off the AnyIO threadpool that
+    sync routes run on.
+    """
+
+    executor_class = ThreadPoolExecutor
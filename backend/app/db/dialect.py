@@ -0,0 +1,24 @@
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(db: Session):
+    """The ``insert`` construct with ``on_conflict_*`` support for the bound database."""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def greatest(db: Session, a, b):
+    # SQLite's two-argument max() is the scalar counterpart of GREATEST.
+    return func.greatest(a, b) if db.get_bind().dialect.name == "postgresql" else func.max(a, b)
+
+
+def inserted_flag(db: Session):
+    """``RETURNING`` column that is true for rows an upsert inserted, or ``None`` where the database cannot tell.
+
+    PostgreSQL leaves ``xmax`` at 0 on a row version created by an INSERT.
+    Elsewhere callers check which rows already exist before upserting.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return literal_column("(xmax = 0)").label("inserted")
+    return None
@@ -1,12 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.api.router import api_router
 from app.core.config import settings
+from app.core.periodic import run_periodic
+from app.core.security import password_pool
+from app.core.workers import PoolBusy
+from app.services.activity_service import activity_buffer
+from app.services.ai_service import ai_pool, fail_stale_jobs
+from app.services.dashboard_service import run_dashboard_refresh
+from app.services.hls_service import hls_pool, resume_stale_hls
+from app.services.progress_buffer import progress_buffer
+from app.storage.resumable import resumable_uploads
 
-app = FastAPI(title=settings.app_name)
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    tasks = []
+    if settings.stateless_auth:
+        tasks.append(asyncio.create_task(run_periodic(activity_buffer.flush, settings.activity_flush_interval_sec)))
+    if settings.dashboard_refresh_interval_sec > 0:
+        tasks.append(asyncio.create_task(run_periodic(run_dashboard_refresh, settings.dashboard_refresh_interval_sec)))
+    if settings.progress_write_behind:
+        tasks.append(asyncio.create_task(run_periodic(progress_buffer.flush, settings.progress_flush_interval_sec)))
+    if settings.resumable_upload_sweep_sec > 0:
+        tasks.append(asyncio.create_task(run_periodic(resumable_uploads.expire, settings.resumable_upload_sweep_sec)))
+    if settings.ai_job_sweep_sec > 0:
+        # Jobs orphaned by a previous process are refunded right away, then periodically.
+        await run_in_threadpool(fail_stale_jobs)
+        tasks.append(asyncio.create_task(run_periodic(fail_stale_jobs, settings.ai_job_sweep_sec)))
+    if settings.hls_sweep_sec > 0:
+        # Likewise lectures whose packaging a previous process never finished.
+        await run_in_threadpool(resume_stale_hls)
+        tasks.append(asyncio.create_task(run_periodic(resume_stale_hls, settings.hls_sweep_sec)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        activity_buffer.flush()
+        progress_buffer.flush()
+        password_pool.shutdown()
+        ai_pool.shutdown()
+        hls_pool.shutdown()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,10 +59,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Resumable upload clients read these from PATCH/HEAD/POST responses.
+    expose_headers=["Location", "Tus-Resumable", "Upload-Offset", "Upload-Length", "Upload-Expires"],
 )
 
 app.include_router(api_router)
 
+
+@app.exception_handler(PoolBusy)
+async def pool_busy_handler(_: Request, exc: PoolBusy):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry shortly"}, headers={"Retry-After": "1"})
+
 Path(settings.local_storage_path).mkdir(parents=True, exist_ok=True)
 
 
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+# Atoms on the path from moov down to the chunk offset tables; everything else is copied verbatim.
+CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+COPY_CHUNK = 1024 * 1024
+
+
+class MP4Error(ValueError):
+    """Raised for files that are not ISO-BMFF or that cannot be rewritten safely."""
+
+
+@dataclass(frozen=True)
+class Atom:
+    kind: bytes
+    offset: int
+    size: int
+    header: int
+
+
+@dataclass(frozen=True)
+class FaststartResult:
+    relocated: bool
+    duration_sec: int | None
+
+
+def _read_header(fh: BinaryIO, offset: int, end: int) -> Atom | None:
+    if offset + 8 > end:
+        return None
+    fh.seek(offset)
+    raw = fh.read(8)
+    if len(raw) < 8:
+        return None
+    size, kind = struct.unpack(">I4s", raw)
+    header = 8
+    if size == 1:
+        size = struct.unpack(">Q", fh.read(8))[0]
+        header = 16
+    elif size == 0:
+        size = end - offset
+    if size < header or offset + size > end:
+        raise MP4Error(f"Truncated or corrupt {kind!r} atom at offset {offset}")
+    return Atom(kind, offset, size, header)
+
+
+def top_level_atoms(fh: BinaryIO, file_size: int) -> list[Atom]:
+    atoms = []
+    offset = 0
+    while (atom := _read_header(fh, offset, file_size)) is not None:
+        atoms.append(atom)
+        offset += atom.size
+    if not atoms or atoms[0].kind not in {b"ftyp", b"styp", b"free", b"skip", b"wide"}:
+        raise MP4Error("Not an MP4 file")
+    return atoms
+
+
+def _children(buf: bytes, start: int, end: int) -> Iterator[Atom]:
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise MP4Error(f"Corrupt {kind!r} atom inside moov")
+        yield Atom(kind, offset, size, header)
+        offset += size
+
+
+def _walk(buf: bytes, start: int, end: int) -> Iterator[Atom]:
+    for atom in _children(buf, start, end):
+        yield atom
+        if atom.kind in CONTAINERS:
+            yield from _walk(buf, atom.offset + atom.header, atom.offset + atom.size)
+
+
+def movie_duration(moov: bytes) -> int | None:
+    """Whole seconds from ``mvhd`` (``duration / timescale``), or ``None`` if absent."""
+    for atom in _walk(moov, 8, len(moov)):
+        if atom.kind == b"mvhd":
+            body = atom.offset + atom.header
+            if moov[body] == 1:
+                timescale, duration = struct.unpack_from(">IQ", moov, body + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", moov, body + 12)
+            return round(duration / timescale) if timescale else None
+    return None
+
+
+def _patch_moov(moov: bytes, delta: int, upgrade: bool) -> bytes:
+    """Rebuild ``moov`` with every chunk offset moved by ``delta``.
+
+    With ``upgrade`` every 32-bit ``stco`` becomes a 64-bit ``co64``; container
+    sizes on the way up are recomputed so the tree stays consistent.
+    """
+
+    def rebuild(start: int, end: int) -> bytes:
+        out = bytearray()
+        tail = start
+        for atom in _children(moov, start, end):
+            tail = atom.offset + atom.size
+            body_start = atom.offset + atom.header
+            body_end = atom.offset + atom.size
+            if atom.kind in CONTAINERS:
+                body = rebuild(body_start, body_end)
+                kind = atom.kind
+            elif atom.kind in {b"stco", b"co64"}:
+                if body_end - body_start < 8:
+                    raise MP4Error(f"Truncated {atom.kind!r} atom")
+                version_flags, count = struct.unpack_from(">II", moov, body_start)
+                wide = atom.kind == b"co64"
+                if count > (body_end - body_start - 8) // (8 if wide else 4):
+                    raise MP4Error(f"{atom.kind!r} entry count {count} exceeds its atom")
+                fmt = f">{count}{'Q' if wide else 'I'}"
+                offsets = [o + delta for o in struct.unpack_from(fmt, moov, body_start + 8)]
+                if wide or upgrade:
+                    kind, body = b"co64", struct.pack(f">II{count}Q", version_flags, count, *offsets)
+                else:
+                    if offsets and max(offsets) > 0xFFFFFFFF:
+                        raise OverflowError
+                    kind, body = b"stco", struct.pack(f">II{count}I", version_flags, count, *offsets)
+            else:
+                out += moov[atom.offset : body_end]
+                continue
+            out += struct.pack(">I4s", 8 + len(body), kind) + body
+        # Keep any padding after the last child (some muxers write a 4-byte terminator).
+        return bytes(out + moov[tail:end])
+
+    body = rebuild(8, len(moov))
+    return struct.pack(">I4s", 8 + len(body), b"moov") + body
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, offset: int, length: int) -> None:
+    src.seek(offset)
+    while length > 0:
+        chunk = src.read(min(COPY_CHUNK, length))
+        if not chunk:
+            raise MP4Error("Unexpected end of file")
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def faststart(path: Path) -> FaststartResult:
+    """Move ``moov`` in front of ``mdat`` in place and report the movie duration.
+
+    Only ``moov`` is held in memory; media data is copied through in 1 MiB
+    chunks into a sibling temp file that is fsync'd and atomically renamed over
+    the original. Files that already start with ``moov`` are left untouched.
+    Any malformed structure raises ``MP4Error``.
+    """
+    try:
+        return _faststart(path)
+    except (struct.error, IndexError) as exc:
+        raise MP4Error(f"Corrupt MP4: {exc}") from exc
+
+
+def _faststart(path: Path) -> FaststartResult:
+    file_size = path.stat().st_size
+    with path.open("rb") as src:
+        atoms = top_level_atoms(src, file_size)
+        moov_atom = next((a for a in atoms if a.kind == b"moov"), None)
+        if moov_atom is None:
+            raise MP4Error("No moov atom")
+        src.seek(moov_atom.offset)
+        moov = src.read(moov_atom.size)
+        if moov_atom.header == 16:
+            moov = struct.pack(">I4s", moov_atom.size - 8, b"moov") + moov[16:]
+        duration = movie_duration(moov)
+        if any(a.kind == b"cmov" for a in _walk(moov, 8, len(moov))):
+            raise MP4Error("Compressed moov is not supported")
+
+        first_mdat = next((i for i, a in enumerate(atoms) if a.kind == b"mdat"), None)
+        moov_index = atoms.index(moov_atom)
+        if first_mdat is None or moov_index < first_mdat:
+            return FaststartResult(relocated=False, duration_sec=duration)
+
+        if any(a.kind == b"mdat" for a in atoms[moov_index + 1 :]):
+            raise MP4Error("Media data after moov is not supported")
+
+        # All media data sits between the first mdat and the old moov, so every
+        # chunk moves forward by exactly the size of the relocated moov. If a
+        # shifted offset no longer fits in 32 bits, stco tables become co64.
+        try:
+            new_moov = _patch_moov(moov, len(moov), upgrade=False)
+        except OverflowError:
+            wide_size = len(_patch_moov(moov, 0, upgrade=True))
+            new_moov = _patch_moov(moov, wide_size, upgrade=True)
+
+        tmp = path.with_name(f".{path.name}.faststart")
+        try:
+            with tmp.open("wb") as dst:
+                for atom in atoms[:first_mdat]:
+                    _copy_range(src, dst, atom.offset, atom.size)
+                dst.write(new_moov)
+                for atom in atoms[first_mdat:]:
+                    if atom is not moov_atom:
+                        _copy_range(src, dst, atom.offset, atom.size)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+    return FaststartResult(relocated=True, duration_sec=duration)
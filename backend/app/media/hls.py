@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+from app.core.config import settings
+
+MASTER_PLAYLIST = "master.m3u8"
+AUDIO_KBPS = 128
+
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+    ".ts": "video/mp2t",
+}
+
+
+class HLSError(RuntimeError):
+    """Raised when ffmpeg cannot package a video."""
+
+
+def parse_renditions(spec: str) -> list[tuple[int, int]]:
+    """Parse ``"360:800,720:2800"`` into ``[(height, video_kbps), ...]``, lowest first."""
+    renditions = []
+    for item in spec.split(","):
+        if item.strip():
+            height, kbps = item.split(":")
+            renditions.append((int(height), int(kbps)))
+    return sorted(renditions)
+
+
+def ffmpeg_command(source: Path, out_dir: Path, height: int, kbps: int, segment_sec: int) -> list[str]:
+    """ffmpeg arguments for one fMP4 HLS rendition with keyframes on segment boundaries."""
+    return [
+        settings.ffmpeg_binary,
+        "-nostdin",
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        str(source),
+        "-map",
+        "0:v:0",
+        "-map",
+        "0:a:0?",
+        "-vf",
+        f"scale=-2:'min({height},ih)'",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-b:v",
+        f"{kbps}k",
+        "-maxrate",
+        f"{kbps * 107 // 100}k",
+        "-bufsize",
+        f"{kbps * 2}k",
+        "-force_key_frames",
+        f"expr:gte(t,n_forced*{segment_sec})",
+        "-c:a",
+        "aac",
+        "-b:a",
+        f"{AUDIO_KBPS}k",
+        "-ac",
+        "2",
+        "-f",
+        "hls",
+        "-hls_time",
+        str(segment_sec),
+        "-hls_playlist_type",
+        "vod",
+        "-hls_segment_type",
+        "fmp4",
+        "-hls_fmp4_init_filename",
+        "init.mp4",
+        "-hls_segment_filename",
+        str(out_dir / "seg_%05d.m4s"),
+        str(out_dir / "index.m3u8"),
+    ]
+
+
+def master_playlist(renditions: list[tuple[int, int]]) -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for height, kbps in renditions:
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={(kbps + AUDIO_KBPS) * 1000}")
+        lines.append(f"{height}p/index.m3u8")
+    return "\n".join(lines) + "\n"
+
+
+def package_hls(source: Path, target: Path, renditions: list[tuple[int, int]], segment_sec: int) -> list[str]:
+    """Segment ``source`` into ``target/<height>p/`` renditions plus a master playlist.
+
+    Output is built in a sibling ``.part`` directory and renamed into place
+    only once every rendition succeeded. Returns the rendition names.
+    """
+    if not renditions:
+        raise HLSError("No HLS renditions configured")
+    work = target.with_name(f"{target.name}.part")
+    shutil.rmtree(work, ignore_errors=True)
+    work.mkdir(parents=True)
+    try:
+        for height, kbps in renditions:
+            out_dir = work / f"{height}p"
+            out_dir.mkdir()
+            try:
+                subprocess.run(
+                    ffmpeg_command(source, out_dir, height, kbps, segment_sec),
+                    check=True,
+                    capture_output=True,
+                    timeout=settings.hls_timeout_sec,
+                )
+            except (OSError, subprocess.SubprocessError) as exc:
+                stderr = getattr(exc, "stderr", None) or b""
+                raise HLSError(f"ffmpeg failed for {height}p: {exc} {stderr.decode(errors='replace')[-500:]}") from exc
+        (work / MASTER_PLAYLIST).write_text(master_playlist(renditions))
+        os.replace(work, target)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    return [f"{height}p" for height, _ in renditions]
@@ -1,28 +1,81 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
-
-from itsdangerous import BadSignature, URLSafeSerializer
+import base64
+import hashlib
+import hmac
+import math
+import time
 
 from app.core.config import settings
 
-serializer = URLSafeSerializer(settings.video_signing_secret, salt="video")
+_KEY = hashlib.sha256(f"video:{settings.video_signing_secret}".encode()).digest()
+_SIG_BYTES = 16
+
+
+def _sign(lecture_id: int, user_id: int, exp: int) -> str:
+    mac = hmac.new(_KEY, f"{lecture_id}.{user_id}.{exp}".encode(), hashlib.sha256).digest()[:_SIG_BYTES]
+    return base64.urlsafe_b64encode(mac).rstrip(b"=").decode()
+
+
+def bucketed_expiry(expires_in: int, now: float | None = None) -> int:
+    """Round ``now + expires_in`` up to the next ``video_token_bucket_sec`` boundary.
+
+    Every play of a lecture by the same student inside one bucket yields the
+    same URL, which is what lets a proxy cache reuse the bytes.
+    """
+    now = time.time() if now is None else now
+    bucket = max(settings.video_token_bucket_sec, 1)
+    return int(math.ceil((now + expires_in) / bucket) * bucket)
 
 
 def generate_video_token(lecture_id: int, user_id: int, expires_in: int = 900) -> str:
-    exp = int(datetime.now(timezone.utc).timestamp()) + expires_in
-    return serializer.dumps({"lecture_id": lecture_id, "user_id": user_id, "exp": exp})
+    """Return ``<user_id>.<exp>.<sig>``, a URL- and path-safe HMAC token."""
+    exp = bucketed_expiry(expires_in)
+    return f"{user_id}.{exp}.{_sign(lecture_id, user_id, exp)}"
 
 
-def verify_video_token(token: str) -> dict:
-    data = serializer.loads(token)
-    if data["exp"] < int(datetime.now(timezone.utc).timestamp()):
+def verify_video_token(token: str, lecture_id: int) -> dict:
+    try:
+        user_part, exp_part, sig = token.split(".")
+        user_id, exp = int(user_part), int(exp_part)
+    except ValueError as exc:
+        raise ValueError("Malformed token") from exc
+    if not hmac.compare_digest(sig, _sign(lecture_id, user_id, exp)):
+        raise ValueError("Bad signature")
+    if exp < int(time.time()):
         raise ValueError("Token expired")
-    return data
+    return {"lecture_id": lecture_id, "user_id": user_id, "exp": exp}
 
 
-def safe_verify(token: str) -> dict | None:
+def safe_verify(token: str, lecture_id: int) -> dict | None:
     try:
-        return verify_video_token(token)
-    except (BadSignature, ValueError):
+        return verify_video_token(token, lecture_id)
+    except ValueError:
         return None
+
+
+def _token_and_expiry(lecture_id: int, user_id: int, expires_in: int) -> tuple[str, int]:
+    token = generate_video_token(lecture_id, user_id, expires_in)
+    return token, int(token.split(".")[1])
+
+
+def signed_stream_url(lecture_id: int, user_id: int, expires_in: int = 900) -> tuple[str, int]:
+    """Build the public stream URL for a lecture and return it with its expiry.
+
+    With ``video_path_signing`` the token is a path segment instead of a query
+    parameter, for caches and CDNs that drop or ignore query strings.
+    """
+    token, exp = _token_and_expiry(lecture_id, user_id, expires_in)
+    if settings.video_path_signing:
+        return f"{settings.public_base_url}/media/stream/{lecture_id}/{token}", exp
+    return f"{settings.public_base_url}/media/stream/{lecture_id}?token={token}", exp
+
+
+def signed_hls_url(lecture_id: int, user_id: int, expires_in: int = 900) -> tuple[str, int]:
+    """Master playlist URL for a packaged lecture.
+
+    HLS always signs in the path: the playlists reference their variants and
+    segments relatively, so every follow-up request inherits the token.
+    """
+    token, exp = _token_and_expiry(lecture_id, user_id, expires_in)
+    return f"{settings.public_base_url}/media/hls/{lecture_id}/{token}/master.m3u8", exp
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.storage.backends import ObjectStat
+from app.utils.cache import TTLCache
+
+
+@dataclass(frozen=True)
+class StreamGrant:
+    student_id: int
+    course_id: int
+    lecture_id: int
+    video_key: str
+    expires_at: int
+    hls_key: str | None = None
+    # Video size/mtime, so remote backends are not asked for it on every range.
+    video_stat: ObjectStat | None = None
+
+
+# Positive authorization decisions for /media/stream keyed by (token, lecture_id).
+# Each entry lives until the token's own ``exp`` at the latest, so the range
+# requests a player fires after the first one skip token verification and the
+# Lecture/Enrollment lookups. The cache is per process: revocations clear it
+# here, other workers converge within STREAM_AUTH_CACHE_TTL_SEC.
+stream_grants: TTLCache[tuple[str, int], StreamGrant] = TTLCache(
+    maxsize=settings.stream_auth_cache_size, ttl=settings.stream_auth_cache_ttl_sec
+)
+
+
+def revoke_stream_grants(
+    student_id: int | None = None, course_id: int | None = None, lecture_id: int | None = None
+) -> int:
+    """Drop cached grants matching every given field."""
+
+    def _matches(_: tuple[str, int], grant: StreamGrant) -> bool:
+        return (
+            (student_id is None or grant.student_id == student_id)
+            and (course_id is None or grant.course_id == course_id)
+            and (lecture_id is None or grant.lecture_id == lecture_id)
+        )
+
+    return stream_grants.discard_where(_matches)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import os
+import stat
+from email.utils import parsedate_to_datetime
+from secrets import token_hex
+from typing import AsyncIterator, Mapping
+
+import anyio
+from starlette.concurrency import iterate_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from app.storage.backends import ObjectStat, StorageBackend
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+# Representation headers a 304 must repeat (RFC 9110 15.4.5).
+NOT_MODIFIED_HEADERS = {b"cache-control", b"content-location", b"etag", b"expires", b"last-modified", b"vary"}
+
+
+def is_not_modified(request_headers: Headers, response_headers: Mapping[str, str]) -> bool:
+    """Evaluate ``If-None-Match`` (or, without it, ``If-Modified-Since``) for a GET/HEAD."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = response_headers.get("etag")
+        if etag is None:
+            return False
+        # Weak comparison, as RFC 9110 requires for If-None-Match.
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = response_headers.get("last-modified")
+    if not if_modified_since or not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+class VideoFileResponse(FileResponse):
+    """``FileResponse`` tuned for media playback.
+
+    Starlette already answers ``Range``/``If-Range`` with ``206`` and sets
+    ``Accept-Ranges``/``ETag``. On top of that this answers conditional
+    requests with ``304 Not Modified``, serves the file inline,
+    labels ``multipart/byteranges`` replies correctly, reads in larger chunks
+    and, when the ASGI server advertises the ``http.response.zerocopysend``
+    extension, hands the file descriptor to the server so the bytes go out via
+    ``sendfile(2)`` without passing through Python.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, path, **kwargs):
+        kwargs.setdefault("content_disposition_type", "inline")
+        super().__init__(path, **kwargs)
+        self._zerocopy = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+        if self.stat_result is None:
+            self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            self.set_stat_headers(self.stat_result)
+        if scope["method"].upper() in {"GET", "HEAD"} and is_not_modified(Headers(scope=scope), self.headers):
+            headers = [(k, v) for k, v in self.raw_headers if k in NOT_MODIFIED_HEADERS]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        await super().__call__(scope, receive, send)
+
+    async def _chunks(self, start: int, end: int) -> AsyncIterator[bytes]:
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            while start < end:
+                chunk = await file.read(min(self.chunk_size, end - start))
+                if not chunk:
+                    break
+                start += len(chunk)
+                yield chunk
+
+    async def _send_range(self, send: Send, start: int, end: int, more_body: bool = False) -> None:
+        async for chunk in self._chunks(start, end):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        if not more_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif self._zerocopy:
+            await self._sendfile(send, 0, None)
+        else:
+            await self._send_range(send, 0, int(self.headers["content-length"]))
+
+    async def _handle_single_range(self, send: Send, start: int, end: int, file_size: int, send_header_only: bool) -> None:
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        if send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif self._zerocopy:
+            await self._sendfile(send, start, end - start)
+        else:
+            await self._send_range(send, start, end)
+
+    async def _handle_multiple_ranges(
+        self, send: Send, ranges: list[tuple[int, int]], file_size: int, send_header_only: bool
+    ) -> None:
+        # Starlette puts the multipart marker in Content-Range and keeps the
+        # file's Content-Type; RFC 9110 wants it the other way round.
+        boundary = token_hex(13)
+        content_length, part_header = self.generate_multipart(ranges, boundary, file_size, self.headers["content-type"])
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        self.headers["content-length"] = str(content_length)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        if send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        for start, end in ranges:
+            await send({"type": "http.response.body", "body": part_header(start, end), "more_body": True})
+            await self._send_range(send, start, end, more_body=True)
+            await send({"type": "http.response.body", "body": b"\n", "more_body": True})
+        await send({"type": "http.response.body", "body": f"\n--{boundary}--\n".encode("latin-1"), "more_body": False})
+
+    async def _sendfile(self, send: Send, offset: int, count: int | None) -> None:
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            await send({"type": ZEROCOPY_EXTENSION, "file": file, "offset": offset, "count": count, "more_body": False})
+        finally:
+            await anyio.to_thread.run_sync(file.close)
+
+
+class ObjectResponse(VideoFileResponse):
+    """The same Range/ETag handling for an object in a remote storage backend.
+
+    Every response (or range of one) is a ranged GET against the backend, so
+    a seek only pulls the requested bytes through this process.
+    """
+
+    def __init__(self, backend: StorageBackend, key: str, object_stat: ObjectStat, **kwargs):
+        self.backend = backend
+        self.key = key
+        fake_stat = os.stat_result((stat.S_IFREG, 0, 0, 0, 0, 0, object_stat.size, 0, int(object_stat.mtime), 0))
+        super().__init__(key, stat_result=fake_stat, **kwargs)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # There is no local file descriptor to hand to sendfile.
+        await super().__call__({**scope, "extensions": {}}, receive, send)
+
+    async def _chunks(self, start: int, end: int) -> AsyncIterator[bytes]:
+        async for chunk in iterate_in_threadpool(self.backend.read_range(self.key, start, end)):
+            yield chunk
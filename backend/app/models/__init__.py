@@ -1,10 +1,12 @@
 from app.models.models import (
+    AIResultCache,
     AITransformJob,
     Certificate,
     Payment,
     CertificateSetting,
     Course,
     CreditLedger,
+    DashboardRollup,
     Enrollment,
     Lecture,
     LectureProgress,
@@ -12,6 +14,7 @@ from app.models.models import (
     OrganizationSubscription,
     UserCredit,
     RefreshToken,
+    StoredBlob,
     User,
 )
 
@@ -28,6 +31,9 @@ __all__ = [
     "Certificate",
     "Payment",
     "AITransformJob",
+    "AIResultCache",
     "CertificateSetting",
+    "DashboardRollup",
     "RefreshToken",
+    "StoredBlob",
 ]
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -34,6 +34,7 @@ class OrganizationSubscription(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_org_role_created", "organization_id", "role", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     role: Mapped[str] = mapped_column(String(20), nullable=False)
@@ -50,6 +51,7 @@ class User(Base):
 
 class Course(Base):
     __tablename__ = "courses"
+    __table_args__ = (Index("ix_courses_org_created", "organization_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     organization_id: Mapped[Optional[int]] = mapped_column(ForeignKey("organizations.id"), nullable=True)
@@ -70,6 +72,11 @@ class Lecture(Base):
     title: Mapped[str] = mapped_column(String(180), nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text)
     video_key: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    hls_status: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+    hls_key: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    hls_renditions: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    # Set with hls_status; the HLS sweep picks up rows stuck pending/processing by age.
+    hls_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     duration_sec: Mapped[int] = mapped_column(Integer, default=0)
     order_index: Mapped[int] = mapped_column(Integer, default=1)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -79,13 +86,19 @@ class Lecture(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
-    __table_args__ = (UniqueConstraint("student_id", "course_id", name="uq_enrollment_student_course"),)
+    __table_args__ = (
+        UniqueConstraint("student_id", "course_id", name="uq_enrollment_student_course"),
+        Index("ix_enrollments_org_enrolled", "organization_id", "enrolled_at", "id"),
+        Index("ix_enrollments_org_status_enrolled", "organization_id", "status", "enrolled_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     organization_id: Mapped[Optional[int]] = mapped_column(ForeignKey("organizations.id"), nullable=True)
     student_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     course_id: Mapped[int] = mapped_column(ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
     status: Mapped[str] = mapped_column(String(20), default="pending")
+    completed_lectures: Mapped[int] = mapped_column(Integer, default=0)
+    total_lectures: Mapped[int] = mapped_column(Integer, default=0)
     enrolled_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
@@ -127,8 +140,13 @@ class LectureProgress(Base):
 
 class Certificate(Base):
     __tablename__ = "certificates"
+    __table_args__ = (
+        Index("ix_certificates_issued", "issued_at", "id"),
+        Index("ix_certificates_org_issued", "organization_id", "issued_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    organization_id: Mapped[Optional[int]] = mapped_column(ForeignKey("organizations.id"), nullable=True)
     student_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     course_id: Mapped[int] = mapped_column(ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
     certificate_no: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
@@ -138,6 +156,8 @@ class Certificate(Base):
 
 class AITransformJob(Base):
     __tablename__ = "ai_transform_jobs"
+    # Releasing an output without a cache entry asks whether any job still shows it.
+    __table_args__ = (Index("ix_ai_transform_jobs_output", "output_image_path"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     student_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -145,7 +165,48 @@ class AITransformJob(Base):
     preset: Mapped[str] = mapped_column(String(60), nullable=False)
     user_prompt: Mapped[Optional[str]] = mapped_column(Text)
     output_image_path: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Downscaled renditions of the output; NULL for jobs from before derivatives existed.
+    thumbnail_path: Mapped[Optional[str]] = mapped_column(String(255))
+    preview_path: Mapped[Optional[str]] = mapped_column(String(255))
+    # queued -> succeeded | failed; the credit is reserved while queued and refunded on failure.
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued", server_default="queued")
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class AIResultCache(Base):
+    """Transform outputs keyed by (input SHA-256, preset, pipeline version).
+
+    ``refs`` counts the jobs showing an output. Outputs no job shows any more
+    stay as a cache, evicted LRU within ``AI_RESULT_CACHE_MAX_MB``.
+    """
+
+    __tablename__ = "ai_result_cache"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    input_sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    preset: Mapped[str] = mapped_column(String(60), nullable=False)
+    pipeline_version: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    refs: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index("ix_ai_result_cache_last_used", "last_used_at"),)
+
+
+class DashboardRollup(Base):
+    __tablename__ = "dashboard_rollups"
+
+    organization_id: Mapped[int] = mapped_column(ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
+    total_students: Mapped[int] = mapped_column(Integer, default=0)
+    enrolled_students: Mapped[int] = mapped_column(Integer, default=0)
+    total_progress: Mapped[int] = mapped_column(Integer, default=0)
+    completed_progress: Mapped[int] = mapped_column(Integer, default=0)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 
 class CertificateSetting(Base):
@@ -184,3 +245,16 @@ class CreditLedger(Base):
     amount: Mapped[int] = mapped_column(Integer, nullable=False)
     reason: Mapped[str] = mapped_column(String(120), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class StoredBlob(Base):
+    __tablename__ = "stored_blobs"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    refcount: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
@@ -0,0 +1,15 @@
+from app.db.session import SessionLocal
+from app.services.course_service import reconcile_enrollment_counters
+
+
+def run_reconcile() -> None:
+    db = SessionLocal()
+    try:
+        repaired = reconcile_enrollment_counters(db)
+        print(f"Repaired progress counters on {repaired} enrollment(s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_reconcile()
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 
 
 class AIHistoryOut(BaseModel):
@@ -11,7 +11,32 @@ class AIHistoryOut(BaseModel):
     user_prompt: str | None
     input_image_path: str
     output_image_path: str
+    thumbnail_path: str | None = None
+    preview_path: str | None = None
+    status: str
+    error: str | None
+    started_at: datetime | None
+    finished_at: datetime | None
     created_at: datetime
 
+    def _url(self, key: str | None) -> str | None:
+        # Jobs from before derivatives existed fall back to the full output.
+        return f"/media/file/{key or self.output_image_path}" if self.status == "succeeded" else None
+
+    @computed_field
+    @property
+    def output_url(self) -> str | None:
+        return self._url(self.output_image_path)
+
+    @computed_field
+    @property
+    def thumbnail_url(self) -> str | None:
+        return self._url(self.thumbnail_path)
+
+    @computed_field
+    @property
+    def preview_url(self) -> str | None:
+        return self._url(self.preview_path)
+
     class Config:
         from_attributes = True
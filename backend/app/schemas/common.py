@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Generic, TypeVar
 
 from pydantic import BaseModel
 
+T = TypeVar("T")
+
 
 class UserOut(BaseModel):
     id: int
@@ -16,3 +19,8 @@ class UserOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None = None
@@ -51,6 +51,8 @@ class LectureOut(BaseModel):
     title: str
     description: str | None
     video_key: str | None
+    hls_status: str | None = None
+    hls_renditions: str | None = None
     duration_sec: int
     order_index: int
 
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+
+from app.db.session import SessionLocal
+from app.models.models import User
+
+
+class ActivityBuffer:
+    """Collects ``last_active_at`` bumps in memory and writes them in one batch.
+
+    Only the newest timestamp per user is kept, so a flush issues a single
+    executemany UPDATE no matter how many requests a user made in between.
+    """
+
+    def __init__(self):
+        self._pending: dict[int, datetime] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, user_id: int, at: datetime | None = None) -> None:
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            self._pending[user_id] = at
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(User),
+                [{"id": user_id, "last_active_at": at} for user_id, at in batch.items()],
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for user_id, at in batch.items():
+                    current = self._pending.get(user_id)
+                    if current is None or current < at:
+                        self._pending[user_id] = at
+            raise
+        finally:
+            db.close()
+        return len(batch)
+
+
+activity_buffer = ActivityBuffer()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.ai.encoding import DERIVATIVES, derivative_path, output_extension
+from app.ai.presets import PIPELINE_VERSION
+from app.core.config import settings
+from app.db.dialect import dialect_insert, greatest
+from app.models.models import AIResultCache, AITransformJob
+from app.storage.provider import storage_provider
+
+EVICT_BATCH = 100
+
+
+def result_key(input_sha256: str, preset: str) -> str:
+    return f"ai/output/{input_sha256}_{preset}_v{PIPELINE_VERSION}{output_extension()}"
+
+
+def output_keys(key: str) -> list[str]:
+    """The output stored at ``key`` followed by its derivatives."""
+    return [key, *(derivative_path(key, name) for name in DERIVATIVES)]
+
+
+def lookup(db: Session, input_sha256: str, preset: str) -> str | None:
+    """Return the stored output key for this input and preset, or ``None`` to render it.
+
+    A hit counts one more job reference to the output and marks it recently
+    used, in the caller's transaction: the job recorded with it must commit
+    in the same transaction.
+    """
+    key = result_key(input_sha256, preset)
+    if db.get(AIResultCache, key) is None:
+        return None
+    if not storage_provider.exists(key):
+        db.execute(delete(AIResultCache).where(AIResultCache.key == key, AIResultCache.refs == 0))
+        return None
+    taken = db.execute(
+        update(AIResultCache)
+        .where(AIResultCache.key == key)
+        .values(refs=AIResultCache.refs + 1, hits=AIResultCache.hits + 1, last_used_at=func.now())
+    ).rowcount
+    return key if taken else None
+
+
+def record(db: Session, input_sha256: str, preset: str, key: str, size: int) -> None:
+    """Register a freshly stored output for one job; ``size`` counts its derivatives too. Part of the caller's transaction."""
+    stmt = dialect_insert(db)(AIResultCache).values(
+        key=key, input_sha256=input_sha256, preset=preset, pipeline_version=PIPELINE_VERSION, size=size, refs=1
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[AIResultCache.key],
+            set_={"size": size, "refs": AIResultCache.refs + 1, "last_used_at": func.now()},
+        )
+    )
+
+
+def release(db: Session, key: str) -> bool:
+    """Drop one job reference to the output at ``key``; part of the caller's transaction.
+
+    Returns ``True`` for an output stored before references were counted
+    that no job shows any more: it has no cache entry, so the caller deletes
+    its ``output_keys`` after committing.
+    """
+    released = db.execute(
+        update(AIResultCache)
+        .where(AIResultCache.key == key)
+        .values(refs=greatest(db, AIResultCache.refs - 1, 0), last_used_at=func.now())
+    ).rowcount
+    return not released and not _referenced(db, key)
+
+
+def _referenced(db: Session, key: str) -> bool:
+    return db.scalar(select(AITransformJob.id).where(AITransformJob.output_image_path == key).limit(1)) is not None
+
+
+def _cached_bytes(db: Session) -> int:
+    return db.scalar(select(func.coalesce(func.sum(AIResultCache.size), 0)).where(AIResultCache.refs == 0))
+
+
+def evict(db: Session, budget_bytes: int | None = None) -> int:
+    """Delete least recently used unreferenced outputs until they fit the budget; returns how many.
+
+    An output some job still shows is job history and stays on disk outside
+    the budget. Once its last job is deleted it is kept only as a cache
+    entry, and those count against ``AI_RESULT_CACHE_MAX_MB``.
+    """
+    budget = settings.ai_result_cache_max_mb * 1024 * 1024 if budget_bytes is None else budget_bytes
+    total = _cached_bytes(db)
+    removed = 0
+    while total > budget:
+        batch = db.execute(
+            select(AIResultCache.key, AIResultCache.size)
+            .where(AIResultCache.refs == 0)
+            .order_by(AIResultCache.last_used_at, AIResultCache.key)
+            .limit(EVICT_BATCH)
+        ).all()
+        if not batch:
+            break
+        progressed = False
+        for key, size in batch:
+            if total <= budget:
+                break
+            # A job may have taken the output since we read it; the DELETE re-checks.
+            deleted = db.execute(
+                delete(AIResultCache).where(AIResultCache.key == key, AIResultCache.refs == 0)
+            ).rowcount
+            db.commit()
+            if deleted:
+                for stored in output_keys(key):
+                    storage_provider.delete(stored)
+                removed += 1
+                total -= size
+                progressed = True
+        if not progressed:
+            # Everything we read was taken meanwhile; recount rather than spin.
+            total = _cached_bytes(db)
+            if total > budget:
+                break
+    return removed
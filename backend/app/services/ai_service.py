@@ -1,27 +1,353 @@
-from PIL import Image, ImageEnhance, ImageFilter, ImageOps
-
-
-def transform_image(input_path: str, output_path: str, preset: str) -> None:
-    img = Image.open(input_path).convert("RGB")
-
-    if preset == "pencil_sketch_outline":
-        gray = ImageOps.grayscale(img)
-        inv = ImageOps.invert(gray)
-        blur = inv.filter(ImageFilter.GaussianBlur(radius=8))
-        out = Image.blend(gray, ImageOps.invert(blur), alpha=0.6)
-    elif preset == "charcoal_shading":
-        gray = ImageOps.grayscale(img).filter(ImageFilter.EDGE_ENHANCE_MORE)
-        out = ImageEnhance.Contrast(gray).enhance(2.5)
-    elif preset == "watercolor_wash_reference":
-        out = img.filter(ImageFilter.SMOOTH_MORE).filter(ImageFilter.GaussianBlur(radius=1.8))
-        out = ImageEnhance.Color(out).enhance(1.35)
-    elif preset == "simplified_shapes_block_in":
-        out = img.quantize(colors=12, method=Image.FASTOCTREE).convert("RGB")
-        out = out.filter(ImageFilter.SMOOTH)
-    elif preset == "value_map":
-        gray = ImageOps.grayscale(img)
-        out = gray.point(lambda p: 0 if p < 51 else 64 if p < 102 else 128 if p < 153 else 192 if p < 204 else 255)
-    else:
-        out = img
-
-    out.save(output_path)
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps, ImageStat
+from sqlalchemy import select, update
+from starlette.concurrency import run_in_threadpool
+
+from app.ai.encoding import save_output
+from app.core.config import settings
+from app.core.workers import BoundedProcessPool
+from app.db.session import SessionLocal
+from app.models.models import AITransformJob, CreditLedger, UserCredit
+from app.services.ai_result_cache import evict, output_keys, record
+from app.storage.provider import storage_provider
+
+logger = logging.getLogger(__name__)
+
+ai_pool = BoundedProcessPool(max_workers=settings.ai_transform_workers, max_pending=settings.ai_transform_max_pending)
+
+
+# JPEG draft decoding may undershoot the working size by at most this much.
+DRAFT_MIN_FRACTION = 0.75
+
+# 5-level posterization used by value_map, as a lookup table Image.point applies in C.
+VALUE_MAP_LUT = [0 if p < 51 else 64 if p < 102 else 128 if p < 153 else 192 if p < 204 else 255 for p in range(256)]
+
+
+def load_working_image(input_path: str, max_side: int) -> Image.Image:
+    """Decode ``input_path`` as RGB with its longest side at most ``max_side`` (0: unbounded).
+
+    For JPEGs ``draft`` makes libjpeg decode at 1/2, 1/4 or 1/8 scale, so a
+    12 MP photo is never materialized at full size. The scale is the largest
+    that still keeps ``DRAFT_MIN_FRACTION`` of ``max_side`` (a 4000 px photo
+    decodes at 2000 px for a 2048 px bound); whatever is still too big is
+    shrunk with ``reduce`` (inside ``thumbnail``) and a final LANCZOS pass.
+    """
+    img = Image.open(input_path)
+    if max_side and max(img.size) > max_side:
+        ratio = max_side * DRAFT_MIN_FRACTION / max(img.size)
+        img.draft("RGB", (max(1, int(img.width * ratio)), max(1, int(img.height * ratio))))
+    img = img.convert("RGB")
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return img
+
+
+class WorkingImage:
+    """The decoded RGB working image plus intermediates presets share.
+
+    ``gray`` is derived on first use, or handed in precomputed when a batch
+    prepared it once for every preset.
+    """
+
+    def __init__(self, rgb: Image.Image, gray: Image.Image | None = None):
+        self.rgb = rgb
+        self._gray = gray
+
+    @property
+    def gray(self) -> Image.Image:
+        if self._gray is None:
+            self._gray = self.rgb.convert("L")
+        return self._gray
+
+
+def _pencil_sketch_outline(img: WorkingImage) -> Image.Image:
+    gray = img.gray
+    blur = ImageOps.invert(gray).filter(ImageFilter.GaussianBlur(radius=8))
+    return Image.blend(gray, ImageOps.invert(blur), alpha=0.6)
+
+
+def _charcoal_shading(img: WorkingImage) -> Image.Image:
+    gray = img.gray.filter(ImageFilter.EDGE_ENHANCE_MORE)
+    # ImageEnhance.Contrast(2.5) as a LUT: same rounded mean and the same
+    # truncating blend, without allocating a full-size constant image.
+    mean = int(ImageStat.Stat(gray).mean[0] + 0.5)
+    return gray.point([min(255, max(0, int(mean + 2.5 * (p - mean)))) for p in range(256)])
+
+
+def _watercolor_wash_reference(img: WorkingImage) -> Image.Image:
+    out = img.rgb.filter(ImageFilter.SMOOTH_MORE).filter(ImageFilter.GaussianBlur(radius=1.8))
+    return ImageEnhance.Color(out).enhance(1.35)
+
+
+def _simplified_shapes_block_in(img: WorkingImage) -> Image.Image:
+    return img.rgb.quantize(colors=12, method=Image.FASTOCTREE).convert("RGB").filter(ImageFilter.SMOOTH)
+
+
+def _value_map(img: WorkingImage) -> Image.Image:
+    return img.gray.point(VALUE_MAP_LUT)
+
+
+PIPELINES: dict[str, Callable[[WorkingImage], Image.Image]] = {
+    "pencil_sketch_outline": _pencil_sketch_outline,
+    "charcoal_shading": _charcoal_shading,
+    "watercolor_wash_reference": _watercolor_wash_reference,
+    "simplified_shapes_block_in": _simplified_shapes_block_in,
+    "value_map": _value_map,
+}
+
+# Presets built on ``WorkingImage.gray``; a batch containing any of them ships
+# the grayscale plane to the workers instead of each converting on its own.
+GRAY_PRESETS = frozenset({"pencil_sketch_outline", "charcoal_shading", "value_map"})
+
+
+def _render(img: WorkingImage, output_path: str, preset: str) -> None:
+    pipeline = PIPELINES.get(preset)
+    save_output(pipeline(img) if pipeline else img.rgb, output_path, preset)
+
+
+def transform_image(input_path: str, output_path: str, preset: str, max_side: int | None = None) -> None:
+    """Apply ``preset`` at a bounded working size (``AI_MAX_WORKING_PX`` by default).
+
+    Writes the thumbnail and preview derivatives next to ``output_path``.
+    """
+    img = load_working_image(input_path, settings.ai_max_working_px if max_side is None else max_side)
+    _render(WorkingImage(img), output_path, preset)
+
+
+def run_transform(input_path: str, output_path: str, preset: str) -> tuple[float, float]:
+    """Process-pool entry point: ``transform_image`` plus when it actually ran."""
+    started = time.time()
+    transform_image(input_path, output_path, preset)
+    return started, time.time()
+
+
+def prepare_batch(input_path: str, work_dir: str, with_gray: bool) -> tuple[int, int]:
+    """Process-pool entry point: decode once for a batch and spill the raw planes.
+
+    Writes ``rgb.raw`` (and ``gray.raw`` when a gray preset is requested) into
+    ``work_dir`` so every preset worker rebuilds the working image with a
+    ``frombytes`` copy instead of decoding and resizing the upload again.
+    """
+    img = load_working_image(input_path, settings.ai_max_working_px)
+    work = Path(work_dir)
+    (work / "rgb.raw").write_bytes(img.tobytes())
+    if with_gray:
+        (work / "gray.raw").write_bytes(img.convert("L").tobytes())
+    return img.size
+
+
+def run_batch_preset(work_dir: str, size: tuple[int, int], output_path: str, preset: str) -> tuple[float, float]:
+    """Process-pool entry point: render one preset from planes ``prepare_batch`` wrote."""
+    started = time.time()
+    work = Path(work_dir)
+    rgb = Image.frombytes("RGB", size, (work / "rgb.raw").read_bytes())
+    gray_path = work / "gray.raw"
+    gray = Image.frombytes("L", size, gray_path.read_bytes()) if preset in GRAY_PRESETS and gray_path.exists() else None
+    _render(WorkingImage(rgb, gray), output_path, preset)
+    return started, time.time()
+
+
+def _utc(ts: float | None) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc) if ts is not None else datetime.now(timezone.utc)
+
+
+# Recorded on jobs that never finished because their process stopped.
+CANCELLED_ERROR = "Cancelled: the server stopped before the job finished"
+
+
+@dataclass
+class JobOutcome:
+    job_id: int
+    output_path: Path
+    output_key: str
+    size: int | None = None
+    started: float | None = None
+    finished: float | None = None
+    error: str | None = None
+    published: bool = False
+
+
+def _discard(outcome: JobOutcome) -> None:
+    for path in output_keys(str(outcome.output_path)):
+        Path(path).unlink(missing_ok=True)
+
+
+def _failed(outcome: JobOutcome, exc: BaseException) -> None:
+    logger.error("AI transform job %s failed", outcome.job_id, exc_info=exc)
+    outcome.error = f"{type(exc).__name__}: {exc}"[:500]
+    _discard(outcome)
+
+
+def _cancelled(outcomes: list[JobOutcome]) -> None:
+    for outcome in outcomes:
+        if not outcome.published and outcome.error is None:
+            outcome.error = CANCELLED_ERROR
+            _discard(outcome)
+
+
+async def _publish(outcome: JobOutcome, pending: Awaitable[tuple[float, float]]) -> None:
+    try:
+        outcome.started, outcome.finished = await pending
+        files = list(zip(output_keys(outcome.output_key), map(Path, output_keys(str(outcome.output_path)))))
+        outcome.size = sum(path.stat().st_size for _, path in files)
+        # Derivatives first: once the output key exists the result may be served from cache.
+        for key, path in reversed(files):
+            await run_in_threadpool(storage_provider.put_file, key, path)
+        outcome.published = True
+    except Exception as exc:  # noqa: BLE001 - any failure is recorded on the job
+        _failed(outcome, exc)
+
+
+def _refund(db, student_id: int, credits: int) -> None:
+    # Give back credits reserved on submit.
+    db.execute(update(UserCredit).where(UserCredit.user_id == student_id).values(balance=UserCredit.balance + credits))
+    db.add(CreditLedger(user_id=student_id, amount=credits, reason="ai_drawing_refund"))
+
+
+def _settle(input_sha256: str, outcomes: list[JobOutcome]) -> None:
+    """Record how each job ended; failed jobs are refunded in one ledger entry.
+
+    Jobs that are no longer queued were already failed and refunded by
+    ``fail_stale_jobs`` and are left alone.
+    """
+    db = SessionLocal()
+    try:
+        student_id = None
+        refund = succeeded = 0
+        for outcome in outcomes:
+            job = db.get(AITransformJob, outcome.job_id)
+            if job is None or job.status != "queued":
+                continue
+            student_id = job.student_id
+            job.status = "failed" if outcome.error else "succeeded"
+            job.started_at = _utc(outcome.started) if outcome.started is not None else None
+            job.finished_at = _utc(outcome.finished)
+            job.error = outcome.error
+            if outcome.error:
+                refund += 1
+            else:
+                succeeded += 1
+                record(db, input_sha256, job.preset, job.output_image_path, outcome.size)
+        if refund:
+            _refund(db, student_id, refund)
+        db.commit()
+        if succeeded:
+            evict(db)
+    finally:
+        db.close()
+
+
+def fail_stale_jobs(max_age_sec: int | None = None) -> int:
+    """Fail and refund jobs queued for longer than ``AI_JOB_TIMEOUT_SEC``; returns how many.
+
+    Only the process that queued a job settles it, so a crash, kill or
+    restart leaves it queued with its credit held. Runs at startup and every
+    ``AI_JOB_SWEEP_SEC``; the age limit keeps it off jobs other workers are
+    still running.
+    """
+    max_age = settings.ai_job_timeout_sec if max_age_sec is None else max_age_sec
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        stale = db.execute(
+            select(AITransformJob.id, AITransformJob.student_id).where(
+                AITransformJob.status == "queued", AITransformJob.created_at < now - timedelta(seconds=max_age)
+            )
+        ).all()
+        refunds: Counter[int] = Counter()
+        for job_id, student_id in stale:
+            failed = db.execute(
+                update(AITransformJob)
+                .where(AITransformJob.id == job_id, AITransformJob.status == "queued")
+                .values(status="failed", error=CANCELLED_ERROR, finished_at=now)
+            ).rowcount
+            refunds[student_id] += failed
+        for student_id, credits in refunds.items():
+            if credits:
+                _refund(db, student_id, credits)
+        db.commit()
+        return sum(refunds.values())
+    finally:
+        db.close()
+
+
+async def finish_transform_job(
+    job_id: int,
+    input_sha256: str,
+    pending: Awaitable[tuple[float, float]],
+    output_path: Path,
+    output_key: str,
+    cleanup: ExitStack,
+) -> None:
+    """Wait for a submitted transform, publish and cache its output, then settle the job and credit."""
+    outcome = JobOutcome(job_id, output_path, output_key)
+    try:
+        await _publish(outcome, pending)
+    except asyncio.CancelledError:
+        # Shutdown cancelled the pool future or this task: settle inline, the loop is going away.
+        _cancelled([outcome])
+        _settle(input_sha256, [outcome])
+        raise
+    finally:
+        cleanup.close()
+    await run_in_threadpool(_settle, input_sha256, [outcome])
+
+
+async def finish_batch(
+    input_sha256: str,
+    prepared: Awaitable[tuple[int, int]],
+    work_dir: Path,
+    jobs: dict[str, JobOutcome],
+    cleanup: ExitStack,
+) -> None:
+    """Fan a prepared batch out to one worker per preset, then settle every job at once.
+
+    The pool slots were claimed with ``ai_pool.reserve`` when the batch was
+    accepted, so the per-preset submits here never hit ``PoolBusy``.
+    """
+    unused = len(jobs)
+    cancelled = False
+    try:
+        try:
+            size = await prepared
+        except Exception as exc:  # noqa: BLE001 - a bad upload fails every preset
+            for outcome in jobs.values():
+                _failed(outcome, exc)
+            return
+        finally:
+            cleanup.close()
+        pending = []
+        for preset, outcome in jobs.items():
+            unused -= 1
+            try:
+                submitted = ai_pool.submit(
+                    run_batch_preset, str(work_dir), size, str(outcome.output_path), preset, reserved=True
+                )
+            except Exception as exc:  # noqa: BLE001
+                _failed(outcome, exc)
+                continue
+            pending.append(_publish(outcome, submitted))
+        await asyncio.gather(*pending)
+    except asyncio.CancelledError:
+        cancelled = True
+        _cancelled(list(jobs.values()))
+        raise
+    finally:
+        ai_pool.release(unused)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if cancelled:
+            _settle(input_sha256, list(jobs.values()))
+        else:
+            await run_in_threadpool(_settle, input_sha256, list(jobs.values()))
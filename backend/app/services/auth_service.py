@@ -10,10 +10,10 @@ from app.core.config import settings
 from app.core.security import (
     create_access_token,
     create_refresh_token,
-    hash_password,
+    hash_password_pooled,
     parse_jwt,
     token_hash,
-    verify_password,
+    verify_password_pooled,
 )
 from app.models.models import Organization, RefreshToken, User
 
@@ -32,6 +32,7 @@ def signup_student(db: Session, *, full_name: str, email: str, phone: str, grade
         raise ValueError("Email or phone already registered")
 
     org_id = _default_org_id(db)
+    password_hash = hash_password_pooled(password)
     user = User(
         role="student",
         organization_id=org_id,
@@ -39,7 +40,7 @@ def signup_student(db: Session, *, full_name: str, email: str, phone: str, grade
         email=email,
         phone=phone,
         grade_or_standard=grade_or_standard,
-        password_hash=hash_password(password),
+        password_hash=password_hash,
     )
     db.add(user)
     db.commit()
@@ -49,10 +50,15 @@ def signup_student(db: Session, *, full_name: str, email: str, phone: str, grade
 
 def login(db: Session, email: str, password: str) -> tuple[User, str, str]:
     user = db.scalar(select(User).where(User.email == email))
-    if not user or not verify_password(password, user.password_hash):
+    if not user:
+        raise ValueError("Invalid credentials")
+    valid, new_hash = verify_password_pooled(password, user.password_hash)
+    if not valid:
         raise ValueError("Invalid credentials")
     if not user.is_active:
         raise ValueError("Account inactive")
+    if new_hash:
+        user.password_hash = new_hash
 
     access_token = create_access_token(str(user.id), user.role)
     refresh_token, expires_at = create_refresh_token(str(user.id), user.role)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import shutil
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path, PurePosixPath
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.dialect import dialect_insert, greatest
+from app.models.models import AITransformJob, CertificateSetting, Lecture, StoredBlob
+from app.storage.provider import BLOB_PREFIX, StoredUpload, is_blob_key, storage_provider
+
+# Every column that may hold a blob key. ``recount_blob_refs`` derives true
+# refcounts from these, so a new reference column must be listed here.
+BLOB_REFERENCES = [
+    Lecture.video_key,
+    CertificateSetting.signature_path,
+    AITransformJob.input_image_path,
+    AITransformJob.output_image_path,
+]
+
+
+def retain(db: Session, stored: StoredUpload) -> None:
+    """Count one more reference to ``stored``; part of the caller's transaction."""
+    stmt = dialect_insert(db)(StoredBlob).values(key=stored.key, sha256=stored.sha256, size=stored.size, refcount=1)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[StoredBlob.key],
+            set_={"refcount": StoredBlob.refcount + 1, "updated_at": func.now()},
+        )
+    )
+
+
+def release(db: Session, key: str | None) -> None:
+    """Drop one reference to ``key``; keys from before the blob store are ignored."""
+    if not is_blob_key(key):
+        return
+    db.execute(
+        update(StoredBlob)
+        .where(StoredBlob.key == key)
+        .values(refcount=greatest(db, StoredBlob.refcount - 1, 0), updated_at=func.now())
+    )
+
+
+def recount_blob_refs(db: Session) -> int:
+    """Recompute refcounts from ``BLOB_REFERENCES``; returns the number of rows repaired."""
+    counts: Counter[str] = Counter()
+    for column in BLOB_REFERENCES:
+        rows = db.execute(select(column, func.count()).where(column.like(f"{BLOB_PREFIX}/%")).group_by(column))
+        for key, n in rows:
+            counts[key] += n
+
+    repaired = 0
+    stored = dict(db.execute(select(StoredBlob.key, StoredBlob.refcount)).all())
+    for key, refcount in stored.items():
+        if refcount != counts.get(key, 0):
+            db.execute(update(StoredBlob).where(StoredBlob.key == key).values(refcount=counts.get(key, 0)))
+            repaired += 1
+    for key in counts.keys() - stored.keys():
+        try:
+            size = storage_provider.stat(key).size
+        except FileNotFoundError:
+            continue
+        sha256 = PurePosixPath(key).name.split(".", 1)[0]
+        db.add(StoredBlob(key=key, sha256=sha256, size=size, refcount=counts[key]))
+        repaired += 1
+    db.commit()
+    return repaired
+
+
+def _delete_if_idle(key: str, cutoff: float) -> bool:
+    try:
+        if storage_provider.stat(key).mtime >= cutoff:
+            return False
+    except FileNotFoundError:
+        return False
+    storage_provider.delete(key)
+    return True
+
+
+def _unlink_if_idle(path: Path, cutoff: float) -> bool:
+    try:
+        if path.stat().st_mtime >= cutoff:
+            return False
+        if path.is_dir():
+            # An abandoned HLS packaging directory.
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage(db: Session, grace_sec: int | None = None) -> tuple[int, int]:
+    """Delete unreferenced blobs and orphaned files older than ``grace_sec``.
+
+    The grace period covers uploads that are stored but whose referencing row
+    is not committed yet, and dedup hits that just refreshed a blob's mtime.
+    Returns ``(blobs_deleted, orphan_files_deleted)``.
+    """
+    grace = settings.blob_gc_grace_sec if grace_sec is None else grace_sec
+    cutoff = time.time() - grace
+    cutoff_at = datetime.now(timezone.utc) - timedelta(seconds=grace)
+
+    dead = db.scalars(select(StoredBlob.key).where(StoredBlob.refcount <= 0, StoredBlob.updated_at < cutoff_at)).all()
+    blobs_deleted = 0
+    for key in dead:
+        # Re-check the refcount in the DELETE so a reference taken meanwhile wins.
+        if db.execute(delete(StoredBlob).where(StoredBlob.key == key, StoredBlob.refcount <= 0)).rowcount:
+            db.commit()
+            if _delete_if_idle(key, cutoff):
+                blobs_deleted += 1
+
+    known = set(db.scalars(select(StoredBlob.key)).all())
+    orphans = 0
+    for key, object_stat in storage_provider.list(f"{BLOB_PREFIX}/"):
+        if not is_blob_key(key) or key in known or object_stat.mtime >= cutoff:
+            continue
+        storage_provider.delete(key)
+        orphans += 1
+    # Staging is always local, whichever backend holds the blobs.
+    for path in storage_provider.incoming.glob("*"):
+        if _unlink_if_idle(path, cutoff):
+            orphans += 1
+    return blobs_deleted, orphans
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from datetime import datetime
-from pathlib import Path
 from uuid import uuid4
 
 from reportlab.lib.pagesizes import A4
@@ -36,10 +35,8 @@ def generate_certificate(db: Session, student_id: int, course_id: int) -> Certif
         raise ValueError("Data missing")
 
     cert_no = f"UDAAN-{datetime.utcnow().strftime('%Y%m%d')}-{uuid4().hex[:8].upper()}"
-    folder = Path(settings.local_storage_path) / "certificates"
-    folder.mkdir(parents=True, exist_ok=True)
-    pdf_name = f"{cert_no}.pdf"
-    pdf_path = folder / pdf_name
+    pdf_key = f"certificates/{cert_no}.pdf"
+    pdf_path = storage_provider.scratch_path(".pdf")
 
     conf = get_or_create_settings(db)
 
@@ -59,14 +56,23 @@ def generate_certificate(db: Session, student_id: int, course_id: int) -> Certif
     c.setFont("Helvetica", 13)
     c.drawString(80, 120, f"Teacher: {conf.teacher_name}")
     if conf.signature_path:
-        sig_file = storage_provider.resolve(conf.signature_path)
-        if sig_file.exists():
-            c.drawImage(str(sig_file), 80, 140, width=160, height=60, preserveAspectRatio=True, mask="auto")
+        try:
+            with storage_provider.local_copy(conf.signature_path) as sig_file:
+                c.drawImage(str(sig_file), 80, 140, width=160, height=60, preserveAspectRatio=True, mask="auto")
+        except FileNotFoundError:
+            pass
 
     c.showPage()
     c.save()
+    storage_provider.put_file(pdf_key, pdf_path)
 
-    cert = Certificate(student_id=student_id, course_id=course_id, certificate_no=cert_no, pdf_path=f"certificates/{pdf_name}")
+    cert = Certificate(
+        organization_id=course.organization_id,
+        student_id=student_id,
+        course_id=course_id,
+        certificate_no=cert_no,
+        pdf_path=pdf_key,
+    )
     db.add(cert)
     db.commit()
     db.refresh(cert)
@@ -1,33 +1,16 @@
 from __future__ import annotations
 
+from collections import Counter
 from datetime import datetime, timezone
-from typing import Iterable
-
-from sqlalchemy import and_, func, select
+from sqlalchemy import and_, case, false, func, literal, or_, select, true, tuple_, update
 from sqlalchemy.orm import Session
 
+from app.db.dialect import dialect_insert, greatest, inserted_flag
 from app.models.models import Certificate, Course, Enrollment, Lecture, LectureProgress, User
+from app.services.dashboard_service import nudge_progress
 
-
-def get_dashboard_stats(db: Session, organization_id: int | None = None) -> dict:
-    student_stmt = select(func.count(User.id)).where(User.role == "student")
-    enroll_stmt = select(func.count(func.distinct(Enrollment.student_id))).where(
-        Enrollment.status.in_(["active", "completed"])
-    )
-    if organization_id is not None:
-        student_stmt = student_stmt.where(User.organization_id == organization_id)
-        enroll_stmt = enroll_stmt.where(Enrollment.organization_id == organization_id)
-
-    total_students = db.scalar(student_stmt) or 0
-    enrolled_students = db.scalar(enroll_stmt) or 0
-    total_progress = db.scalar(select(func.count(LectureProgress.id))) or 0
-    completed_progress = db.scalar(select(func.count(LectureProgress.id)).where(LectureProgress.completed.is_(True))) or 0
-    percent = int((completed_progress / total_progress) * 100) if total_progress else 0
-    return {
-        "total_students": total_students,
-        "enrolled_students": enrolled_students,
-        "progress_distribution": {"completed_percent": percent, "incomplete_percent": 100 - percent},
-    }
+# Rows per multi-VALUES upsert; keeps bound parameters under SQLite's 32766 limit.
+UPSERT_BATCH_SIZE = 1000
 
 
 def list_student_progress(db: Session, student_id: int) -> dict:
@@ -64,113 +47,253 @@ def list_student_progress(db: Session, student_id: int) -> dict:
     }
 
 
-def course_completion_check(db: Session, student_id: int, course_id: int) -> bool:
-    lecture_ids = [x[0] for x in db.execute(select(Lecture.id).where(Lecture.course_id == course_id)).all()]
-    if not lecture_ids:
-        return False
+def _enrollment_for(db: Session, student_id: int, course_id: int) -> Enrollment | None:
+    return db.scalar(select(Enrollment).where(and_(Enrollment.student_id == student_id, Enrollment.course_id == course_id)))
+
 
-    completed_count = (
-        db.scalar(
-            select(func.count(LectureProgress.id)).where(
-                and_(
-                    LectureProgress.student_id == student_id,
-                    LectureProgress.lecture_id.in_(lecture_ids),
-                    LectureProgress.completed.is_(True),
-                )
+def _completed_lectures_stmt(student_id, course_id):
+    return (
+        select(func.count(LectureProgress.id))
+        .join(Lecture, Lecture.id == LectureProgress.lecture_id)
+        .where(
+            and_(
+                Lecture.course_id == course_id,
+                LectureProgress.student_id == student_id,
+                LectureProgress.completed.is_(True),
             )
         )
-        or 0
     )
-    done = completed_count == len(lecture_ids)
 
-    if done:
-        enrollment = db.scalar(
-            select(Enrollment).where(and_(Enrollment.student_id == student_id, Enrollment.course_id == course_id))
+
+def init_enrollment_counters(db: Session, enrollment: Enrollment) -> None:
+    """Seed the denormalized counters of a new enrollment from the current lectures and progress."""
+    enrollment.total_lectures = db.scalar(select(func.count(Lecture.id)).where(Lecture.course_id == enrollment.course_id)) or 0
+    enrollment.completed_lectures = db.scalar(_completed_lectures_stmt(enrollment.student_id, enrollment.course_id)) or 0
+
+
+def reconcile_enrollment_counters(db: Session) -> int:
+    """Recompute every enrollment's counters from source rows and return how many had drifted."""
+    total_sq = select(func.count(Lecture.id)).where(Lecture.course_id == Enrollment.course_id).scalar_subquery()
+    completed_sq = _completed_lectures_stmt(Enrollment.student_id, Enrollment.course_id).scalar_subquery()
+    result = db.execute(
+        update(Enrollment)
+        .where((Enrollment.total_lectures != total_sq) | (Enrollment.completed_lectures != completed_sq))
+        .values(total_lectures=total_sq, completed_lectures=completed_sq)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def on_lecture_added(db: Session, course_id: int) -> None:
+    db.execute(
+        update(Enrollment)
+        .where(Enrollment.course_id == course_id)
+        .values(total_lectures=Enrollment.total_lectures + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def on_lecture_removed(db: Session, lecture: Lecture) -> None:
+    """Adjust counters before ``lecture`` (and, by cascade, its progress rows) is deleted."""
+    completed_by = select(LectureProgress.student_id).where(
+        and_(LectureProgress.lecture_id == lecture.id, LectureProgress.completed.is_(True))
+    )
+    db.execute(
+        update(Enrollment)
+        .where(and_(Enrollment.course_id == lecture.course_id, Enrollment.student_id.in_(completed_by)))
+        .values(completed_lectures=Enrollment.completed_lectures - 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Enrollment)
+        .where(Enrollment.course_id == lecture.course_id)
+        .values(total_lectures=Enrollment.total_lectures - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _on_lecture_completed(db: Session, student_id: int, course_id: int) -> None:
+    db.execute(
+        update(Enrollment)
+        .where(and_(Enrollment.student_id == student_id, Enrollment.course_id == course_id))
+        .values(completed_lectures=Enrollment.completed_lectures + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def upsert_watched_seconds(db: Session, rows: list[dict]) -> None:
+    """Batched monotonic upsert of ``{"student_id", "lecture_id", "watched_seconds"}`` rows.
+
+    Never touches the completion flag; completion transitions go through
+    ``mark_progress``/``mark_complete`` so the enrollment counters stay exact.
+    Rows it inserts are counted into the dashboard rollups.
+    """
+    insert = dialect_insert(db)
+    flag = inserted_flag(db)
+    new_rows: Counter[int] = Counter()
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start : start + UPSERT_BATCH_SIZE]
+        pairs = [(row["student_id"], row["lecture_id"]) for row in batch]
+        if flag is None:
+            existing = set(
+                db.execute(
+                    select(LectureProgress.student_id, LectureProgress.lecture_id).where(
+                        tuple_(LectureProgress.student_id, LectureProgress.lecture_id).in_(pairs)
+                    )
+                ).tuples()
+            )
+        stmt = insert(LectureProgress).values([{**row, "completed": False} for row in batch])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LectureProgress.student_id, LectureProgress.lecture_id],
+            set_={
+                "watched_seconds": greatest(db, LectureProgress.watched_seconds, stmt.excluded.watched_seconds),
+                "updated_at": func.now(),
+            },
         )
-        if enrollment and enrollment.status != "completed":
-            enrollment.status = "completed"
-            enrollment.completed_at = datetime.now(timezone.utc)
-            db.commit()
+        if flag is None:
+            db.execute(stmt)
+            new_rows.update(lecture_id for student_id, lecture_id in pairs if (student_id, lecture_id) not in existing)
+        else:
+            returned = db.execute(stmt.returning(LectureProgress.lecture_id, flag)).all()
+            new_rows.update(lecture_id for lecture_id, inserted in returned if inserted)
+    if new_rows:
+        per_course: Counter[int] = Counter()
+        for lecture_id, course_id in db.execute(select(Lecture.id, Lecture.course_id).where(Lecture.id.in_(new_rows))):
+            per_course[course_id] += new_rows[lecture_id]
+        for course_id, n in per_course.items():
+            nudge_progress(db, course_id, total=n)
+    db.commit()
+
+
+def course_completion_check(db: Session, student_id: int, course_id: int) -> bool:
+    enrollment = _enrollment_for(db, student_id, course_id)
+    if not enrollment or enrollment.total_lectures <= 0:
+        return False
+
+    done = enrollment.completed_lectures >= enrollment.total_lectures
+    if done and enrollment.status != "completed":
+        enrollment.status = "completed"
+        enrollment.completed_at = datetime.now(timezone.utc)
+        db.commit()
     return done
 
 
-def mark_progress(db: Session, student_id: int, lecture_id: int, watched_seconds: int) -> LectureProgress:
-    lecture = db.get(Lecture, lecture_id)
-    if not lecture:
-        raise ValueError("Lecture not found")
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
 
-    progress = db.scalar(
-        select(LectureProgress).where(
-            and_(LectureProgress.student_id == student_id, LectureProgress.lecture_id == lecture_id)
-        )
-    )
-    if not progress:
-        progress = LectureProgress(student_id=student_id, lecture_id=lecture_id, watched_seconds=0, completed=False)
-        db.add(progress)
 
-    progress.watched_seconds = max(progress.watched_seconds, watched_seconds)
-    if lecture.duration_sec > 0 and progress.watched_seconds >= lecture.duration_sec:
-        progress.completed = True
-        progress.completed_at = datetime.now(timezone.utc)
+def _upsert_progress(db: Session, lecture: Lecture, student_id: int, watched_seconds: int, force_complete: bool) -> LectureProgress:
+    """Insert or update a progress row in one statement, returning the resulting row.
 
+    The monotonic max and the completion flag are evaluated by the database so
+    concurrent heartbeats cannot race on ``uq_progress_student_lecture``. A row
+    completed by this very statement comes back with ``completed_at == now``;
+    earlier completions keep their original timestamp. Inserted rows and
+    completions are counted into the dashboard rollups.
+    """
+    now = datetime.now(timezone.utc)
+    flag = inserted_flag(db)
+    if flag is None:
+        existed = db.scalar(
+            select(LectureProgress.id).where(
+                and_(LectureProgress.student_id == student_id, LectureProgress.lecture_id == lecture.id)
+            )
+        ) is not None
+    duration = lecture.duration_sec
+    completes_on_insert = force_complete or (duration > 0 and watched_seconds >= duration)
+
+    stmt = dialect_insert(db)(LectureProgress).values(
+        student_id=student_id,
+        lecture_id=lecture.id,
+        watched_seconds=watched_seconds,
+        completed=completes_on_insert,
+        completed_at=now if completes_on_insert else None,
+        updated_at=now,
+    )
+    watched = greatest(db, LectureProgress.watched_seconds, stmt.excluded.watched_seconds)
+    if force_complete:
+        completes = true()
+    elif duration > 0:
+        completes = watched >= literal(duration)
+    else:
+        completes = false()
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LectureProgress.student_id, LectureProgress.lecture_id],
+        set_={
+            "watched_seconds": watched,
+            "completed": or_(LectureProgress.completed, completes),
+            "completed_at": case(
+                (LectureProgress.completed, LectureProgress.completed_at),
+                (completes, now),
+                else_=LectureProgress.completed_at,
+            ),
+            "updated_at": now,
+        },
+    ).returning(*LectureProgress.__table__.c, *([flag] if flag is not None else []))
+
+    row = dict(db.execute(stmt).mappings().one())
+    inserted = row.pop("inserted") if flag is not None else not existed
+    # Transient snapshot of the returned row: nothing to expire or refresh after commit.
+    progress = LectureProgress(**row)
+    completed_now = progress.completed and _as_utc(progress.completed_at) == now
+    if completed_now:
+        _on_lecture_completed(db, student_id, lecture.course_id)
+    if inserted or completed_now:
+        nudge_progress(db, lecture.course_id, total=int(inserted), completed=int(completed_now))
     db.commit()
-    db.refresh(progress)
     return progress
 
 
-def mark_complete(db: Session, student_id: int, lecture_id: int) -> LectureProgress:
+def mark_progress(db: Session, student_id: int, lecture_id: int, watched_seconds: int) -> LectureProgress:
     lecture = db.get(Lecture, lecture_id)
     if not lecture:
         raise ValueError("Lecture not found")
+    return _upsert_progress(db, lecture, student_id, watched_seconds, force_complete=False)
 
-    progress = db.scalar(
-        select(LectureProgress).where(
-            and_(LectureProgress.student_id == student_id, LectureProgress.lecture_id == lecture_id)
-        )
-    )
-    if not progress:
-        progress = LectureProgress(student_id=student_id, lecture_id=lecture_id, watched_seconds=lecture.duration_sec)
-        db.add(progress)
-    progress.completed = True
-    progress.completed_at = datetime.now(timezone.utc)
-    progress.watched_seconds = max(progress.watched_seconds, lecture.duration_sec)
-    db.commit()
-    db.refresh(progress)
-    return progress
 
+def mark_complete(db: Session, student_id: int, lecture_id: int) -> LectureProgress:
+    lecture = db.get(Lecture, lecture_id)
+    if not lecture:
+        raise ValueError("Lecture not found")
+    return _upsert_progress(db, lecture, student_id, lecture.duration_sec, force_complete=True)
 
-def build_student_course_progress(db: Session, student_id: int) -> list[dict]:
-    courses: Iterable[Course] = db.scalars(select(Course)).all()
-    output = []
-    for course in courses:
-        lecture_ids = [x[0] for x in db.execute(select(Lecture.id).where(Lecture.course_id == course.id)).all()]
-        total = len(lecture_ids)
-        if total:
-            completed = (
-                db.scalar(
-                    select(func.count(LectureProgress.id)).where(
-                        and_(
-                            LectureProgress.student_id == student_id,
-                            LectureProgress.lecture_id.in_(lecture_ids),
-                            LectureProgress.completed.is_(True),
-                        )
-                    )
-                )
-                or 0
-            )
-            percent = int((completed / total) * 100)
-        else:
-            percent = 0
-        certificate = db.scalar(
-            select(Certificate).where(and_(Certificate.student_id == student_id, Certificate.course_id == course.id))
+
+def build_student_course_progress(db: Session, student_id: int, organization_id: int | None = None) -> list[dict]:
+    """Per-course completion for the student's active enrollments, read from the enrollment counters."""
+    stmt = (
+        select(
+            Course.id,
+            Course.title,
+            Course.level,
+            Enrollment.total_lectures,
+            Enrollment.completed_lectures,
+            select(Certificate.id)
+            .where(and_(Certificate.course_id == Course.id, Certificate.student_id == student_id))
+            .exists(),
         )
-        output.append(
-            {
-                "course_id": course.id,
-                "course_title": course.title,
-                "level": course.level,
-                "completed_percent": percent,
-                "certificate_available": bool(certificate),
-            }
+        .join(
+            Enrollment,
+            and_(
+                Enrollment.course_id == Course.id,
+                Enrollment.student_id == student_id,
+                Enrollment.status.in_(["active", "completed"]),
+            ),
         )
-    return output
+        .order_by(Course.id.asc())
+    )
+    if organization_id is not None:
+        stmt = stmt.where(Course.organization_id == organization_id)
+
+    return [
+        {
+            "course_id": course_id,
+            "course_title": title,
+            "level": level,
+            "completed_percent": min(int((completed / total) * 100), 100) if total else 0,
+            "certificate_available": bool(has_certificate),
+        }
+        for course_id, title, level, total, completed, has_certificate in db.execute(stmt).all()
+    ]
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.db.dialect import dialect_insert
+from app.db.session import SessionLocal
+from app.models.models import Course, DashboardRollup, Enrollment, Lecture, LectureProgress, Organization, User
+
+ROLLUP_COUNTERS = ("total_students", "enrolled_students", "total_progress", "completed_progress")
+
+
+def _stats(total_students: int, enrolled_students: int, total_progress: int, completed_progress: int, refreshed_at=None) -> dict:
+    percent = int((completed_progress / total_progress) * 100) if total_progress else 0
+    return {
+        "total_students": total_students,
+        "enrolled_students": enrolled_students,
+        "progress_distribution": {"completed_percent": percent, "incomplete_percent": 100 - percent},
+        "refreshed_at": refreshed_at,
+    }
+
+
+def get_dashboard_stats(db: Session, organization_id: int | None = None) -> dict:
+    """Live dashboard numbers; four COUNT queries, used for ``?fresh=1``."""
+    student_stmt = select(func.count(User.id)).where(User.role == "student")
+    enroll_stmt = select(func.count(func.distinct(Enrollment.student_id))).where(
+        Enrollment.status.in_(["active", "completed"])
+    )
+    progress_stmt = select(
+        func.count(LectureProgress.id),
+        func.coalesce(func.sum(case((LectureProgress.completed.is_(True), 1), else_=0)), 0),
+    )
+    if organization_id is not None:
+        student_stmt = student_stmt.where(User.organization_id == organization_id)
+        enroll_stmt = enroll_stmt.where(Enrollment.organization_id == organization_id)
+        progress_stmt = (
+            progress_stmt.join(Lecture, Lecture.id == LectureProgress.lecture_id)
+            .join(Course, Course.id == Lecture.course_id)
+            .where(Course.organization_id == organization_id)
+        )
+
+    total_progress, completed_progress = db.execute(progress_stmt).one()
+    return _stats(
+        db.scalar(student_stmt) or 0,
+        db.scalar(enroll_stmt) or 0,
+        total_progress or 0,
+        completed_progress or 0,
+        datetime.now(timezone.utc),
+    )
+
+
+def refresh_dashboard_rollups(db: Session, organization_id: int | None = None) -> int:
+    """Recompute rollups for one organization (or all) with grouped queries and upsert them."""
+    org_stmt = select(Organization.id)
+    students_stmt = (
+        select(User.organization_id, func.count(User.id)).where(User.role == "student").group_by(User.organization_id)
+    )
+    enrolled_stmt = (
+        select(Enrollment.organization_id, func.count(func.distinct(Enrollment.student_id)))
+        .where(Enrollment.status.in_(["active", "completed"]))
+        .group_by(Enrollment.organization_id)
+    )
+    progress_stmt = (
+        select(
+            Course.organization_id,
+            func.count(LectureProgress.id),
+            func.coalesce(func.sum(case((LectureProgress.completed.is_(True), 1), else_=0)), 0),
+        )
+        .join(Lecture, Lecture.id == LectureProgress.lecture_id)
+        .join(Course, Course.id == Lecture.course_id)
+        .group_by(Course.organization_id)
+    )
+    if organization_id is not None:
+        org_stmt = org_stmt.where(Organization.id == organization_id)
+        students_stmt = students_stmt.where(User.organization_id == organization_id)
+        enrolled_stmt = enrolled_stmt.where(Enrollment.organization_id == organization_id)
+        progress_stmt = progress_stmt.where(Course.organization_id == organization_id)
+
+    org_ids = db.scalars(org_stmt).all()
+    if not org_ids:
+        return 0
+    students = dict(db.execute(students_stmt).all())
+    enrolled = dict(db.execute(enrolled_stmt).all())
+    progress = {org_id: (total, completed) for org_id, total, completed in db.execute(progress_stmt).all()}
+
+    now = datetime.now(timezone.utc)
+    stmt = dialect_insert(db)(DashboardRollup).values(
+        [
+            {
+                "organization_id": org_id,
+                "total_students": students.get(org_id, 0),
+                "enrolled_students": enrolled.get(org_id, 0),
+                "total_progress": progress.get(org_id, (0, 0))[0],
+                "completed_progress": progress.get(org_id, (0, 0))[1],
+                "refreshed_at": now,
+            }
+            for org_id in org_ids
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DashboardRollup.organization_id],
+        set_={name: stmt.excluded[name] for name in (*ROLLUP_COUNTERS, "refreshed_at")},
+    )
+    db.execute(stmt)
+    db.commit()
+    return len(org_ids)
+
+
+def run_dashboard_refresh() -> int:
+    db = SessionLocal()
+    try:
+        return refresh_dashboard_rollups(db)
+    finally:
+        db.close()
+
+
+def get_dashboard_rollup_stats(db: Session, organization_id: int | None = None) -> dict:
+    """Dashboard numbers from ``dashboard_rollups``: a primary-key lookup per organization.
+
+    Super admins (``organization_id=None``) get the sum across organizations.
+    """
+    if organization_id is not None:
+        rollup = db.get(DashboardRollup, organization_id)
+        if rollup is None:
+            refresh_dashboard_rollups(db, organization_id)
+            rollup = db.get(DashboardRollup, organization_id)
+        if rollup is None:
+            return _stats(0, 0, 0, 0)
+        return _stats(
+            rollup.total_students,
+            rollup.enrolled_students,
+            rollup.total_progress,
+            rollup.completed_progress,
+            rollup.refreshed_at,
+        )
+
+    totals_stmt = select(
+        *(func.coalesce(func.sum(getattr(DashboardRollup, name)), 0) for name in ROLLUP_COUNTERS),
+        func.min(DashboardRollup.refreshed_at),
+    )
+    *counters, refreshed_at = db.execute(totals_stmt).one()
+    if refreshed_at is None and refresh_dashboard_rollups(db):
+        *counters, refreshed_at = db.execute(totals_stmt).one()
+    return _stats(*counters, refreshed_at)
+
+
+def nudge_progress(db: Session, course_id: int, total: int = 0, completed: int = 0) -> None:
+    """Count new and newly completed progress rows of a course towards its organization's rollup.
+
+    Part of the caller's transaction; the scheduled refresh corrects any drift.
+    """
+    org_id = select(Course.organization_id).where(Course.id == course_id).scalar_subquery()
+    db.execute(
+        update(DashboardRollup)
+        .where(DashboardRollup.organization_id == org_id)
+        .values(
+            total_progress=DashboardRollup.total_progress + total,
+            completed_progress=DashboardRollup.completed_progress + completed,
+        )
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import shutil
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from uuid import uuid4
+
+from sqlalchemy import or_, select, update
+
+from app.core.config import settings
+from app.core.workers import BoundedThreadPool, PoolBusy
+from app.db.session import SessionLocal
+from app.media.hls import package_hls, parse_renditions
+from app.media.stream_auth import revoke_stream_grants
+from app.models.models import Lecture
+from app.storage.provider import storage_provider
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg saturates the CPU on its own; never run more than this many at once.
+hls_pool = BoundedThreadPool(max_workers=max(settings.hls_max_concurrent, 1), max_pending=settings.hls_max_pending)
+
+
+# Lectures queued on hls_pool by this process; the sweep leaves them alone.
+_queued: set[int] = set()
+_queued_lock = threading.Lock()
+
+
+def _done(lecture_id: int, future: Future) -> None:
+    with _queued_lock:
+        _queued.discard(lecture_id)
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("HLS packaging crashed", exc_info=future.exception())
+
+
+def lecture_hls_prefix(lecture_id: int) -> str:
+    """Storage prefix holding every HLS tree packaged for a lecture."""
+    return f"hls/{lecture_id}"
+
+
+def queue_lecture_hls(lecture_id: int) -> bool:
+    """Queue HLS packaging of a lecture; ``False`` when ``HLS_MAX_PENDING`` jobs are already waiting."""
+    try:
+        future = hls_pool.start(process_lecture_hls, lecture_id)
+    except PoolBusy:
+        logger.warning("HLS queue full; lecture %s will not be packaged", lecture_id)
+        return False
+    with _queued_lock:
+        _queued.add(lecture_id)
+    future.add_done_callback(partial(_done, lecture_id))
+    return True
+
+
+def process_lecture_hls(lecture_id: int) -> str | None:
+    """Package a lecture's current video as HLS and record the outcome on the row.
+
+    Runs on ``hls_pool``, off the request path. Returns the final
+    ``hls_status`` or ``None`` when the lecture has no video. Any failure
+    marks the lecture ``failed``; it keeps playing as progressive MP4.
+    """
+    db = SessionLocal()
+    work = storage_provider.scratch_path()
+    video_key = hls_key = None
+    try:
+        lecture = db.get(Lecture, lecture_id)
+        if not lecture or not lecture.video_key:
+            return None
+        video_key = lecture.video_key
+        lecture.hls_status = "processing"
+        lecture.hls_updated_at = datetime.now(timezone.utc)
+        db.commit()
+
+        # Package into local scratch space, then publish the whole tree.
+        with storage_provider.local_copy(video_key) as source:
+            names = package_hls(
+                source,
+                work,
+                parse_renditions(settings.hls_renditions),
+                settings.hls_segment_sec,
+            )
+
+        lecture = db.get(Lecture, lecture_id)
+        if not lecture or lecture.video_key != video_key:
+            # Deleted or re-uploaded while we were encoding; this output is stale.
+            return None
+        hls_key = f"{lecture_hls_prefix(lecture_id)}/{uuid4().hex}"
+        storage_provider.put_tree(hls_key, work)
+        previous = lecture.hls_key
+        # Conditional on the video: a re-upload meanwhile must not get this tree.
+        published = db.execute(
+            update(Lecture)
+            .where(Lecture.id == lecture_id, Lecture.video_key == video_key)
+            .values(
+                hls_key=hls_key,
+                hls_renditions=",".join(names),
+                hls_status="ready",
+                hls_updated_at=datetime.now(timezone.utc),
+            )
+        ).rowcount
+        db.commit()
+        if not published:
+            storage_provider.delete_prefix(hls_key)
+            return None
+    except Exception:
+        logger.exception("HLS packaging failed for lecture %s", lecture_id)
+        db.rollback()
+        if video_key:
+            db.execute(
+                update(Lecture)
+                .where(Lecture.id == lecture_id, Lecture.video_key == video_key, Lecture.hls_status == "processing")
+                .values(hls_status="failed", hls_updated_at=datetime.now(timezone.utc))
+            )
+            db.commit()
+        if hls_key:
+            # Part of the tree may already be published.
+            storage_provider.delete_prefix(hls_key)
+        return "failed"
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        db.close()
+
+    revoke_stream_grants(lecture_id=lecture_id)
+    if previous:
+        storage_provider.delete_prefix(previous)
+    return "ready"
+
+
+def resume_stale_hls(max_age_sec: int | None = None) -> int:
+    """Re-queue lectures left ``pending`` and fail those left ``processing``; returns how many.
+
+    A restart cancels queued packaging and kills running ffmpeg without
+    settling the row. Runs at startup and every ``HLS_SWEEP_SEC``; rows are
+    only touched once their status is older than a whole packaging run
+    (``HLS_TIMEOUT_SEC`` per rendition), so other workers' jobs are left
+    alone. A lecture that was mid-way is failed rather than retried, in case
+    its video is what killed the process.
+    """
+    renditions = len(parse_renditions(settings.hls_renditions)) if settings.hls_enabled else 1
+    max_age = settings.hls_timeout_sec * max(renditions, 1) if max_age_sec is None else max_age_sec
+    now = datetime.now(timezone.utc)
+    stale = or_(Lecture.hls_updated_at.is_(None), Lecture.hls_updated_at < now - timedelta(seconds=max_age))
+    db = SessionLocal()
+    try:
+        with _queued_lock:
+            mine = set(_queued)
+        rows = db.execute(
+            select(Lecture.id, Lecture.hls_status).where(Lecture.hls_status.in_(("pending", "processing")), stale)
+        ).all()
+        settled = 0
+        for lecture_id, status in rows:
+            if lecture_id in mine:
+                continue
+            # Claim the row first so two workers sweeping at once do not both act on it.
+            retry = status == "pending" and settings.hls_enabled
+            claimed = db.execute(
+                update(Lecture)
+                .where(Lecture.id == lecture_id, Lecture.hls_status == status, stale)
+                .values(hls_status="pending" if retry else "failed", hls_updated_at=now)
+            ).rowcount
+            db.commit()
+            if not claimed:
+                continue
+            if retry and not queue_lecture_hls(lecture_id):
+                db.execute(update(Lecture).where(Lecture.id == lecture_id).values(hls_status="failed", hls_updated_at=now))
+                db.commit()
+            settled += 1
+        return settled
+    finally:
+        db.close()
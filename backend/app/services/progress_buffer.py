@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import threading
+
+from app.db.session import SessionLocal
+from app.services.course_service import upsert_watched_seconds
+
+
+class ProgressBuffer:
+    """Coalesces player heartbeats per (student, lecture) until the next flush.
+
+    Only the highest ``watched_seconds`` seen is kept, so a viewer sending a
+    heartbeat every few seconds costs one row in one batched upsert per flush
+    interval instead of a transaction per heartbeat.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple[int, int], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, student_id: int, lecture_id: int, watched_seconds: int) -> int:
+        key = (student_id, lecture_id)
+        with self._lock:
+            value = max(self._pending.get(key, 0), watched_seconds)
+            self._pending[key] = value
+        return value
+
+    def take(self, student_id: int, lecture_id: int) -> int:
+        """Remove and return the buffered value for a key, or 0 when nothing is pending."""
+        with self._lock:
+            return self._pending.pop((student_id, lecture_id), 0)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        db = SessionLocal()
+        try:
+            upsert_watched_seconds(
+                db,
+                [
+                    {"student_id": student_id, "lecture_id": lecture_id, "watched_seconds": seconds}
+                    for (student_id, lecture_id), seconds in batch.items()
+                ],
+            )
+        except Exception:
+            db.rollback()
+            for (student_id, lecture_id), seconds in batch.items():
+                self.record(student_id, lecture_id, seconds)
+            raise
+        finally:
+            db.close()
+        return len(batch)
+
+
+progress_buffer = ProgressBuffer()
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from app.core.config import settings
+
+READ_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ObjectStat:
+    size: int
+    mtime: float
+
+
+class StorageBackend:
+    """Where finished objects live. Keys are ``/``-separated relative paths.
+
+    Uploads are always staged on local disk first (see ``StorageProvider``);
+    backends only ever receive complete files.
+    """
+
+    def path(self, key: str) -> Path | None:
+        """A local filesystem path for ``key`` when the backend has one, else ``None``."""
+        return None
+
+    def put_file(self, key: str, src: Path) -> None:
+        """Store the local file ``src`` under ``key``, consuming ``src``."""
+        raise NotImplementedError
+
+    def put_tree(self, prefix: str, src: Path) -> None:
+        """Store every file below the local directory ``src`` under ``prefix/``, consuming it."""
+        raise NotImplementedError
+
+    def get_to(self, key: str, dest: Path) -> None:
+        raise NotImplementedError
+
+    def stat(self, key: str) -> ObjectStat:
+        """Size and mtime of ``key``; raises ``FileNotFoundError`` when it does not exist."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.stat(key)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def touch(self, key: str) -> None:
+        """Mark ``key`` as freshly used, where the backend can do so cheaply."""
+
+    def read_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Yield the bytes ``[start, end)`` of ``key`` in chunks."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> None:
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> Iterator[tuple[str, ObjectStat]]:
+        raise NotImplementedError
+
+
+class LocalBackend(StorageBackend):
+    def __init__(self, root: Path):
+        self.root = root
+        self._root = os.path.abspath(root)
+
+    def path(self, key: str) -> Path:
+        # ``root / "/etc/passwd"`` is ``/etc/passwd``: normalize and refuse
+        # anything (absolute keys, ``..``) that lands outside the root.
+        target = os.path.normpath(os.path.join(self._root, key))
+        if target != self._root and not target.startswith(self._root + os.sep):
+            raise FileNotFoundError(key)
+        return Path(target)
+
+    def put_file(self, key: str, src: Path) -> None:
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src, target)
+
+    def put_tree(self, prefix: str, src: Path) -> None:
+        target = self.path(prefix)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src, target)
+
+    def get_to(self, key: str, dest: Path) -> None:
+        shutil.copyfile(self.path(key), dest)
+
+    def stat(self, key: str) -> ObjectStat:
+        st = os.stat(self.path(key))
+        return ObjectStat(size=st.st_size, mtime=st.st_mtime)
+
+    def touch(self, key: str) -> None:
+        os.utime(self.path(key))
+
+    def read_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with self.path(key).open("rb") as fh:
+            fh.seek(start)
+            while start < end:
+                chunk = fh.read(min(READ_CHUNK, end - start))
+                if not chunk:
+                    break
+                start += len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def delete_prefix(self, prefix: str) -> None:
+        shutil.rmtree(self.path(prefix), ignore_errors=True)
+
+    def list(self, prefix: str) -> Iterator[tuple[str, ObjectStat]]:
+        for path in self.path(prefix).rglob("*"):
+            if path.is_file():
+                st = path.stat()
+                yield path.relative_to(self._root).as_posix(), ObjectStat(size=st.st_size, mtime=st.st_mtime)
+
+
+class S3Backend(StorageBackend):
+    """S3-compatible object storage (AWS S3, MinIO, ...).
+
+    One boto3 client, and so one connection pool of ``s3_max_pool_connections``,
+    is shared by every thread. Files above ``s3_multipart_threshold_mb`` are
+    sent as a parallel multipart upload, and reads use ranged GETs so seeking
+    in a video only fetches the requested bytes.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", client=None):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+        except ImportError as exc:  # pragma: no cover - depends on the install
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3") from exc
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = client or boto3.client(
+            "s3",
+            endpoint_url=settings.s3_endpoint_url or None,
+            region_name=settings.s3_region or None,
+            aws_access_key_id=settings.s3_access_key_id or None,
+            aws_secret_access_key=settings.s3_secret_access_key or None,
+            config=Config(max_pool_connections=settings.s3_max_pool_connections, retries={"mode": "standard"}),
+        )
+        mib = 1024 * 1024
+        self.transfer = TransferConfig(
+            multipart_threshold=settings.s3_multipart_threshold_mb * mib,
+            multipart_chunksize=settings.s3_multipart_chunk_mb * mib,
+            max_concurrency=settings.s3_upload_concurrency,
+        )
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def put_file(self, key: str, src: Path) -> None:
+        self.client.upload_file(str(src), self.bucket, self._key(key), Config=self.transfer)
+        src.unlink(missing_ok=True)
+
+    def put_tree(self, prefix: str, src: Path) -> None:
+        for path in sorted(p for p in src.rglob("*") if p.is_file()):
+            self.client.upload_file(str(path), self.bucket, self._key(f"{prefix}/{path.relative_to(src).as_posix()}"), Config=self.transfer)
+        shutil.rmtree(src, ignore_errors=True)
+
+    def get_to(self, key: str, dest: Path) -> None:
+        self.client.download_file(self.bucket, self._key(key), str(dest), Config=self.transfer)
+
+    def stat(self, key: str) -> ObjectStat:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+                raise FileNotFoundError(key) from exc
+            raise
+        return ObjectStat(size=head["ContentLength"], mtime=head["LastModified"].timestamp())
+
+    def touch(self, key: str) -> None:
+        # S3 has no utime: copying the object onto itself with replaced
+        # metadata is what refreshes LastModified, which GC reads as the mtime.
+        # REPLACE drops the stored headers, so carry them over from the HEAD.
+        head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        extra = {"MetadataDirective": "REPLACE", "Metadata": head.get("Metadata", {})}
+        if head.get("ContentType"):
+            extra["ContentType"] = head["ContentType"]
+        self.client.copy({"Bucket": self.bucket, "Key": self._key(key)}, self.bucket, self._key(key), ExtraArgs=extra, Config=self.transfer)
+
+    def read_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        if end <= start:
+            return
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=f"bytes={start}-{end - 1}")["Body"]
+        try:
+            yield from body.iter_chunks(READ_CHUNK)
+        finally:
+            body.close()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def delete_prefix(self, prefix: str) -> None:
+        batch = []
+        for key, _ in self.list(prefix.rstrip("/") + "/"):
+            batch.append({"Key": self._key(key)})
+            if len(batch) == 1000:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch})
+                batch = []
+        if batch:
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch})
+
+    def list(self, prefix: str) -> Iterator[tuple[str, ObjectStat]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix) :], ObjectStat(size=obj["Size"], mtime=obj["LastModified"].timestamp())
+
+
+def make_backend(root: Path) -> StorageBackend:
+    if settings.storage_backend == "s3":
+        return S3Backend(settings.s3_bucket, settings.s3_prefix)
+    if settings.storage_backend != "local":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND {settings.storage_backend!r}")
+    return LocalBackend(root)
@@ -1,29 +1,285 @@
 from __future__ import annotations
 
-from pathlib import Path
+import hashlib
+import os
+import stat as stat_module
+from contextlib import contextmanager
+from dataclasses import dataclass
+from mimetypes import guess_type
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Iterator
 from uuid import uuid4
 
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
+from app.media.streaming import ObjectResponse, VideoFileResponse
+from app.storage.backends import ObjectStat, StorageBackend, make_backend
+
+CHUNK_SIZE = 1024 * 1024
+BLOB_PREFIX = "blobs"
+INCOMING = "incoming"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Precompressed siblings (``<key>.br``, ``<key>.gz``) in order of preference.
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/vnd.apple.mpegurl",
+    "application/x-mpegurl",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+@dataclass(frozen=True)
+class StagedUpload:
+    path: Path
+    ext: str
+    size: int
+    sha256: str
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    key: str
+    size: int
+    sha256: str
+
+
+def blob_key(sha256: str, ext: str) -> str:
+    """``blobs/ab/cd/abcd…<ext>``: two levels of fan-out keep every directory small."""
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def is_blob_key(key: str | None) -> bool:
+    return bool(key) and key.startswith(f"{BLOB_PREFIX}/") and not key.startswith(f"{BLOB_PREFIX}/{INCOMING}/")
+
+
+def _write_chunk(fh: BinaryIO, digest: Any, chunk: bytes) -> None:
+    digest.update(chunk)
+    fh.write(chunk)
+
+
+def _fsync_dir(path: Path) -> None:
+    dir_fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _close_synced(fh: BinaryIO) -> None:
+    fh.flush()
+    os.fsync(fh.fileno())
+    fh.close()
+
+
+def _discard(fh: BinaryIO, tmp: Path) -> None:
+    fh.close()
+    tmp.unlink(missing_ok=True)
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        while chunk := fh.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 class StorageProvider:
-    def __init__(self):
+    """Uploads, content addressing and serving on top of a ``StorageBackend``.
+
+    ``root`` is always a local directory: uploads are staged there before
+    they are committed to the backend, which is the same directory when
+    ``STORAGE_BACKEND=local``.
+    """
+
+    def __init__(self, backend: StorageBackend | None = None):
         self.root = Path(settings.local_storage_path)
         self.root.mkdir(parents=True, exist_ok=True)
+        self.backend = backend or make_backend(self.root)
+
+    @property
+    def incoming(self) -> Path:
+        return self.root / BLOB_PREFIX / INCOMING
+
+    async def stage_upload(self, upload: UploadFile, max_bytes: int | None = None) -> StagedUpload:
+        """Stream ``upload`` to a private ``.part`` file without holding it in memory.
+
+        The SHA-256 and size are computed as chunks are written, all file I/O
+        runs in the threadpool, and uploads larger than ``max_bytes``
+        (``settings.max_upload_bytes`` by default, 0 disables the check) are
+        discarded with a 413. Callers may rewrite the staged file before
+        handing it to ``commit``.
+        """
+        limit = settings.max_upload_bytes if max_bytes is None else max_bytes
+        ext = Path(upload.filename or "").suffix.lower() or ".bin"
+        await run_in_threadpool(self.incoming.mkdir, parents=True, exist_ok=True)
+        tmp = self.incoming / f"{uuid4().hex}.part"
+
+        digest = hashlib.sha256()
+        size = 0
+        fh = await run_in_threadpool(open, tmp, "wb")
+        try:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if limit and size > limit:
+                    raise HTTPException(status_code=413, detail="Upload exceeds the maximum allowed size")
+                await run_in_threadpool(_write_chunk, fh, digest, chunk)
+            await run_in_threadpool(_close_synced, fh)
+        except BaseException:
+            # Inline rather than awaited so a cancelled request still cleans up.
+            _discard(fh, tmp)
+            raise
+        return StagedUpload(path=tmp, ext=ext, size=size, sha256=digest.hexdigest())
+
+    async def commit(self, staged: StagedUpload, modified: bool = False) -> StoredUpload:
+        """Move a staged file into the content-addressed store and return its key.
+
+        Pass ``modified=True`` when the staged file was rewritten after upload
+        so the address is recomputed from the final bytes.
+        """
+        sha256, size = staged.sha256, staged.size
+        if modified:
+            sha256 = await run_in_threadpool(_hash_file, staged.path)
+            size = (await run_in_threadpool(staged.path.stat)).st_size
+        key = blob_key(sha256, staged.ext)
+        await run_in_threadpool(self._link_blob, staged, key)
+        return StoredUpload(key=key, size=size, sha256=sha256)
+
+    def _link_blob(self, staged: StagedUpload, key: str) -> None:
+        if self.backend.exists(key):
+            # Same bytes already stored: drop the copy and refresh the blob so a
+            # concurrent garbage collection treats it as freshly used.
+            staged.path.unlink(missing_ok=True)
+            self.backend.touch(key)
+            return
+        self.backend.put_file(key, staged.path)
+        local = self.backend.path(key)
+        if local is not None:
+            _fsync_dir(local.parent)
+
+    def discard(self, staged: StagedUpload) -> None:
+        staged.path.unlink(missing_ok=True)
+
+    async def save_upload(self, upload: UploadFile, max_bytes: int | None = None) -> StoredUpload:
+        """Stage and commit in one step; identical uploads share one blob."""
+        return await self.commit(await self.stage_upload(upload, max_bytes))
+
+    def scratch_path(self, suffix: str = "") -> Path:
+        """A fresh path in the local staging area, for files that will be ``put``."""
+        self.incoming.mkdir(parents=True, exist_ok=True)
+        return self.incoming / f"{uuid4().hex}{suffix}"
+
+    def put_file(self, key: str, src: Path) -> None:
+        self.backend.put_file(key, src)
+
+    def put_tree(self, prefix: str, src: Path) -> None:
+        self.backend.put_tree(prefix, src)
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[Path]:
+        """A local path holding ``key``'s bytes for tools that need a real file."""
+        local = self.backend.path(key)
+        if local is not None:
+            if not local.exists():
+                raise FileNotFoundError(key)
+            yield local
+            return
+        tmp = self.scratch_path(Path(key).suffix)
+        try:
+            self.backend.get_to(key, tmp)
+            yield tmp
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def stat(self, key: str) -> ObjectStat:
+        return self.backend.stat(key)
+
+    def exists(self, key: str) -> bool:
+        return self.backend.exists(key)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        self.backend.delete_prefix(prefix)
+
+    def list(self, prefix: str) -> Iterator[tuple[str, ObjectStat]]:
+        return self.backend.list(prefix)
+
+    def _precompressed(self, key: str, accept_encoding: str | None) -> tuple[str, str] | None:
+        accepted = set()
+        for part in (accept_encoding or "").split(","):
+            coding, _, params = part.partition(";")
+            name, _, value = params.strip().partition("=")
+            try:
+                weight = float(value) if name.strip() == "q" else 1.0
+            except ValueError:
+                weight = 0.0
+            if coding.strip() and weight > 0:
+                accepted.add(coding.strip().lower())
+        for coding, suffix in PRECOMPRESSED:
+            if (coding in accepted or "*" in accepted) and self.backend.exists(key + suffix):
+                return key + suffix, coding
+        return None
+
+    def file_response(
+        self,
+        key: str,
+        media_type: str | None = None,
+        filename: str | None = None,
+        headers: dict[str, str] | None = None,
+        content_disposition_type: str = "attachment",
+        object_stat: ObjectStat | None = None,
+        accept_encoding: str | None = None,
+    ) -> VideoFileResponse:
+        """Serve ``key`` with Range/ETag/304 support from whichever backend holds it.
+
+        Content-addressed blobs get their SHA-256 as a strong ETag and an
+        immutable ``Cache-Control``; ``headers`` from the caller override both.
+        For compressible types a ``.br``/``.gz`` sibling is served instead when
+        it exists and ``accept_encoding`` allows it. Raises
+        ``FileNotFoundError`` when the object does not exist. Local files go out
+        through ``VideoFileResponse`` (zero-copy where possible), remote objects
+        through ranged GETs.
+        """
+        media_type = media_type or guess_type(filename or key)[0] or "application/octet-stream"
+        sha256 = PurePosixPath(key).name.split(".", 1)[0] if is_blob_key(key) else None
+        response_headers = {}
+        if sha256:
+            response_headers["ETag"] = f'"{sha256}"'
+            response_headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        if media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES:
+            response_headers["Vary"] = "Accept-Encoding"
+            variant = self._precompressed(key, accept_encoding)
+            if variant:
+                key, coding = variant
+                object_stat = None
+                response_headers["Content-Encoding"] = coding
+                if sha256:
+                    response_headers["ETag"] = f'"{sha256}-{coding}"'
+        response_headers.update(headers or {})
 
-    async def save_upload(self, folder: str, upload: UploadFile) -> str:
-        ext = Path(upload.filename or "").suffix or ".bin"
-        target_dir = self.root / folder
-        target_dir.mkdir(parents=True, exist_ok=True)
-        filename = f"{uuid4().hex}{ext}"
-        target = target_dir / filename
-        content = await upload.read()
-        target.write_bytes(content)
-        return str(target.relative_to(self.root))
+        kwargs = {
+            "media_type": media_type,
+            "filename": filename,
+            "headers": response_headers,
+            "content_disposition_type": content_disposition_type,
+        }
+        local = self.backend.path(key)
+        if local is not None:
+            st = os.stat(local)
+            if not stat_module.S_ISREG(st.st_mode):
+                raise FileNotFoundError(key)
+            return VideoFileResponse(local, stat_result=st, **kwargs)
+        return ObjectResponse(self.backend, key, object_stat or self.backend.stat(key), **kwargs)
 
     def resolve(self, key: str) -> Path:
+        """Path of ``key`` under the local root; only meaningful for the local backend."""
         return self.root / key
 
 
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Iterator
+from uuid import uuid4
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.storage.provider import CHUNK_SIZE, StagedUpload, storage_provider
+
+RESUMABLE_PREFIX = "resumable"
+_UPLOAD_ID = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass(frozen=True)
+class UploadState:
+    upload_id: str
+    lecture_id: int
+    organization_id: int | None
+    length: int
+    filename: str
+    offset: int
+    expires_at: int
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def _append(fh: BinaryIO, chunk: bytes) -> None:
+    fh.write(chunk)
+
+
+def _close_synced(fh: BinaryIO) -> None:
+    fh.flush()
+    os.fsync(fh.fileno())
+    fh.close()
+
+
+class ResumableUploads:
+    """tus-style partial uploads kept on local disk until they are finalized.
+
+    Each upload is a directory holding ``info.json`` and the bytes received so
+    far in ``data``; the current offset is simply the size of ``data``, so a
+    PATCH cut off half way resumes from whatever reached the disk. An
+    exclusive ``flock`` on ``data`` serializes PATCH, finalize and expiry for
+    the same upload across workers. Uploads untouched for
+    ``resumable_upload_ttl_sec`` expire.
+    """
+
+    def __init__(self, root: Path, ttl_sec: int):
+        self.root = root
+        self.ttl_sec = ttl_sec
+
+    def _dir(self, upload_id: str) -> Path:
+        if not _UPLOAD_ID.fullmatch(upload_id):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return self.root / upload_id
+
+    def create(self, lecture_id: int, organization_id: int | None, length: int, filename: str) -> UploadState:
+        if length < 0:
+            raise HTTPException(status_code=400, detail="Invalid Upload-Length")
+        if settings.max_upload_bytes and length > settings.max_upload_bytes:
+            raise HTTPException(status_code=413, detail="Upload exceeds the maximum allowed size")
+        upload_id = uuid4().hex
+        folder = self.root / upload_id
+        folder.mkdir(parents=True)
+        (folder / "data").touch()
+        info = {"lecture_id": lecture_id, "organization_id": organization_id, "length": length, "filename": filename}
+        _write_json(folder / "info.json", info)
+        return self.state(upload_id)
+
+    def state(self, upload_id: str) -> UploadState:
+        folder = self._dir(upload_id)
+        try:
+            info = json.loads((folder / "info.json").read_text())
+            st = (folder / "data").stat()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        expires_at = int(st.st_mtime + self.ttl_sec)
+        if expires_at <= time.time():
+            raise HTTPException(status_code=404, detail="Upload expired")
+        return UploadState(upload_id=upload_id, offset=st.st_size, expires_at=expires_at, **info)
+
+    @contextmanager
+    def _locked(self, upload_id: str, mode: str = "r+b") -> Iterator[BinaryIO]:
+        # Never "a"/"w": opening must not recreate a data file finalize just moved away.
+        try:
+            fh = open(self._dir(upload_id) / "data", mode)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        try:
+            try:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise HTTPException(status_code=409, detail="Upload is busy")
+            yield fh
+        finally:
+            fh.close()
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> UploadState:
+        """Append a PATCH body at ``offset``, which must equal the current offset.
+
+        Bytes are fsync'd even when the client disconnects mid-request, so the
+        next HEAD reports exactly what is safely stored.
+        """
+        state = self.state(upload_id)
+        with self._locked(upload_id) as fh:
+            current = fh.seek(0, os.SEEK_END)
+            if offset != current:
+                raise HTTPException(status_code=409, detail=f"Upload-Offset mismatch, expected {current}")
+            try:
+                async for chunk in chunks:
+                    if current + len(chunk) > state.length:
+                        raise HTTPException(status_code=413, detail="Chunk exceeds Upload-Length")
+                    await run_in_threadpool(_append, fh, chunk)
+                    current += len(chunk)
+            finally:
+                await run_in_threadpool(_close_synced, fh)
+        return self.state(upload_id)
+
+    async def take(self, upload_id: str) -> tuple[UploadState, StagedUpload]:
+        """Move a complete upload into the blob staging area and forget it.
+
+        Exactly one caller wins: the data file leaves the upload directory
+        under the lock, so a repeated finalize gets a 404.
+        """
+        state = self.state(upload_id)
+        if state.offset != state.length:
+            raise HTTPException(status_code=409, detail=f"Upload incomplete: {state.offset} of {state.length} bytes")
+        with self._locked(upload_id, "rb") as fh:
+            digest = hashlib.sha256()
+            while chunk := await run_in_threadpool(fh.read, CHUNK_SIZE):
+                digest.update(chunk)
+            target = storage_provider.scratch_path(".part")
+            os.replace(self._dir(upload_id) / "data", target)
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+        ext = Path(state.filename).suffix.lower() or ".bin"
+        return state, StagedUpload(path=target, ext=ext, size=state.length, sha256=digest.hexdigest())
+
+    def delete(self, upload_id: str) -> None:
+        self.state(upload_id)
+        with self._locked(upload_id):
+            shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def expire(self) -> int:
+        """Delete uploads idle for longer than the TTL; returns how many were removed."""
+        if not self.root.exists():
+            return 0
+        cutoff = time.time() - self.ttl_sec
+        removed = 0
+        for folder in self.root.iterdir():
+            if not _UPLOAD_ID.fullmatch(folder.name):
+                continue
+            data = folder / "data"
+            try:
+                if data.stat().st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                # Half-created, or finalized and not cleaned up yet.
+                with suppress(FileNotFoundError):
+                    if folder.stat().st_mtime < cutoff:
+                        shutil.rmtree(folder, ignore_errors=True)
+                continue
+            try:
+                with self._locked(folder.name):
+                    shutil.rmtree(folder, ignore_errors=True)
+            except HTTPException:
+                continue  # a PATCH is resuming it right now
+            removed += 1
+        return removed
+
+
+resumable_uploads = ResumableUploads(storage_provider.root / RESUMABLE_PREFIX, settings.resumable_upload_ttl_sec)
@@ -6,12 +6,38 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.security import parse_jwt
 from app.db.session import get_db
 from app.models.models import User
+from app.services.activity_service import activity_buffer
+from app.utils.cache import TTLCache
 
 security = HTTPBearer(auto_error=False)
 
+# Detached, read-only User snapshots keyed by id, used when stateless_auth is on.
+principal_cache: TTLCache[int, User] = TTLCache(
+    maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl_sec
+)
+
+
+def _cached_principal(db: Session, user_id: int, role: str | None) -> User | None:
+    user = principal_cache.get(user_id)
+    if user is not None and user.role == role:
+        return user
+    user = db.get(User, user_id)
+    if not user:
+        return None
+    if user.is_active:
+        db.expunge(user)
+        principal_cache.set(user_id, user)
+    return user
+
+
+def forget_principal(user_id: int) -> None:
+    """Drop ``user_id``'s cached principal; call after committing a change to its is_active, role or organization."""
+    principal_cache.pop(user_id)
+
 
 def get_current_user(
     creds: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)
@@ -21,11 +47,18 @@ def get_current_user(
     payload = parse_jwt(creds.credentials)
     if not payload or payload.get("type") != "access":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = db.get(User, int(payload["sub"]))
+    user_id = int(payload["sub"])
+    if settings.stateless_auth:
+        user = _cached_principal(db, user_id, payload.get("role"))
+    else:
+        user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account inactive")
+    if settings.stateless_auth:
+        activity_buffer.touch(user.id)
+        return user
     user.last_active_at = datetime.now(timezone.utc)
     db.commit()
     return user
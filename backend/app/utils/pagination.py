@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+from typing import Any, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import Select, func, tuple_
+from sqlalchemy.orm import Session
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    raw = f"{ts.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
+def keyset(db: Session, stmt: Select, ts_col, id_col, cursor: str | None, limit: int) -> Select:
+    """Order ``stmt`` newest first on ``(ts_col, id_col)`` and seek past ``cursor``.
+
+    Fetches one extra row so ``page`` can tell whether another page exists.
+    """
+    stmt = stmt.order_by(ts_col.desc(), id_col.desc()).limit(limit + 1)
+    if not cursor:
+        return stmt
+    ts, row_id = decode_cursor(cursor)
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite keeps CURRENT_TIMESTAMP defaults and bound datetimes in different text
+        # formats; julianday() compares them as instants.
+        return stmt.where(tuple_(func.julianday(ts_col), id_col) < tuple_(func.julianday(ts), row_id))
+    return stmt.where(tuple_(ts_col, id_col) < tuple_(ts, row_id))
+
+
+def page(rows: Sequence[Any], limit: int, key) -> tuple[list[Any], str | None]:
+    """Trim the look-ahead row and build the cursor for the next page from ``key(last_row)``."""
+    items = list(rows[:limit])
+    next_cursor = encode_cursor(*key(items[-1])) if len(rows) > limit and items else None
+    return items, next_cursor
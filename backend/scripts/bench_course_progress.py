@@ -0,0 +1,138 @@
+"""Query count and latency of build_student_course_progress.
+
+Usage: python -m scripts.bench_course_progress [--courses 500] [--progress-rows 100000]
+
+Builds a throwaway SQLite database, then compares the original per-course
+loop (3 queries per course) with the enrollment-counter query used by /progress.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import and_, create_engine, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+from app.models.models import Certificate, Course, Enrollment, Lecture, LectureProgress, Organization, User
+from app.services.course_service import build_student_course_progress, reconcile_enrollment_counters
+
+LECTURES_PER_COURSE = 10
+
+
+def legacy_build_student_course_progress(db: Session, student_id: int) -> list[dict]:
+    output = []
+    for course in db.scalars(select(Course)).all():
+        lecture_ids = [x[0] for x in db.execute(select(Lecture.id).where(Lecture.course_id == course.id)).all()]
+        total = len(lecture_ids)
+        completed = 0
+        if total:
+            completed = (
+                db.scalar(
+                    select(func.count(LectureProgress.id)).where(
+                        and_(
+                            LectureProgress.student_id == student_id,
+                            LectureProgress.lecture_id.in_(lecture_ids),
+                            LectureProgress.completed.is_(True),
+                        )
+                    )
+                )
+                or 0
+            )
+        certificate = db.scalar(
+            select(Certificate).where(and_(Certificate.student_id == student_id, Certificate.course_id == course.id))
+        )
+        output.append({"course_id": course.id, "completed_percent": int((completed / total) * 100) if total else 0, "certificate_available": bool(certificate)})
+    return output
+
+
+def _seed(db: Session, courses: int, progress_rows: int) -> int:
+    org = Organization(name="Bench Org")
+    db.add(org)
+    db.flush()
+    students = max(progress_rows // (courses * LECTURES_PER_COURSE), 1)
+    db.execute(
+        insert(User),
+        [
+            {
+                "role": "student",
+                "organization_id": org.id,
+                "full_name": f"Student {i}",
+                "email": f"s{i}@bench.local",
+                "phone": f"9{i:09d}",
+                "grade_or_standard": "8",
+                "password_hash": "x",
+            }
+            for i in range(students)
+        ],
+    )
+    db.execute(insert(Course), [{"organization_id": org.id, "level": "beginner", "title": f"Course {i}"} for i in range(courses)])
+    course_ids = db.scalars(select(Course.id)).all()
+    db.execute(
+        insert(Lecture),
+        [{"course_id": cid, "title": f"L{j}", "duration_sec": 60, "order_index": j} for cid in course_ids for j in range(LECTURES_PER_COURSE)],
+    )
+    student_ids = db.scalars(select(User.id)).all()
+    lecture_ids = db.scalars(select(Lecture.id)).all()
+    db.execute(
+        insert(Enrollment),
+        [{"organization_id": org.id, "student_id": sid, "course_id": cid, "status": "active"} for sid in student_ids for cid in course_ids],
+    )
+    rows = []
+    for n in range(progress_rows):
+        sid = student_ids[n // len(lecture_ids) % len(student_ids)]
+        rows.append({"student_id": sid, "lecture_id": lecture_ids[n % len(lecture_ids)], "watched_seconds": 60, "completed": n % 3 != 0})
+    db.execute(insert(LectureProgress), rows)
+    db.commit()
+    reconcile_enrollment_counters(db)
+    return student_ids[0]
+
+
+def _measure(engine, fn, runs: int) -> tuple[int, float, float]:
+    counter = {"n": 0}
+
+    def _count(*_):
+        counter["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    timings = []
+    try:
+        for _ in range(runs):
+            with Session(engine) as db:
+                started = time.perf_counter()
+                fn(db)
+                timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return counter["n"] // runs, statistics.median(timings), max(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--progress-rows", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            student_id = _seed(db, args.courses, args.progress_rows)
+
+        print(f"courses={args.courses} progress_rows={args.progress_rows}")
+        print(f"{'implementation':<16}{'queries':>10}{'median ms':>12}{'max ms':>10}")
+        for name, fn in (
+            ("legacy", lambda db: legacy_build_student_course_progress(db, student_id)),
+            ("current", lambda db: build_student_course_progress(db, student_id)),
+        ):
+            queries, median, worst = _measure(engine, fn, args.runs)
+            print(f"{name:<16}{queries:>10}{median:>12.1f}{worst:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
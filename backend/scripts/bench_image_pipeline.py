@@ -0,0 +1,91 @@
+"""Benchmark the AI drawing presets at full resolution versus the bounded working size.
+
+Usage: python -m scripts.bench_image_pipeline [--megapixels 12] [--max-side 2048] [--repeat 3]
+
+Writes a synthetic photo-like JPEG, then runs every preset through
+``transform_image`` twice: "full" decodes at the original size (the old
+behaviour) and "bounded" uses draft/reduce down to ``--max-side``. Each run
+happens in a freshly spawned process so the peak RSS reported is that preset's
+own. Reports best-of-N wall time, ms per input megapixel and peak RSS.
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+
+def _reset_peak_rss() -> None:
+    # A new process starts with its parent's RSS high-water mark; on Linux
+    # writing 5 to clear_refs resets it so only this run's peak is reported.
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mib() -> float:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(src: str, out: str, preset: str, max_side: int, repeat: int, results) -> None:
+    from app.services.ai_service import transform_image
+
+    _reset_peak_rss()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        transform_image(src, out, preset, max_side=max_side)
+        best = min(best, time.perf_counter() - started)
+    results.put((best, _peak_rss_mib()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--max-side", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from PIL import Image
+
+    from app.services.ai_service import PIPELINES
+
+    width = int((args.megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    megapixels = width * height / 1_000_000
+    tmp = Path(tempfile.mkdtemp())
+    src = tmp / "photo.jpg"
+    base = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    Image.blend(base, noise, 0.35).save(src, quality=90)
+    del base, noise
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"input={width}x{height} ({megapixels:.1f} MP) max_side={args.max_side} best of {args.repeat}")
+    print(f"{'preset':<30}{'mode':<9}{'ms':>9}{'ms/MP':>9}{'peak RSS MiB':>14}")
+    for preset in sorted(PIPELINES):
+        for mode, max_side in (("full", 0), ("bounded", args.max_side)):
+            results = ctx.Queue()
+            proc = ctx.Process(target=_measure, args=(str(src), str(tmp / "out.png"), preset, max_side, args.repeat, results))
+            proc.start()
+            seconds, rss_mib = results.get()
+            proc.join()
+            ms = seconds * 1000
+            print(f"{preset:<30}{mode:<9}{ms:>9.0f}{ms / megapixels:>9.1f}{rss_mib:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare encoded sizes of AI drawing outputs and their derivatives per output format.
+
+Usage: python -m scripts.bench_output_encoding [--megapixels 3] [--formats png,webp,avif]
+
+Renders every preset on a synthetic photo-like image once, then encodes the
+result with ``save_output`` in each format. Reports encode time and the bytes
+of the full output, the preview and the thumbnail, next to the unoptimized
+RGB/gray PNG outputs used to be saved as.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megapixels", type=float, default=3)
+    parser.add_argument("--formats", default="png,webp,avif")
+    args = parser.parse_args()
+
+    from PIL import Image
+
+    from app.ai.encoding import OUTPUT_FORMATS, _avif_available, derivative_path, save_output
+    from app.services.ai_service import PIPELINES, WorkingImage
+
+    width = int((args.megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    # Gradient plus soft colour blobs plus a little grain: closer to a photo
+    # than pure noise, which no encoder can compress.
+    base = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    blobs = Image.frombytes("RGB", (40, 30), os.urandom(40 * 30 * 3)).resize((width, height), Image.Resampling.BICUBIC)
+    grain = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    photo = Image.blend(Image.blend(base, blobs, 0.6), grain, 0.08)
+    del base, blobs, grain
+    tmp = Path(tempfile.mkdtemp())
+
+    formats = [f for f in args.formats.split(",") if f in OUTPUT_FORMATS]
+    if "avif" in formats and not _avif_available():
+        print("avif: skipped, needs Pillow >= 11.2 or pillow-avif-plugin")
+        formats.remove("avif")
+
+    print(f"input={width}x{height}")
+    print(f"{'preset':<30}{'format':<8}{'ms':>7}{'output KiB':>12}{'preview KiB':>13}{'thumb KiB':>11}")
+    for preset in sorted(PIPELINES):
+        out = PIPELINES[preset](WorkingImage(photo))
+        legacy = tmp / "legacy.png"
+        out.save(legacy)
+        print(f"{preset:<30}{'legacy':<8}{'':>7}{legacy.stat().st_size / 1024:>12.0f}")
+        for fmt in formats:
+            path = str(tmp / f"out{OUTPUT_FORMATS[fmt]}")
+            started = time.perf_counter()
+            save_output(out, path, preset)
+            ms = (time.perf_counter() - started) * 1000
+            kib = [Path(p).stat().st_size / 1024 for p in (path, derivative_path(path, "preview"), derivative_path(path, "thumbnail"))]
+            print(f"{'':<30}{fmt:<8}{ms:>7.0f}{kib[0]:>12.0f}{kib[1]:>13.1f}{kib[2]:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Login throughput per core for the process-pool password hasher.
+
+Usage: python -m scripts.bench_password_hashing [--logins 200] [--rounds 12]
+
+Run from the backend directory. Prints verifies/sec for inline hashing (the
+old behaviour, one threadpool worker busy per login) and for the bounded
+process pool at increasing worker counts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+
+from passlib.context import CryptContext
+
+
+def _bench_inline(ctx: CryptContext, password_hash: str, logins: int) -> float:
+    started = time.perf_counter()
+    for _ in range(logins):
+        ctx.verify("Password@123", password_hash)
+    return logins / (time.perf_counter() - started)
+
+
+async def _bench_pool(workers: int, password_hash: str, logins: int) -> float:
+    from app.core.security import verify_and_update_password
+    from app.core.workers import BoundedProcessPool
+
+    pool = BoundedProcessPool(max_workers=workers, max_pending=logins)
+    try:
+        await pool.run(verify_and_update_password, "Password@123", password_hash)  # warm up workers
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(pool.run(verify_and_update_password, "Password@123", password_hash) for _ in range(logins))
+        )
+        return logins / (time.perf_counter() - started)
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    ctx = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    password_hash = ctx.hash("Password@123")
+    cores = os.cpu_count() or 1
+
+    inline = _bench_inline(ctx, password_hash, max(args.logins // 10, 5))
+    print(f"bcrypt rounds={args.rounds} cores={cores}")
+    print(f"{'mode':<12}{'workers':>8}{'logins/s':>12}{'per core':>12}")
+    print(f"{'inline':<12}{1:>8}{inline:>12.1f}{inline:>12.1f}")
+
+    workers = 1
+    while workers <= cores:
+        rate = asyncio.run(_bench_pool(workers, password_hash, args.logins))
+        print(f"{'pool':<12}{workers:>8}{rate:>12.1f}{rate / workers:>12.1f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
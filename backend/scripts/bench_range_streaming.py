@@ -0,0 +1,88 @@
+"""Benchmark seek-heavy playback through /media/stream with and without Range.
+
+Usage: python -m scripts.bench_range_streaming [--size-mb 64] [--seeks 100] [--window-mb 2]
+
+Drives the real app against a throwaway SQLite database and video file. Each
+seek jumps to a random offset; "full" replays the old behaviour where every
+seek re-downloads the file from byte 0, "range" asks only for a window at the
+seek position. Reports bytes served and p50/p99 latency per seek.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--seeks", type=int, default=100)
+    parser.add_argument("--window-mb", type=int, default=2)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+    os.environ["LOCAL_STORAGE_PATH"] = str(Path(tmp) / "storage")
+
+    from fastapi.testclient import TestClient
+
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+    from app.main import app
+    from app.media.signed_video import generate_video_token
+    from app.models.models import Course, Enrollment, Lecture, User
+    from app.storage.provider import storage_provider
+
+    Base.metadata.create_all(engine)
+    size = args.size_mb * 1024 * 1024
+    window = args.window_mb * 1024 * 1024
+    video = storage_provider.resolve("videos/bench.mp4")
+    video.parent.mkdir(parents=True, exist_ok=True)
+    with video.open("wb") as fh:
+        fh.write(os.urandom(size))
+
+    with SessionLocal() as db:
+        student = User(role="student", full_name="Bench", email="bench@example.com", phone="7000000000", grade_or_standard="8", password_hash="x")
+        course = Course(level="beginner", title="Bench")
+        db.add_all([student, course])
+        db.flush()
+        lecture = Lecture(course_id=course.id, title="Bench", duration_sec=3600, video_key="videos/bench.mp4")
+        db.add(lecture)
+        db.add(Enrollment(student_id=student.id, course_id=course.id, status="active"))
+        db.commit()
+        url = f"/media/stream/{lecture.id}?token={generate_video_token(lecture.id, student.id)}"
+
+    rng = random.Random(42)
+    offsets = [rng.randrange(0, size - window) for _ in range(args.seeks)]
+
+    print(f"file={args.size_mb}MiB seeks={args.seeks} window={args.window_mb}MiB")
+    print(f"{'mode':<8}{'MiB served':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    with TestClient(app) as client:
+        for mode in ("full", "range"):
+            served = 0
+            latencies = []
+            for offset in offsets:
+                headers = {"Range": f"bytes={offset}-{offset + window - 1}"} if mode == "range" else {}
+                started = time.perf_counter()
+                r = client.get(url, headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                served += len(r.content)
+            print(
+                f"{mode:<8}{served / 1024 / 1024:>12.0f}"
+                f"{statistics.median(latencies):>10.1f}{_percentile(latencies, 99):>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
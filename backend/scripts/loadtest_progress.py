@@ -0,0 +1,102 @@
+"""Load test for lecture progress heartbeats with and without write-behind.
+
+Usage: python -m scripts.loadtest_progress [--viewers 50] [--minutes 10]
+
+Drives POST /lectures/{id}/progress through the real app against a throwaway
+SQLite database. Every viewer sends one heartbeat per 10 s of playback (what
+the player does) and the write-behind buffer is flushed every
+PROGRESS_FLUSH_INTERVAL_SEC of simulated time. Reports statements that write
+to lecture_progress per viewer for both modes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+HEARTBEAT_SEC = 10
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--viewers", type=int, default=50)
+    parser.add_argument("--minutes", type=int, default=10)
+    parser.add_argument("--flush-interval", type=int, default=60)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp) / 'loadtest.db'}"
+    os.environ["LOCAL_STORAGE_PATH"] = str(Path(tmp) / "storage")
+    os.environ["BCRYPT_ROUNDS"] = "4"
+    os.environ["STATELESS_AUTH"] = "true"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.core.config import settings
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+    from app.main import app
+    from app.models.models import Course, Enrollment, Lecture
+    from app.services.course_service import init_enrollment_counters
+    from app.services.progress_buffer import progress_buffer
+
+    Base.metadata.create_all(engine)
+    duration = args.minutes * 60 + HEARTBEAT_SEC
+    with SessionLocal() as db:
+        course = Course(level="beginner", title="Load test")
+        db.add(course)
+        db.flush()
+        lecture = Lecture(course_id=course.id, title="Long lecture", duration_sec=duration)
+        db.add(lecture)
+        db.commit()
+        course_id, lecture_id = course.id, lecture.id
+
+    writes = {"n": 0}
+
+    def _count(conn, cursor, statement, *_):
+        head = statement.lstrip().split(None, 3)
+        if head and head[0] in {"INSERT", "UPDATE"} and "lecture_progress" in statement.split("(")[0]:
+            writes["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+
+    with TestClient(app) as client:
+        viewers = []
+        for i in range(args.viewers * 2):
+            email = f"viewer{i}@loadtest.example.com"
+            r = client.post(
+                "/auth/signup",
+                json={"full_name": "Viewer", "email": email, "phone": f"6{i:09d}", "grade_or_standard": "8", "password": "pw"},
+            )
+            with SessionLocal() as db:
+                enrollment = Enrollment(student_id=r.json()["id"], course_id=course_id, status="active")
+                init_enrollment_counters(db, enrollment)
+                db.add(enrollment)
+                db.commit()
+            token = client.post("/auth/login", json={"email": email, "password": "pw"}).json()["access_token"]
+            viewers.append({"Authorization": f"Bearer {token}"})
+
+        print(f"viewers={args.viewers} playback={args.minutes}min heartbeat={HEARTBEAT_SEC}s flush={args.flush_interval}s")
+        print(f"{'mode':<14}{'heartbeats':>12}{'db writes':>12}{'writes/viewer':>15}{'wall s':>9}")
+        for mode, cohort in (("direct", viewers[: args.viewers]), ("write-behind", viewers[args.viewers :])):
+            settings.progress_write_behind = mode == "write-behind"
+            writes["n"] = 0
+            heartbeats = 0
+            started = time.perf_counter()
+            for second in range(HEARTBEAT_SEC, args.minutes * 60 + 1, HEARTBEAT_SEC):
+                for headers in cohort:
+                    client.post(f"/lectures/{lecture_id}/progress", json={"watched_seconds": second}, headers=headers)
+                    heartbeats += 1
+                if settings.progress_write_behind and second % args.flush_interval == 0:
+                    progress_buffer.flush()
+            progress_buffer.flush()
+            elapsed = time.perf_counter() - started
+            print(f"{mode:<14}{heartbeats:>12}{writes['n']:>12}{writes['n'] / len(cohort):>15.1f}{elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
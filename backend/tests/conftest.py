@@ -1,4 +1,5 @@
 import os
+import shutil
 from pathlib import Path
 
 import pytest
@@ -21,6 +22,7 @@ def db_engine():
     yield engine
     Base.metadata.drop_all(bind=engine)
     Path("test.db").unlink(missing_ok=True)
+    shutil.rmtree("test_storage", ignore_errors=True)
 
 
 @pytest.fixture()
@@ -38,3 +40,67 @@ def client(db_engine):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def db_session(db_engine):
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture()
+def student_login(client):
+    counter = {"n": 0}
+
+    def _login(prefix: str) -> tuple[int, dict]:
+        counter["n"] += 1
+        email = f"{prefix}{counter['n']}@example.com"
+        signup = client.post(
+            "/auth/signup",
+            json={
+                "full_name": f"Student {prefix}",
+                "email": email,
+                "phone": f"8{abs(hash(email)) % 10**9:09d}",
+                "grade_or_standard": "8",
+                "password": "Password@123",
+            },
+        )
+        login = client.post("/auth/login", json={"email": email, "password": "Password@123"})
+        return signup.json()["id"], {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    return _login
+
+
+@pytest.fixture()
+def admin_login(client, db_session):
+    from app.core.security import hash_password
+    from app.models.models import Organization, User
+
+    counter = {"n": 0}
+
+    def _login(prefix: str) -> tuple[int, dict]:
+        counter["n"] += 1
+        org = Organization(name=f"{prefix} org {counter['n']}")
+        db_session.add(org)
+        db_session.flush()
+        email = f"{prefix}-admin{counter['n']}@example.com"
+        db_session.add(
+            User(
+                role="admin",
+                organization_id=org.id,
+                full_name=f"Admin {prefix}",
+                email=email,
+                phone=f"5{abs(hash(email)) % 10**9:09d}",
+                grade_or_standard="NA",
+                password_hash=hash_password("Password@123"),
+            )
+        )
+        db_session.commit()
+        login = client.post("/auth/login", json={"email": email, "password": "Password@123"})
+        return org.id, {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    return _login
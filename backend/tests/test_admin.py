@@ -0,0 +1,174 @@
+from app.models.models import Course, DashboardRollup, Lecture, LectureProgress, User
+from app.services.course_service import mark_complete, mark_progress, upsert_watched_seconds
+from app.services.dashboard_service import refresh_dashboard_rollups
+
+
+def _student(db, org_id: int, email: str) -> User:
+    student = User(
+        role="student",
+        organization_id=org_id,
+        full_name=email,
+        email=email,
+        phone=f"4{abs(hash(email)) % 10**9:09d}",
+        grade_or_standard="8",
+        password_hash="x",
+    )
+    db.add(student)
+    db.flush()
+    return student
+
+
+def test_dashboard_reads_rollup_and_progress_nudges_it(client, db_session, admin_login):
+    org_id, headers = admin_login("dash")
+    student = _student(db_session, org_id, "dash-student@example.com")
+    course = Course(level="beginner", title="Dash", organization_id=org_id)
+    db_session.add(course)
+    db_session.flush()
+    lectures = [Lecture(course_id=course.id, title=f"L{i}", duration_sec=60) for i in range(2)]
+    db_session.add_all(lectures)
+    db_session.flush()
+    db_session.add(LectureProgress(student_id=student.id, lecture_id=lectures[0].id, watched_seconds=5))
+    db_session.add(LectureProgress(student_id=student.id, lecture_id=lectures[1].id, watched_seconds=5))
+    db_session.commit()
+
+    r = client.get("/admin/dashboard", headers=headers).json()
+    assert r["total_students"] == 1
+    assert r["progress_distribution"]["completed_percent"] == 0
+
+    mark_complete(db_session, student.id, lectures[0].id)
+    r = client.get("/admin/dashboard", headers=headers).json()
+    assert r["progress_distribution"]["completed_percent"] == 50
+
+    _student(db_session, org_id, "dash-student2@example.com")
+    db_session.commit()
+    assert client.get("/admin/dashboard", headers=headers).json()["total_students"] == 1
+    assert client.get("/admin/dashboard?fresh=1", headers=headers).json()["total_students"] == 2
+    refresh_dashboard_rollups(db_session, org_id)
+    assert client.get("/admin/dashboard", headers=headers).json()["total_students"] == 2
+
+
+def test_first_heartbeats_count_towards_the_rollup_total(client, db_session, admin_login):
+    org_id, headers = admin_login("dash-new")
+    student = _student(db_session, org_id, "dash-new-student@example.com")
+    course = Course(level="beginner", title="Dash new", organization_id=org_id)
+    db_session.add(course)
+    db_session.flush()
+    lectures = [Lecture(course_id=course.id, title=f"N{i}", duration_sec=60) for i in range(3)]
+    db_session.add_all(lectures)
+    db_session.commit()
+    assert client.get("/admin/dashboard", headers=headers).json()["progress_distribution"]["completed_percent"] == 0
+
+    def rollup() -> tuple[int, int]:
+        db_session.expire_all()
+        row = db_session.get(DashboardRollup, org_id)
+        return row.total_progress, row.completed_progress
+
+    mark_progress(db_session, student.id, lectures[0].id, 10)
+    assert rollup() == (1, 0)
+    mark_progress(db_session, student.id, lectures[0].id, 20)
+    assert rollup() == (1, 0)
+
+    # Inserted already complete: counts as new and completed at once.
+    mark_complete(db_session, student.id, lectures[1].id)
+    assert rollup() == (2, 1)
+    assert client.get("/admin/dashboard", headers=headers).json()["progress_distribution"] == {
+        "completed_percent": 50,
+        "incomplete_percent": 50,
+    }
+
+    # Write-behind flushes count only the rows they insert.
+    upsert_watched_seconds(
+        db_session,
+        [
+            {"student_id": student.id, "lecture_id": lectures[0].id, "watched_seconds": 30},
+            {"student_id": student.id, "lecture_id": lectures[2].id, "watched_seconds": 5},
+        ],
+    )
+    assert rollup() == (3, 1)
+    refresh_dashboard_rollups(db_session, org_id)
+    assert rollup() == (3, 1)
+
+
+def test_admin_lists_are_keyset_paginated(client, db_session, admin_login):
+    org_id, headers = admin_login("pages")
+    db_session.add_all([Course(level="beginner" if i % 2 else "advanced", title=f"Paged {i}", organization_id=org_id) for i in range(5)])
+    db_session.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/admin/courses", params=params, headers=headers).json()
+        assert len(body["items"]) <= 2
+        seen += [c["title"] for c in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [f"Paged {i}" for i in reversed(range(5))]
+
+    body = client.get("/admin/courses", params={"level": "beginner"}, headers=headers).json()
+    assert [c["title"] for c in body["items"]] == ["Paged 3", "Paged 1"]
+    assert client.get("/admin/courses", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
+
+
+def test_student_list_query_count_is_constant(client, db_engine, db_session, admin_login):
+    from sqlalchemy import event
+
+    from app.models.models import Enrollment
+
+    org_id, headers = admin_login("nplus1")
+    course = Course(level="beginner", title="N+1", organization_id=org_id)
+    db_session.add(course)
+    db_session.commit()
+
+    def _list_and_count() -> tuple[int, list[dict]]:
+        statements = []
+
+        def _record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db_engine, "before_cursor_execute", _record)
+        try:
+            body = client.get("/admin/students", headers=headers).json()
+        finally:
+            event.remove(db_engine, "before_cursor_execute", _record)
+        return len(statements), body["items"]
+
+    for i in range(3):
+        s = _student(db_session, org_id, f"nplus1-a{i}@example.com")
+        db_session.add(Enrollment(student_id=s.id, course_id=course.id, organization_id=org_id, status="active"))
+    db_session.commit()
+    few, items = _list_and_count()
+    assert [(row["enrollments"], row["active_enrollments"]) for row in items] == [(1, 1)] * 3
+
+    for i in range(12):
+        s = _student(db_session, org_id, f"nplus1-b{i}@example.com")
+        db_session.add(Enrollment(student_id=s.id, course_id=course.id, organization_id=org_id, status="pending"))
+    db_session.commit()
+    many, items = _list_and_count()
+    assert len(items) == 15
+    assert sum(row["active_enrollments"] for row in items) == 3
+    assert many == few
+
+
+def test_certificate_list_is_scoped_to_the_admins_organization(client, db_session, admin_login):
+    from app.services.certificate_service import generate_certificate
+
+    org_id, headers = admin_login("certs")
+    other_org_id, other_headers = admin_login("certs-other")
+    course = Course(level="beginner", title="Certified", organization_id=org_id)
+    other_course = Course(level="beginner", title="Elsewhere", organization_id=other_org_id)
+    db_session.add_all([course, other_course])
+    db_session.flush()
+    student = _student(db_session, org_id, "certs-student@example.com")
+    other_student = _student(db_session, other_org_id, "certs-other-student@example.com")
+    db_session.commit()
+
+    cert = generate_certificate(db_session, student.id, course.id)
+    generate_certificate(db_session, other_student.id, other_course.id)
+    assert cert.organization_id == org_id
+
+    items = client.get("/admin/certificates", headers=headers).json()["items"]
+    assert [(i["id"], i["student_name"], i["course_title"]) for i in items] == [
+        (cert.id, "certs-student@example.com", "Certified")
+    ]
+    assert [i["course_title"] for i in client.get("/admin/certificates", headers=other_headers).json()["items"]] == ["Elsewhere"]
@@ -0,0 +1,286 @@
+import asyncio
+import io
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from PIL import Image
+from sqlalchemy import func
+
+from app.models.models import AIResultCache, AITransformJob, CreditLedger, Organization, User, UserCredit
+from app.services import ai_service
+from app.services.ai_result_cache import evict, output_keys
+from app.storage.provider import storage_provider
+
+
+def _drawing_student(db, student_id: int, credits: int) -> None:
+    org = Organization(name=f"AI org {student_id}", ai_drawing_enabled=True)
+    db.add(org)
+    db.flush()
+    db.get(User, student_id).organization_id = org.id
+    db.add(UserCredit(user_id=student_id, balance=credits))
+    db.commit()
+
+
+def _png(color: str = "red") -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_transform_is_queued_and_settles_the_reserved_credit(client, db_session, student_login):
+    student_id, headers = student_login("aijob")
+    _drawing_student(db_session, student_id, credits=1)
+
+    r = client.post("/ai/transform", headers=headers, data={"preset": "value_map"}, files={"image": ("a.png", _png())})
+    assert r.status_code == 202
+    job_url = r.json()["status_url"]
+
+    status = client.get(job_url, headers=headers).json()
+    assert status["status"] == "succeeded" and status["error"] is None
+    assert status["started_at"] and status["finished_at"]
+    result = client.get(f"{job_url}/result", headers=headers)
+    assert result.status_code == 200
+    assert Image.open(io.BytesIO(result.content)).size == (64, 48)
+
+    (item,) = client.get("/ai/history", headers=headers).json()
+    assert item["output_url"] == f"/media/file/{item['output_image_path']}"
+    for url in (item["thumbnail_url"], item["preview_url"]):
+        served = client.get(url)
+        assert served.status_code == 200 and served.headers["content-type"] == "image/webp"
+
+    db_session.expire_all()
+    assert db_session.query(UserCredit).filter_by(user_id=student_id).one().balance == 0
+    again = client.post("/ai/transform", headers=headers, data={"preset": "value_map"}, files={"image": ("a.png", _png())})
+    assert again.status_code == 402
+
+
+def test_failed_transform_refunds_the_credit(client, db_session, student_login):
+    student_id, headers = student_login("aifail")
+    _drawing_student(db_session, student_id, credits=1)
+
+    r = client.post("/ai/transform", headers=headers, data={"preset": "value_map"}, files={"image": ("a.png", b"not an image")})
+    assert r.status_code == 202
+    status = client.get(r.json()["status_url"], headers=headers).json()
+    assert status["status"] == "failed" and "UnidentifiedImageError" in status["error"]
+    assert status["output_url"] is None
+    assert client.get(f"{r.json()['status_url']}/result", headers=headers).status_code == 409
+
+    db_session.expire_all()
+    assert db_session.query(UserCredit).filter_by(user_id=student_id).one().balance == 1
+    reasons = [e.reason for e in db_session.query(CreditLedger).filter_by(user_id=student_id).order_by(CreditLedger.id)]
+    assert reasons == ["ai_drawing", "ai_drawing_refund"]
+
+
+def test_saturated_pool_rejects_before_reserving(client, db_session, student_login, monkeypatch):
+    student_id, headers = student_login("aibusy")
+    _drawing_student(db_session, student_id, credits=1)
+    monkeypatch.setattr(ai_service.ai_pool, "max_pending", 0)
+
+    image = _png("blue")
+    r = client.post("/ai/transform", headers=headers, data={"preset": "value_map"}, files={"image": ("a.png", image)})
+    assert r.status_code == 503
+    db_session.expire_all()
+    assert db_session.query(UserCredit).filter_by(user_id=student_id).one().balance == 1
+    assert db_session.query(AITransformJob).filter_by(student_id=student_id).count() == 0
+
+
+def test_repeat_transform_is_served_from_the_result_cache(client, db_session, student_login):
+    student_id, headers = student_login("aicache")
+    _drawing_student(db_session, student_id, credits=3)
+    image = _png("green")
+
+    first = client.post("/ai/transform", headers=headers, data={"preset": "charcoal_shading"}, files={"image": ("a.png", image)})
+    assert first.status_code == 202 and first.json()["cached"] is False
+    output_key = client.get(first.json()["status_url"], headers=headers).json()["output_image_path"]
+
+    again = client.post("/ai/transform", headers=headers, data={"preset": "charcoal_shading"}, files={"image": ("b.png", image)})
+    assert again.status_code == 200
+    body = again.json()
+    assert body["cached"] is True and body["status"] == "succeeded" and body["output_image_path"] == output_key
+
+    db_session.expire_all()
+    entry = db_session.get(AIResultCache, output_key)
+    assert entry.hits == 1 and entry.refs == 2 and entry.size == sum(storage_provider.stat(k).size for k in output_keys(output_key))
+    assert db_session.query(AITransformJob).filter_by(student_id=student_id).count() == 2
+    assert db_session.query(UserCredit).filter_by(user_id=student_id).one().balance == 1
+
+
+def test_result_cache_evicts_least_recently_used_outputs(db_session):
+    old = datetime.now(timezone.utc) - timedelta(hours=1)
+    keys = []
+    for n in range(3):
+        key = f"ai/output/{'%064d' % n}_value_map_v0.png"
+        path = storage_provider.resolve(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * 100)
+        db_session.add(
+            AIResultCache(
+                key=key,
+                input_sha256="%064d" % n,
+                preset="value_map",
+                pipeline_version=0,
+                size=100,
+                last_used_at=old + timedelta(minutes=n),
+            )
+        )
+        keys.append(key)
+    db_session.commit()
+
+    cached = db_session.query(func.coalesce(func.sum(AIResultCache.size), 0)).filter(AIResultCache.refs == 0)
+    total_others = cached.scalar() - 300
+    assert evict(db_session, budget_bytes=total_others + 150) == 2
+    assert [storage_provider.exists(k) for k in keys] == [False, False, True]
+
+
+def test_batch_transform_charges_once_and_settles_every_preset(client, db_session, student_login):
+    student_id, headers = student_login("aibatch")
+    _drawing_student(db_session, student_id, credits=3)
+    image = _png("purple")
+    chosen = ["value_map", "pencil_sketch_outline", "simplified_shapes_block_in"]
+
+    r = client.post(
+        "/ai/transform/batch",
+        headers=headers,
+        data={"preset": chosen + ["value_map"]},
+        files={"image": ("a.png", image)},
+    )
+    assert r.status_code == 202
+    body = r.json()
+    assert body["credits_charged"] == 3 and [j["preset"] for j in body["jobs"]] == chosen
+    for job in body["jobs"]:
+        status = client.get(job["status_url"], headers=headers).json()
+        assert status["status"] == "succeeded"
+        assert client.get(f"{job['status_url']}/result", headers=headers).status_code == 200
+
+    db_session.expire_all()
+    assert db_session.query(UserCredit).filter_by(user_id=student_id).one().balance == 0
+    ledger = [(e.amount, e.reason) for e in db_session.query(CreditLedger).filter_by(user_id=student_id)]
+    assert ledger == [(-3, "ai_drawing")]
+    assert ai_service.ai_pool.pending == 0
+
+
+def test_batch_transform_refunds_failures_in_one_entry(client, db_session, student_login):
+    student_id, headers = student_login("aibatchfail")
+    _drawing_student(db_session, student_id, credits=2)
+
+    r = client.post(
+        "/ai/transform/batch",
+        headers=headers,
+        data={"preset": ["value_map", "charcoal_shading", "pencil_sketch_outline"]},
+        files={"image": ("a.png", b"not an image")},
+    )
+    assert r.status_code == 402
+
+    r = client.post(
+        "/ai/transform/batch",
+        headers=headers,
+        data={"preset": ["value_map", "charcoal_shading"]},
+        files={"image": ("a.png", b"not an image")},
+    )
+    assert r.status_code == 202
+    for job in r.json()["jobs"]:
+        assert client.get(job["status_url"], headers=headers).json()["status"] == "failed"
+
+    db_session.expire_all()
+    assert db_session.query(UserCredit).filter_by(user_id=student_id).one().balance == 2
+    ledger = [(e.amount, e.reason) for e in db_session.query(CreditLedger).filter_by(user_id=student_id).order_by(CreditLedger.id)]
+    assert ledger == [(-2, "ai_drawing"), (2, "ai_drawing_refund")]
+    assert ai_service.ai_pool.pending == 0
+
+
+def test_outputs_shown_by_jobs_stay_outside_the_cache_budget(client, db_session, student_login):
+    student_id, headers = student_login("aievictjob")
+    _drawing_student(db_session, student_id, credits=1)
+
+    r = client.post("/ai/transform", headers=headers, data={"preset": "value_map"}, files={"image": ("a.png", _png("orange"))})
+    status_url = r.json()["status_url"]
+    output_key = client.get(status_url, headers=headers).json()["output_image_path"]
+
+    evict(db_session, budget_bytes=0)
+    db_session.expire_all()
+    assert db_session.get(AIResultCache, output_key).refs == 1
+    assert client.get(f"{status_url}/result", headers=headers).status_code == 200
+    (item,) = client.get("/ai/history", headers=headers).json()
+    assert client.get(item["thumbnail_url"]).status_code == 200
+
+
+def _output_bytes() -> int:
+    return sum(p.stat().st_size for p in storage_provider.resolve("ai/output").rglob("*") if p.is_file())
+
+
+def test_deleted_jobs_leave_outputs_to_the_cache_budget(client, db_session, student_login, monkeypatch):
+    from app.core.config import settings
+
+    student_id, headers = student_login("aievictbytes")
+    _drawing_student(db_session, student_id, credits=2)
+    image = _png("teal")
+
+    r = client.post("/ai/transform", headers=headers, data={"preset": "value_map"}, files={"image": ("a.png", image)})
+    job = client.get(r.json()["status_url"], headers=headers).json()
+    output_key = job["output_image_path"]
+    assert client.delete(r.json()["status_url"], headers=headers).status_code == 200
+
+    # No job shows it any more, but it is still served as a cache hit.
+    db_session.expire_all()
+    entry = db_session.get(AIResultCache, output_key)
+    assert entry.refs == 0 and all(storage_provider.exists(k) for k in output_keys(output_key))
+    again = client.post("/ai/transform", headers=headers, data={"preset": "value_map"}, files={"image": ("b.png", image)})
+    assert again.status_code == 200 and again.json()["cached"] is True
+
+    before = _output_bytes()
+    monkeypatch.setattr(settings, "ai_result_cache_max_mb", 0)
+    assert client.delete(again.json()["status_url"], headers=headers).status_code == 200
+    assert _output_bytes() <= before - entry.size
+    assert not any(storage_provider.exists(k) for k in output_keys(output_key))
+    db_session.expire_all()
+    assert db_session.get(AIResultCache, output_key) is None
+    assert db_session.query(AITransformJob).filter_by(student_id=student_id).count() == 0
+
+
+def _queued_job(db, student_id: int, created_at: datetime | None = None) -> AITransformJob:
+    # What /ai/transform leaves behind: a queued job whose credit is already reserved.
+    job = AITransformJob(
+        student_id=student_id,
+        input_image_path="ai/input/x.png",
+        preset="value_map",
+        output_image_path="ai/output/x.webp",
+        status="queued",
+    )
+    if created_at is not None:
+        job.created_at = created_at
+    db.add(job)
+    db.commit()
+    return job
+
+
+def test_jobs_cancelled_by_shutdown_are_failed_and_refunded(db_session, student_login, tmp_path):
+    student_id, _ = student_login("aicancel")
+    _drawing_student(db_session, student_id, credits=0)
+    job = _queued_job(db_session, student_id)
+
+    async def run():
+        pending = asyncio.get_running_loop().create_future()
+        pending.cancel()  # what ai_pool.shutdown(cancel_futures=True) does to a queued job
+        await ai_service.finish_transform_job(job.id, "0" * 64, pending, tmp_path / "out.webp", "ai/output/x.webp", ExitStack())
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
+    db_session.expire_all()
+    assert db_session.get(AITransformJob, job.id).status == "failed"
+    assert db_session.get(AITransformJob, job.id).error == ai_service.CANCELLED_ERROR
+    assert db_session.query(UserCredit).filter_by(user_id=student_id).one().balance == 1
+
+
+def test_jobs_orphaned_by_a_dead_process_are_swept(db_session, student_login):
+    student_id, _ = student_login("aistale")
+    _drawing_student(db_session, student_id, credits=0)
+    stale = _queued_job(db_session, student_id, created_at=datetime.now(timezone.utc) - timedelta(hours=2))
+    fresh = _queued_job(db_session, student_id)
+
+    assert ai_service.fail_stale_jobs(max_age_sec=3600) == 1
+    db_session.expire_all()
+    assert db_session.get(AITransformJob, stale.id).status == "failed"
+    assert db_session.get(AITransformJob, fresh.id).status == "queued"
+    assert db_session.query(UserCredit).filter_by(user_id=student_id).one().balance == 1
+    assert ai_service.fail_stale_jobs(max_age_sec=3600) == 0
@@ -0,0 +1,116 @@
+import struct
+
+import pytest
+
+from app.media.faststart import MP4Error, faststart, top_level_atoms
+from app.models.models import Course, Lecture
+
+CHUNKS = [b"A" * 300, b"B" * 500]
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _moov(offsets: list[int], duration_ms: int) -> bytes:
+    mvhd = _box(b"mvhd", struct.pack(">IIIII", 0, 0, 0, 1000, duration_ms) + bytes(80))
+    stco = _box(b"stco", struct.pack(f">II{len(offsets)}I", 0, len(offsets), *offsets))
+    stbl = _box(b"stbl", _box(b"stsd", bytes(8)) + stco)
+    trak = _box(b"trak", _box(b"tkhd", bytes(84)) + _box(b"mdia", _box(b"minf", stbl)))
+    return _box(b"moov", mvhd + trak)
+
+
+def _mp4(moov_last: bool, duration_ms: int = 12400) -> bytes:
+    ftyp = _box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41")
+    mdat_payload = b"".join(CHUNKS)
+    if moov_last:
+        first = len(ftyp) + 8
+        offsets = [first, first + len(CHUNKS[0])]
+        return ftyp + _box(b"mdat", mdat_payload) + _moov(offsets, duration_ms)
+    moov_size = len(_moov([0, 0], duration_ms))
+    first = len(ftyp) + moov_size + 8
+    return ftyp + _moov([first, first + len(CHUNKS[0])], duration_ms) + _box(b"mdat", mdat_payload)
+
+
+def _chunk_offsets(data: bytes) -> list[int]:
+    at = data.index(b"stco") + 4
+    _, count = struct.unpack_from(">II", data, at)
+    return list(struct.unpack_from(f">{count}I", data, at + 8))
+
+
+def test_faststart_moves_moov_first_and_patches_chunk_offsets(tmp_path):
+    path = tmp_path / "lecture.mp4"
+    path.write_bytes(_mp4(moov_last=True))
+
+    result = faststart(path)
+
+    data = path.read_bytes()
+    with path.open("rb") as fh:
+        assert [a.kind for a in top_level_atoms(fh, len(data))] == [b"ftyp", b"moov", b"mdat"]
+    assert result.relocated and result.duration_sec == 12
+    for offset, chunk in zip(_chunk_offsets(data), CHUNKS):
+        assert data[offset : offset + len(chunk)] == chunk
+    assert not list(tmp_path.glob(".*"))
+
+
+def test_faststart_leaves_optimized_files_alone(tmp_path):
+    path = tmp_path / "lecture.mp4"
+    original = _mp4(moov_last=False)
+    path.write_bytes(original)
+
+    result = faststart(path)
+    assert not result.relocated and result.duration_sec == 12
+    assert path.read_bytes() == original
+
+
+def _corrupt_stco_count(data: bytes) -> bytes:
+    at = data.index(b"stco") + 8
+    return data[:at] + struct.pack(">I", 0xFFFFFFFF) + data[at + 4 :]
+
+
+def test_corrupt_atoms_raise_mp4_error(tmp_path):
+    path = tmp_path / "lecture.mp4"
+    path.write_bytes(_corrupt_stco_count(_mp4(moov_last=True)))
+    with pytest.raises(MP4Error):
+        faststart(path)
+
+    # An mvhd too short for its fields: struct errors surface as MP4Error too.
+    ftyp = _box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41")
+    path.write_bytes(ftyp + _box(b"mdat", CHUNKS[0]) + _box(b"moov", _box(b"mvhd", bytes(4))))
+    with pytest.raises(MP4Error):
+        faststart(path)
+    assert not list(tmp_path.glob(".*"))
+
+
+def test_upload_rewrites_video_and_fills_duration(client, db_session, admin_login):
+    org_id, headers = admin_login("faststart")
+    course = Course(level="beginner", title="Faststart", organization_id=org_id)
+    db_session.add(course)
+    db_session.flush()
+    lecture = Lecture(course_id=course.id, title="Tail moov", duration_sec=0)
+    db_session.add(lecture)
+    db_session.commit()
+
+    r = client.post(
+        f"/admin/lectures/{lecture.id}/upload", headers=headers, files={"video": ("clip.mp4", _mp4(moov_last=True, duration_ms=95000))}
+    )
+    assert r.status_code == 200
+    assert r.json()["faststart"] is True
+    assert r.json()["duration_sec"] == 95
+    db_session.refresh(lecture)
+    assert lecture.duration_sec == 95
+
+
+def test_corrupt_upload_is_stored_without_relocation(client, db_session, admin_login):
+    org_id, headers = admin_login("faststart-corrupt")
+    course = Course(level="beginner", title="Corrupt", organization_id=org_id)
+    db_session.add(course)
+    db_session.flush()
+    lecture = Lecture(course_id=course.id, title="Bad stco", duration_sec=0)
+    db_session.add(lecture)
+    db_session.commit()
+
+    video = _corrupt_stco_count(_mp4(moov_last=True))
+    r = client.post(f"/admin/lectures/{lecture.id}/upload", headers=headers, files={"video": ("clip.mp4", video)})
+    assert r.status_code == 200
+    assert r.json()["faststart"] is False
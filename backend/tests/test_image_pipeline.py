@@ -0,0 +1,100 @@
+import random
+
+import pytest
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+from app.ai import presets
+from app.ai.encoding import derivative_path, save_output
+from app.services.ai_service import (
+    PIPELINES,
+    WorkingImage,
+    load_working_image,
+    prepare_batch,
+    run_batch_preset,
+    transform_image,
+)
+
+
+def _reference(img: Image.Image, preset: str) -> Image.Image:
+    """The original full-resolution implementation, kept as the equivalence oracle."""
+    if preset == "pencil_sketch_outline":
+        gray = ImageOps.grayscale(img)
+        inv = ImageOps.invert(gray)
+        blur = inv.filter(ImageFilter.GaussianBlur(radius=8))
+        return Image.blend(gray, ImageOps.invert(blur), alpha=0.6)
+    if preset == "charcoal_shading":
+        gray = ImageOps.grayscale(img).filter(ImageFilter.EDGE_ENHANCE_MORE)
+        return ImageEnhance.Contrast(gray).enhance(2.5)
+    if preset == "watercolor_wash_reference":
+        out = img.filter(ImageFilter.SMOOTH_MORE).filter(ImageFilter.GaussianBlur(radius=1.8))
+        return ImageEnhance.Color(out).enhance(1.35)
+    if preset == "simplified_shapes_block_in":
+        return img.quantize(colors=12, method=Image.FASTOCTREE).convert("RGB").filter(ImageFilter.SMOOTH)
+    gray = ImageOps.grayscale(img)
+    return gray.point(lambda p: 0 if p < 51 else 64 if p < 102 else 128 if p < 153 else 192 if p < 204 else 255)
+
+
+def _photo(width: int, height: int, seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.frombytes("RGB", (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * 3)))
+    return Image.blend(img, noise, 0.35)
+
+
+def test_every_preset_has_a_pipeline():
+    assert set(presets.PRESETS) == set(PIPELINES)
+
+
+@pytest.mark.parametrize("preset", sorted(PIPELINES))
+@pytest.mark.parametrize("seed", [1, 2])
+def test_pipelines_are_pixel_identical_to_the_reference(preset, seed):
+    img = _photo(160, 120, seed)
+    assert PIPELINES[preset](WorkingImage(img)).tobytes() == _reference(img, preset).tobytes()
+
+
+def test_large_jpeg_is_decoded_at_the_working_size(tmp_path):
+    src = tmp_path / "photo.jpg"
+    _photo(3000, 2000, 3).save(src, quality=90)
+
+    working = load_working_image(str(src), 512)
+    assert max(working.size) == 512 and working.size == (512, 341)
+    assert load_working_image(str(src), 0).size == (3000, 2000)
+
+    out = tmp_path / "out.png"
+    transform_image(str(src), str(out), "value_map", max_side=512)
+    with Image.open(out) as result:
+        # value_map's five tones are stored as a palette PNG.
+        assert result.size == working.size and result.mode == "P"
+        assert len(result.getcolors()) == 5
+
+
+def test_batch_renders_match_single_transforms(tmp_path):
+    src = tmp_path / "photo.jpg"
+    _photo(300, 200, 4).save(src, quality=90)
+    work = tmp_path / "work"
+    work.mkdir()
+
+    size = prepare_batch(str(src), str(work), True)
+    for preset in sorted(PIPELINES):
+        single, batched = tmp_path / f"{preset}.png", tmp_path / f"{preset}-batch.png"
+        transform_image(str(src), str(single), preset)
+        run_batch_preset(str(work), size, str(batched), preset)
+        with Image.open(single) as a, Image.open(batched) as b:
+            assert a.tobytes() == b.tobytes()
+
+
+def test_outputs_are_encoded_with_bounded_derivatives(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.ai_thumbnail_px", 64)
+    monkeypatch.setattr("app.core.config.settings.ai_preview_px", 200)
+    img = PIPELINES["simplified_shapes_block_in"](WorkingImage(_photo(300, 200, 5)))
+
+    webp = str(tmp_path / "out.webp")
+    written = save_output(img, webp, "simplified_shapes_block_in")
+    assert written == [webp, derivative_path(webp, "thumbnail"), derivative_path(webp, "preview")]
+    sizes = [Image.open(path).size for path in written]
+    assert sizes == [(300, 200), (64, 43), (200, 133)]
+
+    png = str(tmp_path / "out.png")
+    save_output(img, png, "simplified_shapes_block_in")
+    with Image.open(png) as palette:
+        assert palette.mode == "P" and palette.size == (300, 200)
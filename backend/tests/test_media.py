@@ -0,0 +1,341 @@
+import asyncio
+import gzip
+
+import pytest
+
+from app.media.signed_video import bucketed_expiry, generate_video_token, safe_verify
+from app.media.streaming import ZEROCOPY_EXTENSION, VideoFileResponse
+from app.models.models import Course, Enrollment, Lecture
+from app.storage.provider import storage_provider
+
+VIDEO = bytes(range(256)) * 64
+
+
+def _streamable_lecture(db, student_id: int) -> Lecture:
+    course = Course(level="beginner", title="Streaming")
+    db.add(course)
+    db.flush()
+    path = storage_provider.resolve("videos/stream-test.mp4")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(VIDEO)
+    lecture = Lecture(course_id=course.id, title="Stream", duration_sec=60, video_key="videos/stream-test.mp4")
+    db.add(lecture)
+    db.add(Enrollment(student_id=student_id, course_id=course.id, status="active"))
+    db.commit()
+    return lecture
+
+
+def test_stream_honours_range_and_if_range(client, db_session, student_login):
+    student_id, _ = student_login("stream")
+    lecture = _streamable_lecture(db_session, student_id)
+    url = f"/media/stream/{lecture.id}?token={generate_video_token(lecture.id, student_id)}"
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["content-disposition"].startswith("inline")
+    etag = full.headers["etag"]
+
+    part = client.get(url, headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 100-199/{len(VIDEO)}"
+    assert part.content == VIDEO[100:200]
+
+    multi = client.get(url, headers={"Range": "bytes=0-9,1000-1009"})
+    assert multi.status_code == 206
+    assert multi.headers["content-type"].startswith("multipart/byteranges")
+    assert VIDEO[1000:1010] in multi.content
+
+    assert client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == VIDEO
+
+    head = client.head(url)
+    assert head.status_code == 200 and head.headers["content-length"] == str(len(VIDEO))
+    assert client.get(url, headers={"Range": f"bytes={len(VIDEO)}-"}).status_code == 416
+
+
+def test_zero_copy_send_is_used_when_the_server_supports_it(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(VIDEO)
+    sent = []
+
+    async def send(message):
+        if message["type"] == ZEROCOPY_EXTENSION:
+            message["file"].seek(message["offset"])
+            message = {**message, "data": message["file"].read(message["count"])}
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"range", b"bytes=10-19")], "extensions": {ZEROCOPY_EXTENSION: {}}}
+    asyncio.run(VideoFileResponse(path, media_type="video/mp4")(scope, None, send))
+
+    assert sent[0]["status"] == 206
+    assert sent[1]["type"] == ZEROCOPY_EXTENSION
+    assert sent[1]["data"] == VIDEO[10:20]
+
+
+def test_stream_authorization_is_cached_until_enrollment_is_revoked(client, db_engine, db_session, student_login, admin_login):
+    from sqlalchemy import event
+
+    from app.media.stream_auth import stream_grants
+
+    org_id, admin_headers = admin_login("stream-cache")
+    student_id, _ = student_login("stream-cache")
+    lecture = _streamable_lecture(db_session, student_id)
+    course = db_session.get(Course, lecture.course_id)
+    course.organization_id = org_id
+    enrollment = db_session.query(Enrollment).filter_by(student_id=student_id, course_id=course.id).one()
+    enrollment.organization_id = org_id
+    db_session.commit()
+    url = f"/media/stream/{lecture.id}?token={generate_video_token(lecture.id, student_id)}"
+    stream_grants.clear()
+
+    assert client.get(url, headers={"Range": "bytes=0-9"}).status_code == 206
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", _record)
+    try:
+        for start in range(10, 100, 10):
+            assert client.get(url, headers={"Range": f"bytes={start}-{start + 9}"}).status_code == 206
+    finally:
+        event.remove(db_engine, "before_cursor_execute", _record)
+    assert statements == []
+
+    assert client.delete(f"/admin/enrollments/{enrollment.id}", headers=admin_headers).status_code == 200
+    assert client.get(url, headers={"Range": "bytes=0-9"}).status_code == 403
+
+
+def test_video_tokens_are_bucketed_and_tamper_proof(client, db_session, student_login):
+    assert bucketed_expiry(900, now=1000) == bucketed_expiry(900, now=1100)
+    token = generate_video_token(7, 42)
+    assert token == generate_video_token(7, 42)
+    assert safe_verify(token, 7)["user_id"] == 42
+    assert safe_verify(token, 8) is None
+    user_id, exp, sig = token.split(".")
+    assert safe_verify(f"43.{exp}.{sig}", 7) is None
+    assert safe_verify(f"{user_id}.{int(exp) + 300}.{sig}", 7) is None
+
+    student_id, _ = student_login("stream-path")
+    lecture = _streamable_lecture(db_session, student_id)
+    r = client.get(f"/media/stream/{lecture.id}/{generate_video_token(lecture.id, student_id)}", headers={"Range": "bytes=0-9"})
+    assert r.status_code == 206 and r.content == VIDEO[:10]
+    assert r.headers["cache-control"].startswith("public, max-age=")
+
+
+def test_hls_playlist_and_segments_are_served_under_a_path_token(client, db_session, student_login):
+    from app.media.hls import master_playlist
+
+    student_id, headers = student_login("hls")
+    lecture = _streamable_lecture(db_session, student_id)
+    hls_dir = storage_provider.resolve(f"hls/{lecture.id}/ready")
+    (hls_dir / "360p").mkdir(parents=True, exist_ok=True)
+    (hls_dir / "master.m3u8").write_text(master_playlist([(360, 800)]))
+    (hls_dir / "360p" / "index.m3u8").write_text("#EXTM3U\n#EXT-X-MAP:URI=\"init.mp4\"\nseg_00000.m4s\n")
+    (hls_dir / "360p" / "seg_00000.m4s").write_bytes(VIDEO[:512])
+    lecture.hls_status, lecture.hls_key, lecture.hls_renditions = "ready", f"hls/{lecture.id}/ready", "360p"
+    db_session.commit()
+
+    play = client.get(f"/lectures/{lecture.id}/play", headers=headers).json()
+    assert play["signed_url"].endswith("/master.m3u8")
+    base = play["signed_url"].split("://", 1)[1].split("/", 1)[1].rsplit("/", 1)[0]
+
+    master = client.get(f"/{base}/master.m3u8")
+    assert master.headers["content-type"] == "application/vnd.apple.mpegurl"
+    assert "360p/index.m3u8" in master.text
+    assert client.get(f"/{base}/360p/seg_00000.m4s").content == VIDEO[:512]
+    assert client.get(f"/{base}/360p/%2E%2E/%2E%2E/%2E%2E/master.m3u8").status_code == 400
+    bad = base.rsplit("/", 1)[0] + "/1.1.forged"
+    assert client.get(f"/{bad}/master.m3u8").status_code == 403
+
+
+def test_failed_packaging_is_recorded_on_the_lecture(db_session, student_login, monkeypatch):
+    from app.core.config import settings
+    from app.services.hls_service import process_lecture_hls
+
+    student_id, _ = student_login("hls-fail")
+    lecture = _streamable_lecture(db_session, student_id)
+    monkeypatch.setattr(settings, "ffmpeg_binary", "/nonexistent/ffmpeg")
+
+    assert process_lecture_hls(lecture.id) == "failed"
+    db_session.refresh(lecture)
+    assert lecture.hls_status == "failed"
+    assert not list(storage_provider.resolve(f"hls/{lecture.id}").glob("*"))
+
+
+def test_a_failed_publish_still_settles_the_lecture(db_session, student_login, monkeypatch):
+    from app.services import hls_service
+
+    def fake_package(source, target, renditions, segment_sec):
+        (target / "360p").mkdir(parents=True)
+        (target / "master.m3u8").write_text("#EXTM3U\n")
+        return ["360p"]
+
+    def failing_put_tree(prefix, src):
+        storage_provider.resolve(f"{prefix}/master.m3u8").parent.mkdir(parents=True, exist_ok=True)
+        storage_provider.resolve(f"{prefix}/master.m3u8").write_text("#EXTM3U\n")
+        raise RuntimeError("object store unavailable")
+
+    student_id, _ = student_login("hls-publish")
+    lecture = _streamable_lecture(db_session, student_id)
+    monkeypatch.setattr(hls_service, "package_hls", fake_package)
+    monkeypatch.setattr(storage_provider, "put_tree", failing_put_tree)
+
+    assert hls_service.process_lecture_hls(lecture.id) == "failed"
+    db_session.refresh(lecture)
+    assert lecture.hls_status == "failed" and lecture.hls_key is None
+    assert not list(storage_provider.resolve(f"hls/{lecture.id}").glob("*"))
+
+
+def test_sweep_requeues_pending_and_fails_interrupted_packaging(db_session, student_login, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+
+    from app.core.config import settings
+    from app.services import hls_service
+
+    student_id, _ = student_login("hls-sweep")
+    old = datetime.now(timezone.utc) - timedelta(hours=5)
+    lost, interrupted, fresh = (_streamable_lecture(db_session, student_id) for _ in range(3))
+    for lecture, status, at in ((lost, "pending", old), (interrupted, "processing", old), (fresh, "pending", datetime.now(timezone.utc))):
+        lecture.hls_status, lecture.hls_updated_at = status, at
+    db_session.commit()
+    monkeypatch.setattr(settings, "hls_enabled", True)
+    queued = []
+    monkeypatch.setattr(hls_service.hls_pool, "start", lambda fn, *args: queued.append(args) or hls_service.Future())
+
+    assert hls_service.resume_stale_hls(max_age_sec=3600) >= 2
+    assert (lost.id,) in queued and (fresh.id,) not in queued and (interrupted.id,) not in queued
+    db_session.expire_all()
+    assert [db_session.get(Lecture, x.id).hls_status for x in (lost, interrupted, fresh)] == ["pending", "failed", "pending"]
+
+    # Already queued here: a second sweep leaves it alone even once it looks stale.
+    assert hls_service.resume_stale_hls(max_age_sec=-1) >= 0
+    assert queued.count((lost.id,)) == 1
+
+
+def test_packaging_runs_on_the_hls_pool_and_a_full_queue_fails_fast(client, db_session, admin_login, monkeypatch):
+    from app.core.config import settings
+    from app.services import hls_service
+
+    org_id, headers = admin_login("hls-queue")
+    course = Course(level="beginner", title="HLS queue", organization_id=org_id)
+    db_session.add(course)
+    db_session.flush()
+    lecture = Lecture(course_id=course.id, title="Queued", duration_sec=60)
+    db_session.add(lecture)
+    db_session.commit()
+    monkeypatch.setattr(settings, "hls_enabled", True)
+    queued = []
+    monkeypatch.setattr(hls_service.hls_pool, "start", lambda fn, *args: queued.append(args) or hls_service.Future())
+
+    r = client.post(f"/admin/lectures/{lecture.id}/upload", headers=headers, files={"video": ("a.mp4", VIDEO)})
+    assert r.status_code == 200 and queued == [(lecture.id,)]
+    db_session.refresh(lecture)
+    assert lecture.hls_status == "pending"
+
+    monkeypatch.undo()
+    monkeypatch.setattr(settings, "hls_enabled", True)
+    monkeypatch.setattr(hls_service.hls_pool, "max_pending", 0)
+    r = client.post(f"/admin/lectures/{lecture.id}/upload", headers=headers, files={"video": ("b.mp4", VIDEO)})
+    assert r.status_code == 200
+    db_session.refresh(lecture)
+    assert lecture.hls_status == "failed"
+
+
+def test_hls_trees_go_with_their_video(client, db_session, admin_login):
+    org_id, headers = admin_login("hls-cleanup")
+    course = Course(level="beginner", title="HLS cleanup", organization_id=org_id)
+    db_session.add(course)
+    db_session.flush()
+    lectures = [Lecture(course_id=course.id, title=f"Packaged {n}", duration_sec=60) for n in range(3)]
+    db_session.add_all(lectures)
+    db_session.flush()
+    for lecture in lectures:
+        lecture.hls_status, lecture.hls_key, lecture.hls_renditions = "ready", f"hls/{lecture.id}/old", "360p"
+        storage_provider.resolve(f"hls/{lecture.id}/old/master.m3u8").parent.mkdir(parents=True, exist_ok=True)
+        storage_provider.resolve(f"hls/{lecture.id}/old/master.m3u8").write_text("#EXTM3U\n")
+    db_session.commit()
+    reuploaded, deleted, in_course = lectures
+    deleted_id, in_course_id = deleted.id, in_course.id
+
+    r = client.post(f"/admin/lectures/{reuploaded.id}/upload", headers=headers, files={"video": ("a.mp4", VIDEO)})
+    assert r.status_code == 200
+    db_session.refresh(reuploaded)
+    assert reuploaded.hls_key is None and reuploaded.hls_status is None
+    assert not storage_provider.resolve(f"hls/{reuploaded.id}/old").exists()
+
+    assert client.delete(f"/admin/courses/{course.id}/lectures/{deleted_id}", headers=headers).status_code == 200
+    assert not storage_provider.resolve(f"hls/{deleted_id}").exists()
+    assert client.delete(f"/admin/courses/{course.id}", headers=headers).status_code == 200
+    assert not storage_provider.resolve(f"hls/{in_course_id}").exists()
+
+
+def test_lecture_video_blobs_are_only_served_through_stream(client, db_session, admin_login, student_login):
+    org_id, headers = admin_login("blob-video")
+    course = Course(level="beginner", title="Private video", organization_id=org_id)
+    db_session.add(course)
+    db_session.flush()
+    lecture = Lecture(course_id=course.id, title="Private", duration_sec=60)
+    db_session.add(lecture)
+    db_session.commit()
+    payload = VIDEO + b"private"
+    video_key = client.post(f"/admin/lectures/{lecture.id}/upload", headers=headers, files={"video": ("a.mp4", payload)}).json()["video_key"]
+
+    assert client.get(f"/media/file/{video_key}").status_code == 404
+    assert client.head(f"/media/file/{video_key}").status_code == 404
+
+    student_id, _ = student_login("blob-video")
+    db_session.add(Enrollment(student_id=student_id, course_id=course.id, status="active"))
+    db_session.commit()
+    r = client.get(f"/media/stream/{lecture.id}?token={generate_video_token(lecture.id, student_id)}")
+    assert r.status_code == 200 and r.content == payload
+
+
+def test_served_files_revalidate_with_304(client):
+    blob_key = "blobs/ab/cd/" + "abcd" * 16 + ".png"
+    for key in (blob_key, "ai/output/revalidate.png"):
+        path = storage_provider.resolve(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(VIDEO)
+
+    blob = client.get(f"/media/file/{blob_key}")
+    assert blob.headers["etag"] == '"' + "abcd" * 16 + '"'
+    assert blob.headers["cache-control"] == "public, max-age=31536000, immutable"
+    again = client.get(f"/media/file/{blob_key}", headers={"If-None-Match": f'W/"x", {blob.headers["etag"]}'})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == blob.headers["etag"] and "content-length" not in again.headers
+
+    other = client.get("/media/file/ai/output/revalidate.png")
+    assert other.headers["cache-control"] == "no-cache"
+    since = client.get("/media/file/ai/output/revalidate.png", headers={"If-Modified-Since": other.headers["last-modified"]})
+    assert since.status_code == 304
+    stale = client.get("/media/file/ai/output/revalidate.png", headers={"If-None-Match": '"other"'})
+    assert stale.status_code == 200 and stale.content == VIDEO
+
+
+def test_precompressed_variant_is_served_when_accepted(client):
+    path = storage_provider.resolve("docs/notes.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'{"notes": []}')
+    path.with_name("notes.json.gz").write_bytes(gzip.compress(b'{"notes": []}'))
+
+    plain = client.get("/media/file/docs/notes.json", headers={"Accept-Encoding": "br;q=0, identity"})
+    assert "content-encoding" not in plain.headers and plain.headers["vary"] == "Accept-Encoding"
+    packed = client.get("/media/file/docs/notes.json", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert packed.headers["content-encoding"] == "gzip"
+    assert packed.headers["content-type"] == "application/json"
+    assert packed.json() == {"notes": []}
+    assert packed.headers["etag"] != plain.headers["etag"]
+
+
+def test_file_paths_cannot_escape_the_storage_root(client):
+    for path in ("/media/file//etc/passwd", "/media/file/%2Fetc/passwd", "/media/file/blobs//incoming/x"):
+        assert client.get(path).status_code in (400, 404)
+    assert client.get("/media/file//etc/passwd").status_code == 400
+
+    with pytest.raises(FileNotFoundError):
+        storage_provider.backend.path("/etc/passwd")
+    with pytest.raises(FileNotFoundError):
+        storage_provider.backend.path("lectures/../../etc/passwd")
@@ -0,0 +1,31 @@
+from passlib.context import CryptContext
+
+from app.core.security import password_pool, pwd_context, verify_and_update_password
+
+
+def test_outdated_bcrypt_cost_is_rehashed():
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("Password@123")
+    valid, new_hash = verify_and_update_password("Password@123", old_hash)
+    assert valid
+    assert new_hash and pwd_context.verify("Password@123", new_hash)
+    assert verify_and_update_password("Password@123", new_hash) == (True, None)
+
+
+def test_password_routes_return_503_when_hash_pool_is_saturated(client, monkeypatch):
+    signup = {
+        "full_name": "Busy",
+        "email": "busy@example.com",
+        "phone": "7000000201",
+        "grade_or_standard": "8",
+        "password": "Password@123",
+    }
+    assert client.post("/auth/signup", json=signup).status_code == 200
+
+    monkeypatch.setattr(password_pool, "max_pending", 0)
+    r = client.post("/auth/login", json={"email": "busy@example.com", "password": "Password@123"})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+
+    r = client.post("/auth/signup", json={**signup, "email": "busy2@example.com", "phone": "7000000202"})
+    assert r.status_code == 503
+    assert password_pool.pending == 0
@@ -0,0 +1,79 @@
+import base64
+import hashlib
+import os
+import time
+
+from app.models.models import Course, Lecture, StoredBlob
+from app.storage.provider import storage_provider
+from app.storage.resumable import resumable_uploads
+
+PATCH = {"Content-Type": "application/offset+octet-stream"}
+
+
+def _lecture(db, org_id: int) -> Lecture:
+    course = Course(level="beginner", title="Resumable", organization_id=org_id)
+    db.add(course)
+    db.flush()
+    lecture = Lecture(course_id=course.id, title="Chunked", duration_sec=60)
+    db.add(lecture)
+    db.commit()
+    return lecture
+
+
+def _create(client, headers, lecture_id: int, length: int) -> str:
+    meta = "filename " + base64.b64encode(b"lesson.mp4").decode()
+    r = client.post(
+        f"/admin/lectures/{lecture_id}/uploads",
+        headers={**headers, "Upload-Length": str(length), "Upload-Metadata": meta},
+    )
+    assert r.status_code == 201
+    assert r.headers["location"] == f"/admin/uploads/{r.json()['upload_id']}"
+    return r.json()["upload_id"]
+
+
+def test_resumable_upload_resumes_and_finalizes(client, db_session, admin_login):
+    org_id, headers = admin_login("resumable")
+    lecture = _lecture(db_session, org_id)
+    payload = os.urandom(300_000)
+    upload_id = _create(client, headers, lecture.id, len(payload))
+    url = f"/admin/uploads/{upload_id}"
+
+    r = client.patch(url, headers={**headers, **PATCH, "Upload-Offset": "0"}, content=payload[:100_000])
+    assert r.status_code == 204 and r.headers["upload-offset"] == "100000"
+
+    # A client that lost track of the offset is refused and asks again.
+    r = client.patch(url, headers={**headers, **PATCH, "Upload-Offset": "0"}, content=payload[:10])
+    assert r.status_code == 409
+    assert client.head(url, headers=headers).headers["upload-offset"] == "100000"
+
+    assert client.post(f"{url}/finalize", headers=headers).status_code == 409
+
+    r = client.patch(url, headers={**headers, **PATCH, "Upload-Offset": "100000"}, content=payload[100_000:])
+    assert r.headers["upload-offset"] == str(len(payload))
+
+    r = client.post(f"{url}/finalize", headers=headers)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["sha256"] == hashlib.sha256(payload).hexdigest() and body["video_key"].endswith(".mp4")
+    db_session.expire_all()
+    assert db_session.get(Lecture, lecture.id).video_key == body["video_key"]
+    assert db_session.get(StoredBlob, body["video_key"]).refcount == 1
+    assert storage_provider.resolve(body["video_key"]).read_bytes() == payload
+
+    assert client.post(f"{url}/finalize", headers=headers).status_code == 404
+    assert client.head(url, headers=headers).status_code == 404
+
+
+def test_resumable_upload_scoped_and_expired(client, db_session, admin_login):
+    org_id, headers = admin_login("resumable-owner")
+    _, other_headers = admin_login("resumable-other")
+    lecture = _lecture(db_session, org_id)
+    upload_id = _create(client, headers, lecture.id, 10)
+
+    assert client.head(f"/admin/uploads/{upload_id}", headers=other_headers).status_code == 404
+    assert client.get(f"/media/file/resumable/{upload_id}/data").status_code == 404
+
+    stale = time.time() - resumable_uploads.ttl_sec - 1
+    os.utime(resumable_uploads.root / upload_id / "data", (stale, stale))
+    assert resumable_uploads.expire() == 1
+    assert not (resumable_uploads.root / upload_id).exists()
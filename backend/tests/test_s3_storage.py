@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import time
+
+import pytest
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+from app.core.config import settings
+from app.models.models import StoredBlob
+from app.services.blob_service import collect_garbage
+from app.storage.backends import S3Backend
+from app.storage.provider import StagedUpload, storage_provider
+
+MIB = 1024 * 1024
+
+
+@pytest.fixture()
+def s3(monkeypatch):
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="udaan-test")
+        monkeypatch.setattr(settings, "s3_multipart_threshold_mb", 5)
+        monkeypatch.setattr(settings, "s3_multipart_chunk_mb", 5)
+        backend = S3Backend("udaan-test", prefix="media", client=client)
+        monkeypatch.setattr(storage_provider, "backend", backend)
+        yield backend
+
+
+def _stage(payload: bytes, ext: str = ".mp4") -> StagedUpload:
+    path = storage_provider.scratch_path(".part")
+    path.write_bytes(payload)
+    return StagedUpload(path=path, ext=ext, size=len(payload), sha256=hashlib.sha256(payload).hexdigest())
+
+
+def test_commit_uploads_multipart_and_dedupes(s3):
+    payload = bytes(range(256)) * (11 * MIB // 256)
+    first = asyncio.run(storage_provider.commit(_stage(payload)))
+    staged = _stage(payload)
+    second = asyncio.run(storage_provider.commit(staged))
+
+    assert first.key == second.key and not staged.path.exists()
+    head = s3.client.head_object(Bucket="udaan-test", Key=f"media/{first.key}")
+    assert head["ContentLength"] == len(payload)
+    assert head["ETag"].strip('"').endswith("-3")  # three 5 MiB parts
+    assert b"".join(s3.read_range(first.key, MIB, MIB + 10)) == payload[MIB : MIB + 10]
+
+
+def test_serve_file_ranges_from_s3(client, s3):
+    payload = b"0123456789" * 1000
+    s3.client.put_object(Bucket="udaan-test", Key="media/ai/output/sample.png", Body=payload)
+
+    r = client.get("/media/file/ai/output/sample.png", headers={"Range": "bytes=100-199"})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == f"bytes 100-199/{len(payload)}"
+    assert r.headers["content-type"] == "image/png"
+    assert r.content == payload[100:200]
+
+    assert client.get("/media/file/ai/output/missing.png").status_code == 404
+
+
+def test_garbage_collection_deletes_remote_blobs(db_session, s3):
+    dead_key = "blobs/aa/bb/" + "a" * 64 + ".bin"
+    orphan_key = "blobs/cc/dd/" + "c" * 64 + ".bin"
+    for key in (dead_key, orphan_key):
+        s3.client.put_object(Bucket="udaan-test", Key=f"media/{key}", Body=b"x")
+    db_session.add(StoredBlob(key=dead_key, sha256="a" * 64, size=1, refcount=0))
+    db_session.commit()
+
+    assert collect_garbage(db_session, grace_sec=-1) == (1, 1)
+    assert list(s3.list("blobs/")) == []
+
+
+def test_dedup_hit_refreshes_remote_mtime(s3):
+    payload = b"shared bytes" * 100
+    key = asyncio.run(storage_provider.commit(_stage(payload))).key
+    s3.client.copy_object(
+        Bucket="udaan-test",
+        Key=f"media/{key}",
+        CopySource={"Bucket": "udaan-test", "Key": f"media/{key}"},
+        MetadataDirective="REPLACE",
+        ContentType="video/mp4",
+        Metadata={"origin": "upload"},
+    )
+    before = s3.stat(key).mtime
+    time.sleep(1.1)  # LastModified has one-second resolution
+
+    assert asyncio.run(storage_provider.commit(_stage(payload))).key == key
+    head = s3.client.head_object(Bucket="udaan-test", Key=f"media/{key}")
+    assert head["LastModified"].timestamp() > before
+    assert head["ContentType"] == "video/mp4" and head["Metadata"] == {"origin": "upload"}
+    assert b"".join(s3.read_range(key, 0, len(payload))) == payload
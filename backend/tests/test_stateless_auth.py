@@ -0,0 +1,63 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import User
+from app.services.activity_service import activity_buffer
+from app.utils.deps import forget_principal, principal_cache
+
+
+def test_stateless_auth_defers_last_active_write(client, db_engine, monkeypatch):
+    monkeypatch.setattr(settings, "stateless_auth", True)
+    principal_cache.clear()
+    signup_payload = {
+        "full_name": "Student Stateless",
+        "email": "stateless@example.com",
+        "phone": "7000000101",
+        "grade_or_standard": "8",
+        "password": "Password@123",
+    }
+    client.post("/auth/signup", json=signup_payload)
+    login = client.post("/auth/login", json={"email": signup_payload["email"], "password": signup_payload["password"]})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    with Session(db_engine) as db:
+        before = db.scalar(select(User.last_active_at).where(User.email == signup_payload["email"]))
+
+    for _ in range(3):
+        assert client.get("/me", headers=headers).status_code == 200
+    assert activity_buffer.pending() == 1
+
+    with Session(db_engine) as db:
+        assert db.scalar(select(User.last_active_at).where(User.email == signup_payload["email"])) == before
+
+    assert activity_buffer.flush() == 1
+    with Session(db_engine) as db:
+        assert db.scalar(select(User.last_active_at).where(User.email == signup_payload["email"])) > before
+
+
+def test_deactivated_user_is_dropped_from_the_principal_cache(client, db_engine, monkeypatch):
+    monkeypatch.setattr(settings, "stateless_auth", True)
+    principal_cache.clear()
+    signup_payload = {
+        "full_name": "Student Deactivated",
+        "email": "deactivated@example.com",
+        "phone": "7000000102",
+        "grade_or_standard": "8",
+        "password": "Password@123",
+    }
+    client.post("/auth/signup", json=signup_payload)
+    login = client.post("/auth/login", json={"email": signup_payload["email"], "password": signup_payload["password"]})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/me", headers=headers).status_code == 200
+
+    with Session(db_engine) as db:
+        user = db.scalar(select(User).where(User.email == signup_payload["email"]))
+        user.is_active = False
+        db.commit()
+        user_id = user.id
+    # Still served from the cache until the change is announced.
+    assert client.get("/me", headers=headers).status_code == 200
+
+    forget_principal(user_id)
+    assert client.get("/me", headers=headers).status_code == 403
@@ -0,0 +1,73 @@
+import hashlib
+
+from app.core.config import settings
+from app.models.models import Course, Lecture
+from app.storage.provider import CHUNK_SIZE, storage_provider
+
+
+def _lecture(db, org_id: int) -> Lecture:
+    course = Course(level="beginner", title="Uploads", organization_id=org_id)
+    db.add(course)
+    db.flush()
+    lecture = Lecture(course_id=course.id, title="Upload me", duration_sec=60)
+    db.add(lecture)
+    db.commit()
+    return lecture
+
+
+def test_lecture_upload_streams_to_disk_with_digest(client, db_session, admin_login):
+    org_id, headers = admin_login("upload")
+    lecture = _lecture(db_session, org_id)
+    payload = b"\x00\x01video" * (CHUNK_SIZE // 4)
+
+    r = client.post(f"/admin/lectures/{lecture.id}/upload", headers=headers, files={"video": ("clip.mp4", payload)})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["size"] == len(payload)
+    assert body["sha256"] == hashlib.sha256(payload).hexdigest()
+    assert storage_provider.resolve(body["video_key"]).read_bytes() == payload
+
+
+def test_oversized_upload_is_rejected_and_cleaned_up(client, db_session, admin_login, monkeypatch):
+    org_id, headers = admin_login("upload-big")
+    lecture = _lecture(db_session, org_id)
+    monkeypatch.setattr(settings, "max_upload_bytes", 1024)
+    before = set(storage_provider.root.rglob("*"))
+
+    r = client.post(f"/admin/lectures/{lecture.id}/upload", headers=headers, files={"video": ("clip.mp4", b"x" * 4096)})
+    assert r.status_code == 413
+    assert set(storage_provider.root.rglob("*")) == before
+
+
+def test_identical_uploads_share_one_refcounted_blob(client, db_session, admin_login):
+    from app.models.models import StoredBlob
+    from app.services.blob_service import collect_garbage, recount_blob_refs
+
+    org_id, headers = admin_login("dedupe")
+    first, second = _lecture(db_session, org_id), _lecture(db_session, org_id)
+    payload = b"same lecture bytes" * 1000
+
+    keys = [
+        client.post(f"/admin/lectures/{lecture.id}/upload", headers=headers, files={"video": ("a.mp4", payload)}).json()["video_key"]
+        for lecture in (first, second)
+    ]
+    assert keys[0] == keys[1]
+    assert keys[0].startswith("blobs/") and keys[0].count("/") == 3
+    blob = db_session.get(StoredBlob, keys[0])
+    assert blob.refcount == 2 and blob.sha256 == hashlib.sha256(payload).hexdigest()
+
+    for lecture in (first, second):
+        client.delete(f"/admin/courses/{lecture.course_id}/lectures/{lecture.id}", headers=headers)
+    db_session.expire_all()
+    assert db_session.get(StoredBlob, keys[0]).refcount == 0
+    assert recount_blob_refs(db_session) == 0
+
+    stray = storage_provider.resolve("blobs/00/00/" + "0" * 64 + ".bin")
+    stray.parent.mkdir(parents=True, exist_ok=True)
+    stray.write_bytes(b"orphan")
+    # The storage tree is shared with other tests: only check this test's keys.
+    blobs_deleted, orphans = collect_garbage(db_session, grace_sec=-1)
+    assert blobs_deleted >= 1 and orphans >= 1
+    db_session.expire_all()
+    assert db_session.get(StoredBlob, keys[0]) is None
+    assert not storage_provider.resolve(keys[0]).exists() and not stray.exists()
@@ -42,7 +42,13 @@ $DOMAIN {
 }
 
 $API_DOMAIN {
-  reverse_proxy localhost:8000
+  @media path /media/stream/* /media/hls/*
+  handle @media {
+    reverse_proxy localhost:8080
+  }
+  handle {
+    reverse_proxy localhost:8000
+  }
 }
 EOF
 
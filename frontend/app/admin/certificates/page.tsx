@@ -1,16 +1,28 @@
 'use client';
 
 import { useEffect, useState } from 'react';
-import { api } from '@/lib/api';
+import { api, Page, pagePath } from '@/lib/api';
 import { authHeader } from '@/lib/auth';
 
 export default function AdminCertificates() {
   const [rows, setRows] = useState<any[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
 
   useEffect(() => {
-    api('/admin/certificates').then(setRows).catch(() => setRows([]));
+    api('/admin/certificates')
+      .then((page: Page<any>) => {
+        setRows(page.items);
+        setCursor(page.next_cursor);
+      })
+      .catch(() => setRows([]));
   }, []);
 
+  const loadMore = async () => {
+    const page: Page<any> = await api(pagePath('/admin/certificates', cursor));
+    setRows((prev) => [...prev, ...page.items]);
+    setCursor(page.next_cursor);
+  };
+
   const download = async (id: number) => {
     const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/admin/certificates/${id}/download`, {
       headers: { ...authHeader() },
@@ -31,7 +43,7 @@ export default function AdminCertificates() {
         <div className="label">Admin Studio</div>
         <div className="mt-2 text-2xl font-semibold">Certificates</div>
         <div className="mt-4 flex items-center gap-3">
-          <div className="chip">{rows.length} issued</div>
+          <div className="chip">{rows.length}{cursor ? '+' : ''} issued</div>
           <div className="text-xs text-slate-500">Download and share student completions.</div>
         </div>
       </div>
@@ -50,6 +62,7 @@ export default function AdminCertificates() {
         {rows.length === 0 && (
           <div className="list-card text-sm text-slate-600">No certificates issued yet.</div>
         )}
+        {cursor && <button className="btn-ghost" onClick={loadMore}>Load more</button>}
       </div>
     </div>
   );
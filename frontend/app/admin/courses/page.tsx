@@ -2,16 +2,29 @@
 
 import Link from 'next/link';
 import { FormEvent, useEffect, useState } from 'react';
-import { api } from '@/lib/api';
+import { api, Page, pagePath } from '@/lib/api';
 
 export default function AdminCourses() {
   const [courses, setCourses] = useState<any[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [title, setTitle] = useState('');
   const [level, setLevel] = useState('');
   const [description, setDescription] = useState('');
   const [price, setPrice] = useState(0);
 
-  const load = () => api('/admin/courses').then(setCourses).catch(() => setCourses([]));
+  const load = () =>
+    api('/admin/courses')
+      .then((page: Page<any>) => {
+        setCourses(page.items);
+        setCursor(page.next_cursor);
+      })
+      .catch(() => setCourses([]));
+
+  const loadMore = async () => {
+    const page: Page<any> = await api(pagePath('/admin/courses', cursor));
+    setCourses((prev) => [...prev, ...page.items]);
+    setCursor(page.next_cursor);
+  };
 
   useEffect(() => {
     load();
@@ -49,7 +62,7 @@ export default function AdminCourses() {
             <div className="label">Library</div>
             <div className="text-xl font-semibold">Courses</div>
           </div>
-          <div className="chip">{courses.length} total</div>
+          <div className="chip">{courses.length}{cursor ? '+' : ''} shown</div>
         </div>
 
         <div className="mt-4 space-y-3">
@@ -67,6 +80,7 @@ export default function AdminCourses() {
           {courses.length === 0 && (
             <div className="list-card text-sm text-slate-600">No courses created yet.</div>
           )}
+          {cursor && <button className="btn-ghost" onClick={loadMore}>Load more</button>}
         </div>
       </div>
     </div>
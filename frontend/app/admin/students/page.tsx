@@ -2,25 +2,35 @@
 
 import Link from 'next/link';
 import { useEffect, useState } from 'react';
-import { api } from '@/lib/api';
+import { api, Page, pagePath } from '@/lib/api';
 
 export default function StudentsPage() {
   const [students, setStudents] = useState<any[]>([]);
+  const [studentsCursor, setStudentsCursor] = useState<string | null>(null);
   const [pending, setPending] = useState<any[]>([]);
+  const [pendingCursor, setPendingCursor] = useState<string | null>(null);
   const [allEnrollments, setAllEnrollments] = useState<any[]>([]);
   const [error, setError] = useState('');
 
   const load = () => {
     setError('');
-    api('/admin/students').then(setStudents).catch(() => setStudents([]));
+    api('/admin/students')
+      .then((page: Page<any>) => {
+        setStudents(page.items);
+        setStudentsCursor(page.next_cursor);
+      })
+      .catch(() => setStudents([]));
     api('/admin/enrollments?status=pending')
-      .then(setPending)
+      .then((page: Page<any>) => {
+        setPending(page.items);
+        setPendingCursor(page.next_cursor);
+      })
       .catch((e) => {
         setPending([]);
         setError(e?.message || 'Failed to load enrollment requests.');
       });
     api('/admin/enrollments')
-      .then(setAllEnrollments)
+      .then((page: Page<any>) => setAllEnrollments(page.items))
       .catch(() => setAllEnrollments([]));
   };
 
@@ -28,17 +38,32 @@ export default function StudentsPage() {
     load();
   }, []);
 
+  const loadMoreStudents = async () => {
+    const page: Page<any> = await api(pagePath('/admin/students', studentsCursor));
+    setStudents((prev) => [...prev, ...page.items]);
+    setStudentsCursor(page.next_cursor);
+  };
+
+  const loadMorePending = async () => {
+    const page: Page<any> = await api(pagePath('/admin/enrollments?status=pending', pendingCursor));
+    setPending((prev) => [...prev, ...page.items]);
+    setPendingCursor(page.next_cursor);
+  };
+
+  // Drop the handled row in place so pages loaded with "Load more" stay on screen.
+  const settle = (row: any) => setPending((prev) => prev.filter((p) => p.id !== row.id));
+
   const approve = async (row: any) => {
     await api('/admin/enrollments', {
       method: 'POST',
       body: JSON.stringify({ student_id: row.student_id, course_id: row.course_id }),
     });
-    load();
+    settle(row);
   };
 
   const reject = async (row: any) => {
     await api(`/admin/enrollments/${row.id}`, { method: 'DELETE' });
-    load();
+    settle(row);
   };
 
   return (
@@ -49,7 +74,7 @@ export default function StudentsPage() {
             <div className="label">Admin Studio</div>
             <h1 className="text-2xl font-semibold">Enrollment Requests</h1>
           </div>
-          <div className="chip">{pending.length} pending</div>
+          <div className="chip">{pending.length}{pendingCursor ? '+' : ''} pending</div>
         </div>
         {error && <p className="text-sm text-red-600">{error}</p>}
         {pending.length === 0 && <p className="text-sm text-slate-600">No pending requests.</p>}
@@ -65,6 +90,7 @@ export default function StudentsPage() {
             </div>
           </div>
         ))}
+        {pendingCursor && <button className="btn-ghost" onClick={loadMorePending}>Load more</button>}
         {pending.length === 0 && allEnrollments.length > 0 && (
           <div className="list-card text-sm text-slate-600">
             Requests exist but none are pending. Latest enrollment status:
@@ -80,7 +106,7 @@ export default function StudentsPage() {
       <section className="panel p-5 space-y-3">
         <div className="flex items-center justify-between">
           <h2 className="text-xl font-semibold">Students</h2>
-          <div className="chip">{students.length} total</div>
+          <div className="chip">{students.length}{studentsCursor ? '+' : ''} shown</div>
         </div>
         {students.map((s) => (
           <div key={s.id} className="list-card flex items-center justify-between">
@@ -92,6 +118,7 @@ export default function StudentsPage() {
           </div>
         ))}
         {students.length === 0 && <div className="list-card text-sm text-slate-600">No students yet.</div>}
+        {studentsCursor && <button className="btn-ghost" onClick={loadMoreStudents}>Load more</button>}
       </section>
     </div>
   );
@@ -13,7 +13,7 @@ const presets = [
 ];
 
 export default function AIPage() {
-  const [preset, setPreset] = useState('pencil_sketch_outline');
+  const [selected, setSelected] = useState<string[]>(['pencil_sketch_outline']);
   const [prompt, setPrompt] = useState('');
   const [history, setHistory] = useState<any[]>([]);
   const [config, setConfig] = useState<any>(null);
@@ -35,10 +35,13 @@ export default function AIPage() {
     e.preventDefault();
     const form = e.currentTarget;
     const fd = new FormData(form);
-    fd.set('preset', preset);
+    fd.delete('preset');
+    selected.forEach((p) => fd.append('preset', p));
     fd.set('prompt', prompt);
 
-    const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/ai/transform`, {
+    // Several presets go through the batch endpoint: one upload, one decode, one charge.
+    const path = selected.length > 1 ? '/ai/transform/batch' : '/ai/transform';
+    const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}${path}`, {
       method: 'POST',
       headers: { ...authHeader() },
       body: fd,
@@ -46,10 +49,24 @@ export default function AIPage() {
 
     if (res.ok) {
       form.reset();
+      const body = await res.json();
+      const jobs: any[] = body.jobs ?? [body];
+      load();
+      // Transforms run in a background queue; refresh history once these settle.
+      for (let i = 0; i < 30; i++) {
+        await new Promise((r) => setTimeout(r, 1000));
+        const statuses = await Promise.all(jobs.map((j) => api(j.status_url).catch(() => null)));
+        if (statuses.every((s) => !s || s.status !== 'queued')) break;
+      }
       load();
     }
   };
 
+  const remove = async (id: number) => {
+    await api(`/ai/transform/${id}`, { method: 'DELETE' });
+    setHistory((rows) => rows.filter((h) => h.id !== id));
+  };
+
   const canDraw = !!config?.ai?.drawing;
   const canCode = !!config?.ai?.coding;
   const canGeneral = !!config?.ai?.general;
@@ -76,12 +93,17 @@ export default function AIPage() {
           {canDraw && (
             <form className="space-y-3" onSubmit={onUpload}>
               <input className="input" type="file" name="image" accept="image/*" required />
-              <select className="input" value={preset} onChange={(e) => setPreset(e.target.value)}>
+              <select
+                className="input"
+                multiple
+                value={selected}
+                onChange={(e) => setSelected(Array.from(e.target.selectedOptions, (o) => o.value))}
+              >
                 {presets.map(([k, v]) => <option key={k} value={k}>{v}</option>)}
               </select>
               <input className="input" placeholder="Optional prompt" value={prompt} onChange={(e) => setPrompt(e.target.value)} />
-              <button className="btn-primary" type="submit" disabled={credits <= 0}>
-                {credits > 0 ? 'Transform' : 'No credits'}
+              <button className="btn-primary" type="submit" disabled={selected.length === 0 || credits < selected.length}>
+                {credits >= selected.length ? `Transform (${selected.length} credit${selected.length === 1 ? '' : 's'})` : 'Not enough credits'}
               </button>
               {credits <= 0 && <div className="text-xs text-slate-500">No drawing credits left.</div>}
             </form>
@@ -172,7 +194,18 @@ export default function AIPage() {
           {history.map((h) => (
             <div key={h.id} className="card">
               <p className="text-xs text-slate-500">{h.preset}</p>
-              <img src={`${process.env.NEXT_PUBLIC_API_URL}/media/file/${h.output_image_path}`} alt="output" className="rounded mt-2" />
+              {h.status === 'succeeded' ? (
+                <a href={`${process.env.NEXT_PUBLIC_API_URL}${h.preview_url}`} target="_blank" rel="noreferrer">
+                  <img src={`${process.env.NEXT_PUBLIC_API_URL}${h.thumbnail_url}`} alt="output" loading="lazy" className="rounded mt-2" />
+                </a>
+              ) : (
+                <p className="text-xs text-slate-500 mt-2">{h.status === 'failed' ? 'Failed — credit refunded' : 'Processing…'}</p>
+              )}
+              {h.status !== 'queued' && (
+                <button className="btn-ghost mt-2" type="button" onClick={() => remove(h.id)}>
+                  Remove
+                </button>
+              )}
             </div>
           ))}
         </div>
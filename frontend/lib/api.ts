@@ -28,3 +28,11 @@ export async function api(path: string, options: RequestInit = {}) {
   if (ctype.includes('application/json')) return res.json();
   return res;
 }
+
+export type Page<T> = { items: T[]; next_cursor: string | null };
+
+export function pagePath(path: string, cursor?: string | null) {
+  if (!cursor) return path;
+  const sep = path.includes('?') ? '&' : '?';
+  return `${path}${sep}cursor=${encodeURIComponent(cursor)}`;
+}